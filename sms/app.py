@@ -1326,58 +1326,79 @@ def display_recurring_transactions_group(active_recurring):
         st.subheader(f"📅 Recurring Payments")
         display_recurring_rows(active_recurring)
 
+# Confidence badge per bucket: (streamlit renderer, label)
+CONFIDENCE_BADGES = {
+    'high': (st.success, "🎯 High confidence pattern"),
+    'moderate': (st.info, "📊 Moderate confidence pattern"),
+    'low': (st.warning, "⚠️ Low confidence pattern"),
+}
+
+# Due-date display per urgency bucket: (icon, delta)
+DUE_BADGES = {
+    'urgent': ("⚠️", "Urgent"),
+    'soon': ("📅", "Soon"),
+    'ok': ("📅", None),
+}
+
+def _column_or_default(df, column, default):
+    """Return a column if present, otherwise a constant series of the default value."""
+    if column in df.columns:
+        return df[column]
+    return pd.Series(default, index=df.index)
+
 def display_recurring_rows(recurring_data):
     """Display recurring transaction rows"""
-    for _, row in recurring_data.iterrows():
-        # Calculate days until next payment (with error handling)
-        try:
-            if 'next_due_date' in row and pd.notna(row['next_due_date']):
-                days_until = (pd.to_datetime(row['next_due_date']) - pd.Timestamp.now()).days
-            else:
-                days_until = None
-        except:
-            days_until = None
-        
+    # Precompute everything the cards need once, vectorized, instead of per-row lookups
+    # Due dates may mix naive and tz-aware values: compare everything in UTC, and let a date that
+    # can't be parsed leave only its own row's due date unknown
+    try:
+        next_due = pd.to_datetime(_column_or_default(recurring_data, 'next_due_date', None), errors='coerce', utc=True)
+    except (TypeError, ValueError, OverflowError):
+        next_due = pd.Series(pd.NaT, index=recurring_data.index, dtype='datetime64[ns, UTC]')
+    days_until = (next_due - pd.Timestamp.now(tz='UTC')).dt.days.astype('Int64')
+    due_bucket = pd.cut(days_until.astype('float64'), bins=[float('-inf'), 7, 14, float('inf')],
+                        labels=['urgent', 'soon', 'ok']).astype(object)
+    confidence_bucket = pd.cut(pd.to_numeric(_column_or_default(recurring_data, 'confidence_score', None), errors='coerce'),
+                               bins=[float('-inf'), 0.6, 0.8, float('inf')],
+                               labels=['low', 'moderate', 'high']).astype(object)
+    
+    cards = pd.DataFrame({
+        'merchant': _column_or_default(recurring_data, 'merchant', 'Unknown'),
+        'amount': _column_or_default(recurring_data, 'average_amount', 0),
+        'frequency': _column_or_default(recurring_data, 'median_gap_days', 0),
+        'days_until': days_until,
+        'due_bucket': due_bucket.where(due_bucket.notna(), 'unknown'),
+        'confidence_bucket': confidence_bucket.where(confidence_bucket.notna(), 'unknown'),
+        'pattern_details': _column_or_default(recurring_data, 'pattern_details', 'Regular pattern detected'),
+    }, index=recurring_data.index)
+    
+    for merchant, amount, frequency, days, due, confidence, pattern_details in cards.itertuples(index=False, name=None):
         # Create a metric card for each recurring payment
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            merchant = row.get('merchant', 'Unknown')
             st.metric("Merchant", merchant)
         
         with col2:
-            amount = row.get('average_amount', 0)
             st.metric("Amount", f"₹{amount:.2f}")
         
         with col3:
-            frequency = row.get('median_gap_days', 0)
             if frequency > 0:
                 st.metric("Frequency", f"{frequency:.0f} days")
             else:
                 st.metric("Frequency", "Variable")
         
         with col4:
-            if days_until is not None:
-                if days_until <= 7:
-                    st.metric("Due", f"⚠️ {days_until} days", delta="Urgent")
-                elif days_until <= 14:
-                    st.metric("Due", f"📅 {days_until} days", delta="Soon")
-                else:
-                    st.metric("Due", f"📅 {days_until} days")
+            if due in DUE_BADGES:
+                icon, delta = DUE_BADGES[due]
+                st.metric("Due", f"{icon} {days} days", delta=delta)
             else:
                 st.metric("Due", "Unknown")
         
         # Show confidence and pattern details if available
-        if 'confidence_score' in row and pd.notna(row['confidence_score']):
-            confidence = row['confidence_score']
-            pattern_details = row.get('pattern_details', 'Regular pattern detected')
-            
-            if confidence > 0.8:
-                st.success(f"🎯 High confidence pattern: {pattern_details}")
-            elif confidence > 0.6:
-                st.info(f"📊 Moderate confidence pattern: {pattern_details}")
-            else:
-                st.warning(f"⚠️ Low confidence pattern: {pattern_details}")
+        if confidence in CONFIDENCE_BADGES:
+            render, label = CONFIDENCE_BADGES[confidence]
+            render(f"{label}: {pattern_details}")
         
         st.divider()
 
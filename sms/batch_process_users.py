@@ -6,12 +6,26 @@ Processes and stores preprocessed data for all users in user_financial_transacti
 
 import sys
 import os
+import atexit
 import logging
-from datetime import datetime
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import json
+from datetime import datetime, timedelta
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import threading
 import time
 
+# Use orjson for summary serialization when available, fall back to the standard library
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
@@ -21,7 +35,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 # Import required modules
 try:
-    from mongodb_loader import MongoDBLoader
+    from mongodb_loader import MongoDBLoader, RAW_TRANSACTION_FIELDS
     from preprocess import DataPreprocessor
     from processed_data_manager import ProcessedDataManager
 except ImportError as e:
@@ -29,36 +43,58 @@ except ImportError as e:
     print("Make sure you're running from the DS/sms directory")
     sys.exit(1)
 
-# Configure logging
+# Configure logging: records are queued by the calling thread and written by a background listener,
+# so worker threads never block on the file/console handlers
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler('batch_processing.log'),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('batch_processing.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 class BatchProcessor:
     """Batch processor for processing all user data."""
     
-    def __init__(self, date_range_months: int = 0):
+    def __init__(self, date_range_months: int = 0, user_chunk_size: int = 16, worker_processes: int = 0):
         """
         Initialize batch processor.
         
         Args:
             date_range_months: Number of months of data to process (0 = ALL historical data)
+            user_chunk_size: Number of users whose raw data is fetched per query
+            worker_processes: Number of worker processes for chunks (0 = process in this process)
         """
         self.date_range_months = date_range_months
+        self.user_chunk_size = max(1, user_chunk_size)
+        self.worker_processes = max(0, worker_processes)
+        
+        # Bound concurrent per-user work; permits are withheld while MongoDB is under connection pressure
+        self.max_concurrency = max(1, int(os.getenv("BATCH_CONCURRENCY", "8")))
+        self._inflight = threading.BoundedSemaphore(self.max_concurrency)
+        self._withheld_permits = 0
+        
+        # Users known to have processed data (loaded lazily, updated in place after each success)
+        self._processed_users: Optional[Set[str]] = None
         
         # Initialize components
         try:
             self.mongodb_loader = MongoDBLoader()
             self.processed_data_manager = ProcessedDataManager()
+            # Raw frames are loaded per run and owned here, so the preprocessor can skip its defensive copy
             self.preprocessor = DataPreprocessor(
                 date_range_months=date_range_months,
-                store_processed_data=True
+                store_processed_data=True,
+                copy_input=False
             )
             
             logger.info("✅ BatchProcessor initialized successfully")
@@ -67,6 +103,12 @@ class BatchProcessor:
             logger.error(f"❌ Failed to initialize BatchProcessor: {e}")
             raise
     
+    def _get_processed_users(self) -> Set[str]:
+        """Get the cached set of users that already have processed data."""
+        if self._processed_users is None:
+            self._processed_users = self.processed_data_manager.get_users_with_processed_data()
+        return self._processed_users
+    
     def get_processing_status(self) -> Dict[str, Any]:
         """Get current processing status for all users."""
         logger.info("📊 Getting processing status for all users...")
@@ -85,9 +127,16 @@ class BatchProcessor:
         """
         logger.info("🚀 Starting batch processing for all users")
         start_time = datetime.now()
+        start_ns = time.monotonic_ns()
         
-        # Get all users with raw data
-        all_users = self.processed_data_manager.get_all_users_with_raw_data()
+        # Get users to process (the needs-processing filter runs as one server-side aggregation)
+        if force_reprocess:
+            all_users = self.processed_data_manager.get_all_users_with_raw_data()
+        else:
+            all_users = self.processed_data_manager.get_users_needing_processing()
+            if not all_users:
+                logger.info("✅ All users already have processed data")
+                return self._create_summary([], 0, 0, 0, start_time, start_ns)
         
         if max_users:
             all_users = all_users[:max_users]
@@ -95,55 +144,42 @@ class BatchProcessor:
         
         logger.info(f"📋 Found {len(all_users)} users to process")
         
-        # Get current processing status
-        if not force_reprocess:
-            status = self.get_processing_status()
-            users_needing_processing = [
-                user_id for user_id, details in status.get('user_details', {}).items()
-                if details.get('needs_processing', True)
-            ]
-            
-            if users_needing_processing:
-                logger.info(f"📝 {len(users_needing_processing)} users need processing")
-                all_users = [u for u in all_users if u in users_needing_processing]
-            else:
-                logger.info("✅ All users already have processed data")
-                if not force_reprocess:
-                    return self._create_summary([], 0, 0, 0, start_time)
-        
-        # Process each user
+        # Process each user (outcome lists are preallocated and filled by index, then trimmed)
         results = {
-            'successful': [],
-            'failed': [],
-            'skipped': [],
+            'successful': [None] * len(all_users),
+            'failed': [None] * len(all_users),
+            'skipped': [None] * len(all_users),
+            'counts': {'successful': 0, 'failed': 0, 'skipped': 0},
             'total_transactions_processed': 0
         }
         
-        for i, user_id in enumerate(all_users, 1):
-            logger.info(f"👤 Processing user {i}/{len(all_users)}: {user_id}")
+        # Fetch raw data one chunk of users per query
+        user_chunks = [
+            all_users[i:i + self.user_chunk_size]
+            for i in range(0, len(all_users), self.user_chunk_size)
+        ]
+        
+        if self.worker_processes:
+            self._process_chunks_in_workers(user_chunks, force_reprocess, results)
+        else:
+            # Prefetch the next chunk while the current one is being preprocessed
+            users_done = 0
             
-            try:
-                result = self.process_single_user(user_id, force_reprocess)
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                next_load = prefetcher.submit(self._load_raw_chunk, user_chunks[0]) if user_chunks else None
                 
-                if result['status'] == 'success':
-                    results['successful'].append(user_id)
-                    results['total_transactions_processed'] += result['transactions_processed']
-                    logger.info(f"✅ User {user_id}: {result['transactions_processed']} transactions processed")
+                for chunk_number, user_chunk in enumerate(user_chunks, 1):
+                    logger.info(f"👥 Processing users {users_done + 1}-{users_done + len(user_chunk)}/{len(all_users)}")
                     
-                elif result['status'] == 'skipped':
-                    results['skipped'].append(user_id)
-                    logger.info(f"⏭️  User {user_id}: {result['reason']}")
+                    current_load = next_load
+                    next_load = prefetcher.submit(self._load_raw_chunk, user_chunks[chunk_number]) if chunk_number < len(user_chunks) else None
                     
-                else:
-                    results['failed'].append(user_id)
-                    logger.error(f"❌ User {user_id}: {result['error']}")
-                    
-            except Exception as e:
-                results['failed'].append(user_id)
-                logger.error(f"❌ Unexpected error processing user {user_id}: {e}")
-            
-            # Brief pause to avoid overwhelming the database
-            time.sleep(0.1)
+                    chunk_results = self.process_user_chunk(user_chunk, force_reprocess, prefetched=current_load)
+                    users_done += len(user_chunk)
+                    self._record_chunk_results(results, chunk_results)
+        
+        for outcome, count in results['counts'].items():
+            del results[outcome][count:]
         
         # Create final summary
         summary = self._create_summary(
@@ -151,38 +187,187 @@ class BatchProcessor:
             len(results['failed']),
             len(results['skipped']),
             results['total_transactions_processed'],
-            start_time
+            start_time,
+            start_ns
         )
         
         logger.info("🎉 Batch processing completed!")
-        logger.info(f"📊 Summary: {summary['batch_processing_summary']['successful_users']} successful, {summary['batch_processing_summary']['failed_users']} failed, {summary['batch_processing_summary']['skipped_users']} skipped")
+        logger.info("📊 Summary: %d successful, %d failed, %d skipped",
+                    summary['batch_processing_summary']['successful_users'],
+                    summary['batch_processing_summary']['failed_users'],
+                    summary['batch_processing_summary']['skipped_users'])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Full summary: %s", self.summary_to_json(summary))
         
         return summary
     
-    def process_single_user(self, user_id: str, force_reprocess: bool = False) -> Dict[str, Any]:
+    def _record_chunk_results(self, results: Dict[str, Any], chunk_results: Dict[str, Dict[str, Any]]):
+        """Tally per-user results of one chunk into the run results."""
+        counts = results['counts']
+        for user_id, result in chunk_results.items():
+            if result['status'] == 'success':
+                outcome = 'successful'
+                results['total_transactions_processed'] += result['transactions_processed']
+                logger.info(f"✅ User {user_id}: {result['transactions_processed']} transactions processed")
+                
+            elif result['status'] == 'skipped':
+                outcome = 'skipped'
+                logger.info(f"⏭️  User {user_id}: {result['reason']}")
+                
+            else:
+                outcome = 'failed'
+                logger.error(f"❌ User {user_id}: {result['error']}")
+            
+            results[outcome][counts[outcome]] = user_id
+            counts[outcome] += 1
+    
+    def _process_chunks_in_workers(self, user_chunks: List[List[str]], force_reprocess: bool,
+                                   results: Dict[str, Any]):
+        """Process user chunks in worker processes that each build their components once."""
+        logger.info(f"🧵 Dispatching {len(user_chunks)} chunks to {self.worker_processes} worker processes")
+        
+        # spawn: MongoClient is not fork-safe and the connection manager caches clients per process
+        with ProcessPoolExecutor(max_workers=self.worker_processes,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(self.date_range_months, self.user_chunk_size)) as pool:
+            futures = [pool.submit(_process_chunk_in_worker, user_chunk, force_reprocess)
+                       for user_chunk in user_chunks]
+            
+            for user_chunk, future in zip(user_chunks, futures):
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Worker failed for chunk starting at {user_chunk[0]}: {e}")
+                    chunk_results = {
+                        user_id: {'status': 'failed', 'error': str(e), 'transactions_processed': 0}
+                        for user_id in user_chunk
+                    }
+                
+                # Workers track their own state; mirror successes into this process's processed-user cache
+                for user_id, result in chunk_results.items():
+                    if result['status'] == 'success':
+                        if self._processed_users is not None:
+                            self._processed_users.add(user_id)
+                
+                self._record_chunk_results(results, chunk_results)
+    
+    def _load_raw_transactions(self, user_id: str) -> pd.DataFrame:
+        """Load raw transactions for a single user."""
+        return self.mongodb_loader.get_user_transactions(
+            user_id, force_raw_data=True, projection=RAW_TRANSACTION_FIELDS
+        )
+    
+    def _load_raw_chunk(self, user_ids: List[str]) -> Dict[str, pd.DataFrame]:
+        """Load raw transactions for a chunk of users with one query and split them per user."""
+        raw_df = self.mongodb_loader.get_users_raw_transactions(user_ids, projection=RAW_TRANSACTION_FIELDS)
+        
+        if raw_df.empty or 'user_id' not in raw_df.columns:
+            return {}
+        
+        return {
+            user_id: user_df.reset_index(drop=True)
+            for user_id, user_df in raw_df.groupby('user_id', sort=False)
+        }
+    
+    def process_user_chunk(self, user_ids: List[str], force_reprocess: bool = False,
+                           prefetched: Optional[Future] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Process a chunk of users whose raw data is fetched with a single query.
+        
+        Users run concurrently, bounded by the in-flight semaphore (BATCH_CONCURRENCY).
+        
+        Args:
+            user_ids: User identifiers in this chunk
+            force_reprocess: Force reprocessing even if processed data exists
+            prefetched: Pending chunk load started ahead of time (optional)
+            
+        Returns:
+            Processing result per user ID
+        """
+        try:
+            raw_by_user = prefetched.result() if prefetched is not None else self._load_raw_chunk(user_ids)
+        except Exception as e:
+            logger.warning(f"⚠️  Chunk load failed, falling back to per-user loading: {e}")
+            raw_by_user = None
+        
+        self._adjust_concurrency()
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                user_id: executor.submit(
+                    self._process_user_bounded, user_id, force_reprocess,
+                    raw_by_user.get(user_id, pd.DataFrame()) if raw_by_user is not None else None
+                )
+                for user_id in user_ids
+            }
+            
+            results = {}
+            for user_id, future in futures.items():
+                try:
+                    results[user_id] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Unexpected error processing user {user_id}: {e}")
+                    results[user_id] = {
+                        'status': 'failed',
+                        'error': str(e),
+                        'transactions_processed': 0
+                    }
+        
+        return results
+    
+    def _process_user_bounded(self, user_id: str, force_reprocess: bool,
+                              raw_df: Optional[pd.DataFrame]) -> Dict[str, Any]:
+        """Process a user while holding one in-flight slot."""
+        with self._inflight:
+            return self.process_single_user(user_id, force_reprocess, raw_df=raw_df)
+    
+    def _adjust_concurrency(self):
+        """Withhold or return in-flight slots based on MongoDB server connection usage."""
+        try:
+            connections = self.mongodb_loader.client.admin.command('serverStatus').get('connections', {})
+        except Exception as e:
+            logger.debug(f"serverStatus unavailable, keeping concurrency unchanged: {e}")
+            return
+        
+        current = connections.get('current', 0)
+        capacity = current + connections.get('available', 0)
+        
+        if capacity and current > capacity * 0.8:
+            if self._withheld_permits < self.max_concurrency - 1 and self._inflight.acquire(blocking=False):
+                self._withheld_permits += 1
+                logger.warning(f"⚠️  MongoDB connections at {current}/{capacity}, "
+                               f"concurrency reduced to {self.max_concurrency - self._withheld_permits}")
+        elif self._withheld_permits:
+            self._inflight.release()
+            self._withheld_permits -= 1
+            logger.info(f"🔼 Concurrency restored to {self.max_concurrency - self._withheld_permits}")
+    
+    def process_single_user(self, user_id: str, force_reprocess: bool = False,
+                            raw_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
         """
         Process a single user's transaction data.
         
         Args:
             user_id: User identifier
             force_reprocess: Force reprocessing even if processed data exists
+            raw_df: Raw transactions already loaded for this user (optional)
             
         Returns:
             Processing result
         """
         try:
             # Check if user already has processed data
-            if not force_reprocess:
-                existing_data = self.processed_data_manager.get_processed_data(user_id, limit=1)
-                if existing_data is not None and not existing_data.empty:
-                    return {
-                        'status': 'skipped',
-                        'reason': 'Already has processed data',
-                        'transactions_processed': 0
-                    }
+            if not force_reprocess and user_id in self._get_processed_users():
+                return {
+                    'status': 'skipped',
+                    'reason': 'Already has processed data',
+                    'transactions_processed': 0
+                }
             
             # Load raw data for user (always use raw data when force reprocessing)
-            raw_df = self.mongodb_loader.get_user_transactions(user_id, force_raw_data=True)
+            if raw_df is None:
+                raw_df = self._load_raw_transactions(user_id)
             
             if raw_df.empty:
                 return {
@@ -203,6 +388,8 @@ class BatchProcessor:
                     'transactions_processed': 0
                 }
             
+            self._get_processed_users().add(user_id)
+            
             return {
                 'status': 'success',
                 'transactions_processed': len(processed_df),
@@ -218,10 +405,11 @@ class BatchProcessor:
             }
     
     def _create_summary(self, successful_users: List[str], failed_count: int, 
-                       skipped_count: int, total_transactions: int, start_time: datetime) -> Dict[str, Any]:
-        """Create processing summary."""
-        end_time = datetime.now()
-        duration = end_time - start_time
+                       skipped_count: int, total_transactions: int, start_time: datetime,
+                       start_ns: int) -> Dict[str, Any]:
+        """Create processing summary (duration from the monotonic clock, start_time only for timestamps)."""
+        duration = timedelta(microseconds=(time.monotonic_ns() - start_ns) // 1000)
+        end_time = start_time + duration
         
         return {
             'batch_processing_summary': {
@@ -239,6 +427,16 @@ class BatchProcessor:
             'processing_rate': f"{len(successful_users)}/{len(successful_users) + failed_count + skipped_count}" if (len(successful_users) + failed_count + skipped_count) > 0 else "0/0"
         }
     
+    def summary_to_json(self, summary: Dict[str, Any]) -> str:
+        """Serialize a processing summary to JSON (orjson when installed)."""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(
+                summary,
+                default=str,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2
+            ).decode()
+        return json.dumps(summary, indent=2, default=str)
+    
     def cleanup_processed_data(self, user_id: str = None) -> bool:
         """
         Clean up processed data for a user or all users.
@@ -255,15 +453,28 @@ class BatchProcessor:
             # Dangerous operation - require confirmation
             confirm = input("⚠️  Are you sure you want to delete ALL processed data? (type 'DELETE ALL' to confirm): ")
             if confirm == "DELETE ALL":
-                all_users = self.processed_data_manager.get_all_users_with_raw_data()
-                for user in all_users:
-                    self.processed_data_manager.delete_processed_data(user)
-                logger.info(f"🗑️  Deleted processed data for {len(all_users)} users")
+                deleted_count = self.processed_data_manager.delete_all_processed_data()
+                if deleted_count < 0:
+                    return False
+                # Cached processed-user state no longer reflects the collection
+                self._processed_users = None
+                logger.info(f"🗑️  Deleted {deleted_count} processed records")
                 return True
             else:
                 logger.info("❌ Cleanup cancelled")
                 return False
 
+# Per-process state for worker processes: components are built once by the pool initializer
+_WORKER: Dict[str, Any] = {}
+
+def _init_worker(date_range_months: int, user_chunk_size: int):
+    """Build one BatchProcessor (MongoDB client, preprocessor, data manager) per worker process."""
+    _WORKER['processor'] = BatchProcessor(date_range_months=date_range_months, user_chunk_size=user_chunk_size)
+
+def _process_chunk_in_worker(user_ids: List[str], force_reprocess: bool) -> Dict[str, Dict[str, Any]]:
+    """Process one chunk of users with the worker's long-lived BatchProcessor."""
+    return _WORKER['processor'].process_user_chunk(user_ids, force_reprocess)
+
 def main():
     """Main function for command-line usage."""
     import argparse
@@ -272,13 +483,17 @@ def main():
     parser.add_argument("--months", type=int, default=0, help="Number of months to process (default: 0 = ALL historical data)")
     parser.add_argument("--force", action="store_true", help="Force reprocessing even if data exists")
     parser.add_argument("--max-users", type=int, help="Maximum number of users to process (for testing)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Number of users fetched per raw-data query (default: 16)")
+    parser.add_argument("--processes", type=int, default=0, help="Worker processes for user chunks (default: 0 = single process)")
     parser.add_argument("--status-only", action="store_true", help="Only show processing status")
     parser.add_argument("--cleanup", type=str, help="Clean up processed data for user (or 'all')")
+    parser.add_argument("--json", action="store_true", help="Print the processing summary as JSON")
     
     args = parser.parse_args()
     
     try:
-        processor = BatchProcessor(date_range_months=args.months)
+        processor = BatchProcessor(date_range_months=args.months, user_chunk_size=args.chunk_size,
+                                   worker_processes=args.processes)
         
         if args.cleanup:
             if args.cleanup == "all":
@@ -315,6 +530,10 @@ def main():
             max_users=args.max_users
         )
         
+        if args.json:
+            print(processor.summary_to_json(summary))
+            return
+        
         print("\n🎉 BATCH PROCESSING COMPLETED")
         print("=" * 50)
         print(f"✅ Successful: {summary['batch_processing_summary']['successful_users']}")
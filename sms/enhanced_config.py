@@ -4,47 +4,51 @@ Enables the new intelligent insights system by default.
 """
 
 import os
+from dataclasses import dataclass, asdict, replace
+from functools import lru_cache
 from typing import Dict, Any
 
+@dataclass(frozen=True, slots=True)
 class EnhancedConfig:
     """Configuration for enhanced insights system"""
-    
+
     # Enable enhanced insights system by default
-    USE_ENHANCED_INSIGHTS = True
-    
+    use_enhanced_insights: bool = True
+
     # Data quality settings
-    ENABLE_DATA_QUALITY_CHECKS = True
-    DUPLICATE_REMOVAL = True
-    CURRENCY_STANDARDIZATION = True
-    
+    enable_data_quality_checks: bool = True
+    duplicate_removal: bool = True
+    currency_standardization: bool = True
+
     # Pattern recognition settings
-    SALARY_DETECTION_THRESHOLD = 15000  # Minimum amount to consider for salary
-    PATTERN_CONFIDENCE_THRESHOLD = 0.7
-    
+    salary_detection_threshold: int = 15000  # Minimum amount to consider for salary
+    pattern_confidence_threshold: float = 0.7
+
     # Performance settings
-    ENABLE_PATTERN_CACHING = True
-    MAX_TRANSACTIONS_FOR_ANALYSIS = 10000
-    
+    enable_pattern_caching: bool = True
+    max_transactions_for_analysis: int = 10000
+
     @classmethod
     def get_config(cls) -> Dict[str, Any]:
-        """Get all configuration settings"""
-        return {
-            'use_enhanced_insights': cls.USE_ENHANCED_INSIGHTS,
-            'enable_data_quality_checks': cls.ENABLE_DATA_QUALITY_CHECKS,
-            'duplicate_removal': cls.DUPLICATE_REMOVAL,
-            'currency_standardization': cls.CURRENCY_STANDARDIZATION,
-            'salary_detection_threshold': cls.SALARY_DETECTION_THRESHOLD,
-            'pattern_confidence_threshold': cls.PATTERN_CONFIDENCE_THRESHOLD,
-            'enable_pattern_caching': cls.ENABLE_PATTERN_CACHING,
-            'max_transactions_for_analysis': cls.MAX_TRANSACTIONS_FOR_ANALYSIS
-        }
-    
+        """Get all configuration settings (shared dict, treat as read-only)"""
+        return _config_as_dict(CONFIG)
+
     @classmethod
     def enable_enhanced_system(cls):
         """Enable the enhanced insights system"""
-        cls.USE_ENHANCED_INSIGHTS = True
-    
+        global CONFIG
+        CONFIG = replace(CONFIG, use_enhanced_insights=True)
+
     @classmethod
     def disable_enhanced_system(cls):
         """Disable enhanced system (use legacy)"""
-        cls.USE_ENHANCED_INSIGHTS = False
+        global CONFIG
+        CONFIG = replace(CONFIG, use_enhanced_insights=False)
+
+@lru_cache(maxsize=2)
+def _config_as_dict(config: EnhancedConfig) -> Dict[str, Any]:
+    """Build the settings dict once per distinct configuration."""
+    return asdict(config)
+
+# Active configuration, built once and swapped (never mutated) by the toggles above
+CONFIG = EnhancedConfig()
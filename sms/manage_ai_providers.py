@@ -15,6 +15,8 @@ load_dotenv()
 class AIProviderManager:
     def __init__(self):
         self.api_base = "http://localhost:8000"
+        # Keep-alive session so health checks and switches reuse one pooled connection
+        self.session = requests.Session()
         self.providers = {
             'groq': {
                 'name': 'Groq AI',
@@ -34,10 +36,20 @@ class AIProviderManager:
             }
         }
     
+    def close(self):
+        """Close the pooled HTTP session"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
     def check_api_status(self):
         """Check if the API is running"""
         try:
-            response = requests.get(f"{self.api_base}/health", timeout=5)
+            response = self.session.get(f"{self.api_base}/health", timeout=5)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -106,8 +118,8 @@ class AIProviderManager:
             return False
         
         try:
-            response = requests.post(f"{self.api_base}/switch-ai-provider", 
-                                   params={"provider": provider_id}, timeout=10)
+            response = self.session.post(f"{self.api_base}/switch-ai-provider", 
+                                         params={"provider": provider_id}, timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
@@ -180,30 +192,29 @@ class AIProviderManager:
         print("   3. Use 'switch' command to activate it")
 
 def main():
-    manager = AIProviderManager()
-    
-    if len(sys.argv) < 2:
-        manager.show_usage()
-        return
-    
-    command = sys.argv[1].lower()
-    
-    if command == "list":
-        manager.list_providers()
-    elif command == "switch":
-        if len(sys.argv) < 3:
-            print("❌ Please specify a provider ID")
-            print("Example: python3 manage_ai_providers.py switch gemini")
+    with AIProviderManager() as manager:
+        if len(sys.argv) < 2:
+            manager.show_usage()
             return
-        provider_id = sys.argv[2].lower()
-        manager.switch_provider(provider_id)
-    elif command == "env":
-        manager.check_env_file()
-    elif command in ["help", "--help", "-h"]:
-        manager.show_usage()
-    else:
-        print(f"❌ Unknown command: {command}")
-        manager.show_usage()
+        
+        command = sys.argv[1].lower()
+        
+        if command == "list":
+            manager.list_providers()
+        elif command == "switch":
+            if len(sys.argv) < 3:
+                print("❌ Please specify a provider ID")
+                print("Example: python3 manage_ai_providers.py switch gemini")
+                return
+            provider_id = sys.argv[2].lower()
+            manager.switch_provider(provider_id)
+        elif command == "env":
+            manager.check_env_file()
+        elif command in ["help", "--help", "-h"]:
+            manager.show_usage()
+        else:
+            print(f"❌ Unknown command: {command}")
+            manager.show_usage()
 
 if __name__ == "__main__":
     main()
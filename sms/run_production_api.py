@@ -4,8 +4,11 @@ Production script to run the Financial Chat API
 Uses the production-ready implementation with all features
 """
 
+import os
 import uvicorn
-from src.financial_chat_api_production import app
+
+# Worker processes (uvicorn's WEB_CONCURRENCY convention, default one per CPU)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
 
 if __name__ == "__main__":
     print("🚀 Starting Financial Chat API - PRODUCTION VERSION")
@@ -23,12 +26,18 @@ if __name__ == "__main__":
     print("📖 API Documentation: http://localhost:8000/docs")
     print("🔍 Health Check: http://localhost:8000/health")
     print("💬 Chat Endpoint: POST http://localhost:8000/chat")
+    print(f"⚙️  Workers: {WORKERS} (runtime AI provider switches apply per worker)")
     print("=" * 60)
     print()
     
+    # Import string is required for multiple workers; "auto" picks uvloop/httptools when installed
     uvicorn.run(
-        app,
+        "src.financial_chat_api_production:app",
         host="0.0.0.0",
         port=8000,
+        workers=WORKERS,
+        loop="auto",
+        http="auto",
+        backlog=2048,
         log_level="info"
     )
@@ -5,15 +5,29 @@ Allows easy switching between different AI providers (Groq, Gemini, in-house) wi
 
 import os
 import logging
-from typing import Dict, Any, Optional, List
-from dotenv import load_dotenv
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Tuple
 import requests
 
-# Load environment variables
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
+# Whether .env has been loaded in this process (see ensure_env_loaded)
+_env_loaded = False
+
+def ensure_env_loaded():
+    """Load .env into the environment once per process (skipped when SMS_SKIP_DOTENV is set)"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    
+    # Containers inject the environment directly, so reading .env there is wasted work
+    if os.environ.get('SMS_SKIP_DOTENV'):
+        return
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+
 class AIModelConfig:
     """Configuration for AI model providers"""
     
@@ -57,32 +71,55 @@ class AIModelConfig:
         }
     }
     
+    __slots__ = (
+        'active_provider', 'provider_config', 'custom_priority_order',
+        '_key_presence', '_config_generation', '_last_priority_result'
+    )
+    
+    # Provider names as a frozenset for O(1) membership checks on the hot paths
+    _PROVIDER_SET = frozenset(PROVIDERS)
+    
+    # Default fallback order: Gemini (free tier), OpenAI, Groq (currently restricted)
+    DEFAULT_PRIORITY_ORDER = ('gemini', 'openai', 'groq', 'inhouse')
+    
     def __init__(self):
         """Initialize AI model configuration"""
-        self.custom_priority_order = None  # Store custom priority if set
+        ensure_env_loaded()
+        self.custom_priority_order: Optional[Tuple[str, ...]] = None  # Store custom priority if set
+        self._config_generation = 0  # Bumped on every provider change so consumers can skip re-syncing
+        self._last_priority_result = None  # (request, generation, result) of the last set_provider_priority
         self.refresh_configuration()
     
     def refresh_configuration(self):
         """Force a complete refresh of the configuration"""
-        # Re-detect the active provider from current environment
+        # Re-read which provider API keys are set, then re-detect the active provider
+        self.invalidate_env_cache()
         self.active_provider = self._detect_active_provider()
         self.provider_config = self.PROVIDERS.get(self.active_provider, {})
         self._validate_config()
+        self._config_generation += 1
         logger.info(f"🔄 Configuration refreshed - Active provider: {self.active_provider}")
         
+    def invalidate_env_cache(self):
+        """Re-read which provider API keys are present in the environment"""
+        self._key_presence = {
+            provider: bool(os.getenv(config['api_key_env']))
+            for provider, config in self.PROVIDERS.items()
+        }
+    
     def _detect_active_provider(self) -> str:
         """Detect which provider is currently configured"""
         # Priority order: OpenAI (reliable), Gemini (free tier), Groq, In-house
-        if os.getenv('OPENAI_API_KEY'):
+        if self._key_presence['openai']:
             logger.info("🎯 OpenAI API key detected - using OpenAI as primary provider")
             return 'openai'
-        elif os.getenv('GEMINI_API_KEY'):
+        elif self._key_presence['gemini']:
             logger.info("🎯 Gemini API key detected - using Gemini as primary provider")
             return 'gemini'
-        elif os.getenv('GROQ_API_KEY'):
+        elif self._key_presence['groq']:
             logger.info("🎯 Groq API key detected - using Groq as primary provider")
             return 'groq'
-        elif os.getenv('INHOUSE_API_KEY') and os.getenv('INHOUSE_API_URL'):
+        elif self._key_presence['inhouse'] and os.getenv('INHOUSE_API_URL'):
             logger.info("🎯 In-house model detected - using custom model as primary provider")
             return 'inhouse'
         else:
@@ -100,8 +137,7 @@ class AIModelConfig:
             self.active_provider = 'fallback'
             return
             
-        api_key = os.getenv(self.provider_config.get('api_key_env', ''))
-        if not api_key:
+        if not self._key_presence.get(self.active_provider):
             logger.error(f"❌ API key not found for {self.active_provider}")
             self.active_provider = 'fallback'
             return
@@ -111,41 +147,41 @@ class AIModelConfig:
     def get_provider_info(self) -> Dict[str, Any]:
         """Get information about the current provider"""
         if self.active_provider == 'fallback':
-            return {
-                'provider': 'fallback',
-                'name': 'Fallback Mode',
-                'status': 'no_ai_available',
-                'models': [],
-                'capabilities': ['basic_analysis', 'pattern_detection']
-            }
+            return dict(_FALLBACK_PROVIDER_INFO)
         
         return {
             'provider': self.active_provider,
-            'name': self.provider_config['name'],
+            'name': _PROVIDER_NAMES[self.active_provider],
             'status': 'active',
             'models': self.provider_config['models'],
-            'capabilities': ['ai_analysis', 'intent_detection', 'sub_query_generation'],
+            'capabilities': _AI_CAPABILITIES,
             'rate_limit_handling': self.provider_config.get('rate_limit_handling', False),
             'fallback_support': self.provider_config.get('fallback_support', False)
         }
     
-    def get_api_config(self) -> Dict[str, Any]:
-        """Get API configuration for the current provider"""
-        if self.active_provider == 'fallback':
+    def get_api_config(self, provider: Optional[str] = None) -> Dict[str, Any]:
+        """Get API configuration for the current provider (or the given one)"""
+        provider = provider or self.active_provider
+        if provider not in self._PROVIDER_SET:
             return {}
-            
+        
+        provider_config = self.PROVIDERS[provider]
         config = {
-            'api_key': os.getenv(self.provider_config['api_key_env']),
-            'api_url': self.provider_config['api_url'],
-            'default_model': self.provider_config['default_model']
+            'api_key': os.getenv(provider_config['api_key_env']),
+            'api_url': provider_config.get('api_url', ''),
+            'default_model': provider_config['default_model']
         }
         
         # Handle in-house models with custom API URL
-        if self.active_provider == 'inhouse':
+        if provider == 'inhouse':
             config['api_url'] = os.getenv('INHOUSE_API_URL', '')
             
         return config
     
+    def has_api_key(self, provider: str) -> bool:
+        """Check whether a provider has an API key configured"""
+        return self._key_presence.get(provider, False)
+    
     def is_available(self) -> bool:
         """Check if AI provider is available"""
         return self.active_provider != 'fallback'
@@ -153,48 +189,51 @@ class AIModelConfig:
     def get_fallback_providers(self) -> List[str]:
         """Get list of available fallback providers in priority order"""
         # Use custom priority order if set, otherwise use default
-        if self.custom_priority_order:
-            priority_order = self.custom_priority_order
-        else:
-            # Default priority order: Gemini (free tier), OpenAI, Groq (currently restricted)
-            priority_order = ['gemini', 'openai', 'groq', 'inhouse']
+        priority_order = self.custom_priority_order or self.DEFAULT_PRIORITY_ORDER
         
         fallbacks = []
         
         for provider in priority_order:
-            if provider != self.active_provider and provider in self.PROVIDERS:
-                config = self.PROVIDERS[provider]
-                if os.getenv(config['api_key_env']):
+            if provider != self.active_provider and provider in self._PROVIDER_SET:
+                if self._key_presence[provider]:
                     fallbacks.append(provider)
         
         return fallbacks
     
     def switch_provider(self, provider: str) -> bool:
         """Switch to a different provider"""
-        if provider not in self.PROVIDERS:
+        if provider not in self._PROVIDER_SET:
             logger.error(f"❌ Invalid provider: {provider}")
             return False
             
-        if not os.getenv(self.PROVIDERS[provider]['api_key_env']):
+        if not self._key_presence[provider]:
             logger.error(f"❌ API key not found for {provider}")
             return False
             
         self.active_provider = provider
         self.provider_config = self.PROVIDERS[provider]
+        self._config_generation += 1
         logger.info(f"🔄 Switched to {self.provider_config['name']}")
         return True
     
     def set_provider_priority(self, priority_list: List[str]) -> Dict[str, str]:
         """Set custom provider priority order"""
+        # Repeating the last request while nothing else changed the config yields the same outcome
+        request_key = tuple(priority_list)
+        if self._last_priority_result is not None:
+            last_key, last_generation, last_result = self._last_priority_result
+            if last_key == request_key and last_generation == self._config_generation:
+                return last_result
+        
         available_providers = []
         unavailable_providers = []
         
         for provider in priority_list:
-            if provider not in self.PROVIDERS:
+            if provider not in self._PROVIDER_SET:
                 unavailable_providers.append(f"{provider} (invalid)")
                 continue
                 
-            if not os.getenv(self.PROVIDERS[provider]['api_key_env']):
+            if not self._key_presence[provider]:
                 unavailable_providers.append(f"{provider} (no API key)")
                 continue
                 
@@ -207,12 +246,13 @@ class AIModelConfig:
             self.provider_config = self.PROVIDERS[self.active_provider]
             
             # Store the custom priority order
-            self.custom_priority_order = available_providers
+            self.custom_priority_order = tuple(available_providers)
+            self._config_generation += 1
             
             logger.info(f"🎯 Priority updated: {' → '.join(available_providers)}")
             logger.info(f"🔄 Active provider: {old_provider} → {self.active_provider}")
             
-            return {
+            result = {
                 "status": "success",
                 "active_provider": self.active_provider,
                 "priority_order": available_providers,
@@ -220,11 +260,14 @@ class AIModelConfig:
             }
         else:
             logger.error("❌ No valid providers in priority list")
-            return {
+            result = {
                 "status": "error",
                 "message": "No valid providers available",
                 "unavailable": unavailable_providers
             }
+        
+        self._last_priority_result = (request_key, self._config_generation, result)
+        return result
     
     def get_current_priority(self) -> Dict[str, Any]:
         """Get current provider priority information"""
@@ -232,9 +275,21 @@ class AIModelConfig:
             "active_provider": self.active_provider,
             "active_provider_name": self.provider_config.get('name', 'Unknown'),
             "fallback_providers": self.get_fallback_providers(),
-            "all_providers": list(self.PROVIDERS.keys()),
-            "available_providers": [p for p in self.PROVIDERS.keys() if os.getenv(self.PROVIDERS[p]['api_key_env'])]
+            "all_providers": _ALL_PROVIDERS,
+            "available_providers": [p for p in _ALL_PROVIDERS if self._key_presence[p]]
         }
 
+# Static parts of the status responses, built once at import (only availability is computed per call)
+_ALL_PROVIDERS = tuple(AIModelConfig.PROVIDERS)
+_PROVIDER_NAMES = MappingProxyType({provider: config['name'] for provider, config in AIModelConfig.PROVIDERS.items()})
+_AI_CAPABILITIES = ('ai_analysis', 'intent_detection', 'sub_query_generation')
+_FALLBACK_PROVIDER_INFO = MappingProxyType({
+    'provider': 'fallback',
+    'name': 'Fallback Mode',
+    'status': 'no_ai_available',
+    'models': (),
+    'capabilities': ('basic_analysis', 'pattern_detection')
+})
+
 # Global instance
 ai_config = AIModelConfig()
@@ -3,34 +3,238 @@ Unified AI Model Interface
 Provides a consistent API for different AI providers (Groq, Gemini, in-house)
 """
 
+import asyncio
+import hashlib
 import json
 import logging
+import os
+import re
+import secrets
+import threading
 import time
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .ai_model_config import ai_config
 
+# Use orjson for request bodies when available, fall back to the standard library
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import httpx for the async provider path, fallback to running the sync path in a thread
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 needs the optional h2 package; without it httpx pools HTTP/1.1 connections
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    """Serialize a request body to JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+# Keyword-based replies for fallback mode, checked in priority order (one compiled scan per bucket)
+_FALLBACK_REPLIES = (
+    (re.compile(r'salary|income|earnings', re.IGNORECASE),
+     "I can help analyze your salary patterns. Please check your transaction data for income entries."),
+    (re.compile(r'expense|spending|cost', re.IGNORECASE),
+     "I can help analyze your spending patterns. Please check your transaction data for expense entries."),
+    (re.compile(r'pattern|trend|analysis', re.IGNORECASE),
+     "I can help identify patterns in your financial data. Please provide specific transaction details."),
+)
+_DEFAULT_FALLBACK_REPLY = "I'm currently in fallback mode. Please check your AI provider configuration or try again later."
+_FALLBACK_REPLY_TEXTS = frozenset(reply for _, reply in _FALLBACK_REPLIES) | {_DEFAULT_FALLBACK_REPLY}
+
+# Providers a failed call can fall back to (in-house models are never used as a fallback)
+_FALLBACK_CAPABLE_PROVIDERS = frozenset(('openai', 'gemini', 'groq'))
+
+# Fixed parts of every Gemini request body, built once
+_GEMINI_GENERATION_DEFAULTS = MappingProxyType({
+    "topP": 0.8,
+    "topK": 40
+})
+_GEMINI_SAFETY_SETTINGS = (
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+)
+
+# Retry backoff: full jitter capped at RETRY_BACKOFF_CAP seconds. SystemRandom draws from the OS,
+# so forked workers don't share a PRNG state and retry in lockstep after a rate-limit window
+RETRY_BACKOFF_CAP = 30
+_jitter = secrets.SystemRandom()
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry `attempt + 1`, preferring the server's Retry-After (in seconds)"""
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_BACKOFF_CAP)
+        except ValueError:
+            pass  # HTTP-date form: fall back to jittered backoff
+    return _jitter.uniform(0, min(RETRY_BACKOFF_CAP, 2 ** attempt))
+
+class _JitteredRetry(Retry):
+    """urllib3 Retry backing off like the async path (Retry-After is still honoured first by urllib3)"""
+    
+    def get_backoff_time(self) -> float:
+        # urllib3's own schedule is 0 for the first retry; use the async path's 2**attempt window instead
+        attempts = len(self.history)
+        if attempts == 0:
+            return 0
+        return _backoff_delay(attempts - 1)
+    
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, RETRY_BACKOFF_CAP)
+
+# In-memory LRU of provider responses for repeated identical prompts
+RESPONSE_CACHE_MAX_SIZE = 4096
+RESPONSE_CACHE_TTL = 900  # 15 minutes
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.5  # Calls at or above this temperature are not cached
+INFLIGHT_MAX_SIZE = 1024  # Max distinct in-flight async requests tracked for coalescing
+
+# Per-provider autotune (opt-in): timeout and default max_tokens follow EMAs of observed calls
+DEFAULT_MAX_TOKENS = 800
+AUTOTUNE_ALPHA = 0.2  # EMA weight of the newest sample
+AUTOTUNE_TIMEOUT_FACTOR = 3  # Timeout as a multiple of the typical latency (approximates a p95 bound)
+AUTOTUNE_MIN_TIMEOUT = 10
+AUTOTUNE_TOKEN_HEADROOM = 1.5  # max_tokens as a multiple of the typical completion length
+AUTOTUNE_MIN_MAX_TOKENS = 256  # Never tune max_tokens below this (avoids truncating JSON answers)
+
+# Shared async client so concurrent requests reuse pooled connections to each provider
+_async_client = None
+
+def _get_async_client() -> "httpx.AsyncClient":
+    """Get the shared httpx client, creating it on first use (or after close)"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(120, connect=5),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        )
+    return _async_client
+
+@lru_cache(maxsize=256)
+def _convert_to_gemini_contents(messages: Tuple[Tuple[str, str], ...]) -> List[Dict[str, Any]]:
+    """Convert (role, content) pairs to Gemini contents; cached since system prompts repeat across calls"""
+    # Collect each turn's text chunks and join once: repeatedly prepending system prompts to the
+    # previous user text would copy the growing string every time
+    turns = []
+    
+    for role, content in messages:
+        # Map OpenAI roles to Gemini roles
+        if role == 'system':
+            # Gemini doesn't have system messages, prepend to user message
+            if turns and turns[-1][0] == 'user':
+                turns[-1][1].append(content)  # Chunks are joined in reverse, so later prompts come first
+            else:
+                # Create a user message with system content
+                turns.append(('user', [content]))
+        elif role == 'user':
+            turns.append(('user', [content]))
+        elif role == 'assistant':
+            turns.append(('model', [content]))
+    
+    return [
+        {"role": role, "parts": [{"text": "\n\n".join(reversed(chunks))}]}
+        for role, chunks in turns
+    ]
+
 class AIModelInterface:
     """Unified interface for different AI model providers"""
     
-    def __init__(self):
-        """Initialize the AI model interface"""
+    # Shared singleton read on every request: slots avoid a per-instance __dict__
+    __slots__ = (
+        'race_fallbacks', '_sessions', '_response_cache', '_response_cache_lock',
+        '_seen_generation', 'config', 'provider', 'api_config',
+        '_dispatch', '_adispatch', '_inflight',
+        'autotune', '_provider_stats'
+    )
+    
+    def __init__(self, race_fallbacks: bool = False, autotune: bool = False):
+        """
+        Initialize the AI model interface
+        
+        Args:
+            race_fallbacks: On the async path, query all fallback providers at once and use the
+                first answer instead of trying them one by one (faster, but may bill several providers)
+            autotune: Derive each provider's timeout and default max_tokens from its measured
+                latency and completion length instead of the fixed defaults
+        """
+        self.race_fallbacks = race_fallbacks
+        self.autotune = autotune
+        self._provider_stats: Dict[str, Dict[str, Any]] = {
+            provider: {'ema_latency': None, 'ema_tokens': None, 'ema_success': 1.0, 'samples': 0}
+            for provider in ai_config.PROVIDERS
+        }
+        self._sessions: Dict[int, requests.Session] = {}
+        self._response_cache: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        self._inflight: Dict[Tuple, "asyncio.Future"] = {}
+        self._seen_generation = -1
         self._refresh_config()
+        
+        # Provider routing tables, built once instead of an if/elif chain per call
+        self._dispatch = {
+            'openai': self._call_openai_api,
+            'groq': self._call_groq_api,
+            'gemini': self._call_gemini_api,
+            'inhouse': self._call_inhouse_api
+        }
+        self._adispatch = {
+            'openai': self._acall_openai_api,
+            'groq': self._acall_groq_api,
+            'gemini': self._acall_gemini_api,
+            'inhouse': self._acall_inhouse_api
+        }
     
-    def _refresh_config(self):
-        """Refresh configuration from the latest config"""
-        # Force a complete refresh of the AI config
+    def _refresh_config(self, force: bool = False):
+        """
+        Sync provider settings from the shared AI config
+        
+        The sync is skipped while the config generation is unchanged, so the steady-state
+        call path does no env/provider detection. force=True re-detects providers from the
+        environment first.
+        """
         self.config = ai_config
-        self.config.refresh_configuration()
+        if force:
+            self.config.refresh_configuration()
+        elif self._seen_generation == self.config._config_generation:
+            return
+        
         self.provider = self.config.active_provider
         self.api_config = self.config.get_api_config()
+        self._seen_generation = self.config._config_generation
         
     def call_ai_model(self, messages: List[Dict[str, str]], 
                       model: Optional[str] = None, 
                       temperature: float = 0.1, 
-                      max_tokens: int = 800,
+                      max_tokens: Optional[int] = None,
                       max_retries: int = 1) -> Optional[str]:
         """
         Unified method to call any AI model
@@ -39,17 +243,19 @@ class AIModelInterface:
             messages: List of message dictionaries with 'role' and 'content'
             model: Model name (uses default if not specified)
             temperature: Creativity level (0.0 to 1.0)
-            max_tokens: Maximum tokens in response
+            max_tokens: Maximum tokens in response (800, or the autotuned value, when not given)
             max_retries: Number of retry attempts
             
         Returns:
             AI response text or None if failed
         """
-        # Refresh config to ensure we use the latest provider priority
+        # Pick up provider/priority changes made since the last call
         self._refresh_config()
         
         # Log the current priority order for debugging
-        logger.info(f"🎯 AI Provider Priority: {self.provider} → {self.config.get_fallback_providers()}")
+        # get_fallback_providers() is only worth computing when the line is emitted
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("🎯 AI Provider Priority: %s → %s", self.provider, self.config.get_fallback_providers())
         
         if not self.config.is_available():
             logger.warning("⚠️ No AI provider available - using fallback")
@@ -60,354 +266,715 @@ class AIModelInterface:
             model = self.api_config.get('default_model', 'default')
         
         # Route to appropriate provider with detailed logging
-        logger.info(f"🚀 Attempting {self.provider.upper()} API call...")
-        
-        if self.provider == 'openai':
-            return self._call_openai_api(messages, model, temperature, max_tokens, max_retries)
-        elif self.provider == 'groq':
-            return self._call_groq_api(messages, model, temperature, max_tokens, max_retries)
-        elif self.provider == 'gemini':
-            return self._call_gemini_api(messages, model, temperature, max_tokens, max_retries)
-        elif self.provider == 'inhouse':
-            return self._call_inhouse_api(messages, model, temperature, max_tokens, max_retries)
-        else:
+        logger.info("🚀 Attempting %s API call...", self.provider.upper())
+        
+        handler = self._dispatch.get(self.provider)
+        if handler is None:
             return self._fallback_response(messages)
+        
+        timeout, max_tokens = self._autotuned_limits(max_tokens)
+        cache_key = self._response_cache_key(messages, model, temperature, max_tokens)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        provider, started = self.provider, time.monotonic()
+        result = handler(messages, model, temperature, max_tokens, max_retries, timeout, api_config=self.api_config)
+        self._record_call_stats(provider, time.monotonic() - started, result)
+        self._store_response(cache_key, result)
+        return result
+    
+    def _autotuned_limits(self, max_tokens: Optional[int]) -> Tuple[Optional[float], int]:
+        """Timeout (None = provider default) and max_tokens for the next call to the current provider"""
+        stats = self._provider_stats.get(self.provider)
+        if not self.autotune or not stats or not stats['samples']:
+            return None, max_tokens or DEFAULT_MAX_TOKENS
+        
+        timeout = max(AUTOTUNE_MIN_TIMEOUT, stats['ema_latency'] * AUTOTUNE_TIMEOUT_FACTOR)
+        # An explicit max_tokens from the caller always wins
+        if max_tokens is None:
+            if stats['ema_tokens'] is None:
+                max_tokens = DEFAULT_MAX_TOKENS
+            else:
+                max_tokens = max(AUTOTUNE_MIN_MAX_TOKENS, int(stats['ema_tokens'] * AUTOTUNE_TOKEN_HEADROOM))
+        return timeout, max_tokens
+    
+    def _record_call_stats(self, provider: str, elapsed: float, result: Optional[str]):
+        """Fold one provider call into its latency/completion-length/success EMAs"""
+        stats = self._provider_stats.get(provider)
+        if stats is None:
+            return
+        
+        def ema(previous: Optional[float], sample: float) -> float:
+            return sample if previous is None else previous + AUTOTUNE_ALPHA * (sample - previous)
+        
+        # Failed calls count toward latency too, so a too-tight timeout widens itself again.
+        # Updates are unlocked: a lost sample under concurrency only nudges an estimate.
+        succeeded = bool(result) and result not in _FALLBACK_REPLY_TEXTS
+        stats['ema_latency'] = ema(stats['ema_latency'], elapsed)
+        stats['ema_success'] = ema(stats['ema_success'], 1.0 if succeeded else 0.0)
+        if succeeded:
+            stats['ema_tokens'] = ema(stats['ema_tokens'], len(result) / 4)  # ~4 characters per token
+        stats['samples'] += 1
+    
+    def get_autotune_status(self) -> Dict[str, Any]:
+        """Per-provider latency/completion-length stats and the limits autotune derives from them"""
+        providers = {}
+        for provider, stats in self._provider_stats.items():
+            if not stats['samples']:
+                continue
+            entry = dict(stats)
+            if self.autotune:
+                entry['tuned_timeout'] = max(AUTOTUNE_MIN_TIMEOUT, stats['ema_latency'] * AUTOTUNE_TIMEOUT_FACTOR)
+                if stats['ema_tokens'] is not None:
+                    entry['tuned_max_tokens'] = max(AUTOTUNE_MIN_MAX_TOKENS,
+                                                    int(stats['ema_tokens'] * AUTOTUNE_TOKEN_HEADROOM))
+            providers[provider] = entry
+        return {'enabled': self.autotune, 'providers': providers}
+    
+    def _response_cache_key(self, messages: List[Dict[str, str]], model: str,
+                            temperature: float, max_tokens: int) -> Optional[Tuple]:
+        """Cache key for a call, or None when the call should not be cached"""
+        # Creative (higher temperature) generations are expected to differ between calls
+        if temperature >= RESPONSE_CACHE_MAX_TEMPERATURE:
+            return None
+        digest = hashlib.blake2b(_dumps(messages), digest_size=16).hexdigest()
+        return (self.provider, model, round(temperature, 2), max_tokens, digest)
+    
+    def _get_cached_response(self, cache_key: Optional[Tuple]) -> Optional[str]:
+        """Get a cached response if present and not expired"""
+        if cache_key is None:
+            return None
+        with self._response_cache_lock:
+            entry = self._response_cache.get(cache_key)
+            if entry is None:
+                return None
+            response, timestamp = entry
+            if time.monotonic() - timestamp >= RESPONSE_CACHE_TTL:
+                del self._response_cache[cache_key]
+                return None
+            self._response_cache.move_to_end(cache_key)
+        logger.info("⚡ Using cached AI response (%s)", self.provider)
+        return response
+    
+    def _store_response(self, cache_key: Optional[Tuple], response: Optional[str]):
+        """Cache a provider response (keyword fallback replies are never cached)"""
+        if cache_key is None or not response or response in _FALLBACK_REPLY_TEXTS:
+            return
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = (response, time.monotonic())
+            self._response_cache.move_to_end(cache_key)
+            while len(self._response_cache) > RESPONSE_CACHE_MAX_SIZE:
+                self._response_cache.popitem(last=False)
+    
+    def _get_session(self, max_retries: int) -> requests.Session:
+        """
+        Get the pooled session for a retry budget
+        
+        Sessions keep TCP/TLS connections alive across calls, and their urllib3 Retry
+        handles 429/5xx retries with backoff (honouring Retry-After). One session is
+        kept per retry budget since Retry is configured on the mounted adapter.
+        """
+        session = self._sessions.get(max_retries)
+        if session is None:
+            retry = _JitteredRetry(
+                total=max_retries,
+                backoff_factor=1,
+                status_forcelist=[429, 502, 503, 504],
+                allowed_methods=None,  # Retry POSTs too: chat completions are safe to resend
+                raise_on_status=False  # Hand the final 429 back so provider fallback can kick in
+            )
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._sessions[max_retries] = session
+        return session
     
     def _call_openai_api(self, messages: List[Dict[str, str]], 
                          model: str, temperature: float, 
-                         max_tokens: int, max_retries: int) -> Optional[str]:
+                         max_tokens: int, max_retries: int,
+                         timeout: Optional[float] = None,
+                         attempted: FrozenSet[str] = frozenset(),
+                         api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Call OpenAI API with rate limit handling"""
         logger.info("🔵 OpenAI API: Starting request...")
-        api_key = self.api_config['api_key']
-        api_url = self.api_config['api_url']
+        api_config = api_config or self.api_config
+        attempted = attempted | {'openai'}
+        api_url = api_config['api_url']
+        headers, body = self._build_chat_request(messages, model, temperature, max_tokens, api_config)
+        
+        try:
+            response = self._get_session(max_retries).post(api_url, headers=headers, data=body, timeout=timeout or 120)
+            
+            if response.status_code == 429:  # Still rate limited after retries
+                logger.warning("OpenAI rate limit exceeded, trying fallback")
+                return self._try_fallback_provider(messages, model, temperature, max_tokens, attempted)
+            
+            response.raise_for_status()
+            result = response.json()
+            return result['choices'][0]['message']['content']
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error("🔵 OpenAI API call failed: %s", e)
+            logger.error("🔵 Response status: %s", e.response.status_code)
+            logger.error("🔵 Response body: %s", e.response.text)
+            return self._try_fallback_provider(messages, model, temperature, max_tokens, attempted)
+        except Exception as e:
+            logger.error("OpenAI API call failed: %s", e)
+            return None
+    
+    def _call_groq_api(self, messages: List[Dict[str, str]], 
+                       model: str, temperature: float, 
+                       max_tokens: int, max_retries: int,
+                       timeout: Optional[float] = None,
+                       attempted: FrozenSet[str] = frozenset(),
+                       api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call Groq API with rate limit handling"""
+        logger.info("🟠 Groq API: Starting request...")
+        api_config = api_config or self.api_config
+        attempted = attempted | {'groq'}
+        api_url = api_config['api_url']
+        headers, body = self._build_chat_request(messages, model, temperature, max_tokens, api_config)
+        
+        try:
+            response = self._get_session(max_retries).post(api_url, headers=headers, data=body, timeout=timeout or 20)
+            
+            if response.status_code == 429:  # Still rate limited after retries
+                logger.warning("Rate limit exceeded, trying fallback")
+                return self._try_fallback_provider(messages, model, temperature, max_tokens, attempted)
+            
+            response.raise_for_status()
+            result = response.json()
+            return result['choices'][0]['message']['content']
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error("Groq API call failed: %s", e)
+            logger.error("Response status: %s", e.response.status_code)
+            logger.error("Response body: %s", e.response.text)
+            return None
+        except Exception as e:
+            logger.error("Groq API call failed: %s", e)
+            return None
+    
+    def _call_gemini_api(self, messages: List[Dict[str, str]], 
+                         model: str, temperature: float, 
+                         max_tokens: int, max_retries: int,
+                         timeout: Optional[float] = None,
+                         attempted: FrozenSet[str] = frozenset(),
+                         api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call Google Gemini API"""
+        logger.info("🟢 Gemini API: Starting request...")
+        attempted = attempted | {'gemini'}
+        url_with_key, headers, body = self._build_gemini_request(messages, temperature, max_tokens, api_config)
+        
+        try:
+            response = self._get_session(max_retries).post(url_with_key, headers=headers, data=body, timeout=timeout or 120)
+            
+            if response.status_code == 429:  # Still rate limited after retries
+                logger.warning("Gemini rate limit exceeded, trying fallback")
+                return self._try_fallback_provider(messages, model, temperature, max_tokens, attempted)
+            
+            response.raise_for_status()
+            return self._extract_gemini_text(response.json())
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error("Gemini API call failed: %s", e)
+            logger.error("Response status: %s", e.response.status_code)
+            logger.error("Response body: %s", e.response.text)
+            return None
+        except Exception as e:
+            logger.error("Gemini API call failed: %s", e)
+            return None
+    
+    def _call_inhouse_api(self, messages: List[Dict[str, str]], 
+                          model: str, temperature: float, 
+                          max_tokens: int, max_retries: int,
+                          timeout: Optional[float] = None,
+                          api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call in-house model API"""
+        api_config = api_config or self.api_config
+        api_url = api_config.get('api_url')
+        
+        if not api_url:
+            logger.error("In-house API URL not configured")
+            return None
+        
+        headers, body = self._build_inhouse_request(messages, model, temperature, max_tokens, api_config)
+        
+        try:
+            response = self._get_session(max_retries).post(api_url, headers=headers, data=body, timeout=timeout or 120)
+            response.raise_for_status()
+            return self._extract_inhouse_text(response.json())
+                
+        except Exception as e:
+            logger.error("In-house API call failed: %s", e)
+            return None
+    
+    def _build_chat_request(self, messages: List[Dict[str, str]], model: str,
+                            temperature: float, max_tokens: int,
+                            api_config: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], bytes]:
+        """Build headers and the serialized body for OpenAI-compatible chat completion APIs (OpenAI, Groq)"""
+        api_config = api_config or self.api_config
+        headers = {
+            "Authorization": f"Bearer {api_config['api_key']}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+        return headers, _dumps(data)
+    
+    def _build_gemini_request(self, messages: List[Dict[str, str]], temperature: float,
+                              max_tokens: int,
+                              api_config: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, str], bytes]:
+        """Build URL, headers and the serialized body for the Gemini generateContent API"""
+        api_config = api_config or self.api_config
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # Gemini API parameters - updated for v1 API
+        data = {
+            "contents": self._convert_to_gemini_format(messages),
+            "generationConfig": {
+                **_GEMINI_GENERATION_DEFAULTS,
+                "temperature": temperature,
+                "maxOutputTokens": max_tokens
+            },
+            "safetySettings": _GEMINI_SAFETY_SETTINGS
+        }
+        
+        # Add API key to URL for Gemini
+        url_with_key = f"{api_config['api_url']}?key={api_config['api_key']}"
+        return url_with_key, headers, _dumps(data)
+    
+    def _build_inhouse_request(self, messages: List[Dict[str, str]], model: str,
+                               temperature: float, max_tokens: int,
+                               api_config: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], bytes]:
+        """Build headers and the serialized body for the in-house model API"""
+        api_key = (api_config or self.api_config).get('api_key')
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # Add API key to headers if provided
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        
+        # Assume in-house API follows OpenAI format
+        data = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        return headers, _dumps(data)
+    
+    def _extract_gemini_text(self, result: Dict[str, Any]) -> Optional[str]:
+        """Extract text from Gemini response - updated for v1 API"""
+        if 'candidates' in result and len(result['candidates']) > 0:
+            content = result['candidates'][0].get('content', {})
+            if 'parts' in content and len(content['parts']) > 0:
+                return content['parts'][0].get('text', '')
+        
+        logger.warning("Unexpected Gemini response format")
+        return None
+    
+    def _extract_inhouse_text(self, result: Dict[str, Any]) -> Optional[str]:
+        """Extract text from the in-house API response (adapt based on your in-house API format)"""
+        if 'choices' in result and len(result['choices']) > 0:
+            return result['choices'][0]['message']['content']
+        elif 'response' in result:
+            return result['response']
+        elif 'text' in result:
+            return result['text']
+        else:
+            logger.warning("Unexpected in-house API response format")
+            return None
+    
+    async def acall_ai_model(self, messages: List[Dict[str, str]], 
+                             model: Optional[str] = None, 
+                             temperature: float = 0.1, 
+                             max_tokens: Optional[int] = None,
+                             max_retries: int = 1) -> Optional[str]:
+        """
+        Async variant of call_ai_model for use inside the event loop
+        
+        Provider calls go through one shared httpx client, so concurrent requests overlap
+        their network waits instead of blocking the loop. Without httpx the sync path runs
+        in a worker thread.
+        
+        Returns:
+            AI response text or None if failed
+        """
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.call_ai_model, messages, model, temperature, max_tokens, max_retries)
+        
+        # Pick up provider/priority changes made since the last call
+        self._refresh_config()
+        
+        # get_fallback_providers() is only worth computing when the line is emitted
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("🎯 AI Provider Priority: %s → %s", self.provider, self.config.get_fallback_providers())
+        
+        if not self.config.is_available():
+            logger.warning("⚠️ No AI provider available - using fallback")
+            return self._fallback_response(messages)
+        
+        # Use default model if none specified
+        if not model:
+            model = self.api_config.get('default_model', 'default')
+        
+        logger.info("🚀 Attempting async %s API call...", self.provider.upper())
+        
+        handler = self._adispatch.get(self.provider)
+        if handler is None:
+            return self._fallback_response(messages)
+        
+        timeout, max_tokens = self._autotuned_limits(max_tokens)
+        cache_key = self._response_cache_key(messages, model, temperature, max_tokens)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        if cache_key is None:
+            return await self._acall_measured(handler, messages, model, temperature, max_tokens, max_retries, timeout)
+        
+        # Coalesce identical concurrent requests: later arrivals await the first one's answer
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            logger.info("⚡ Joining in-flight AI request (%s)", self.provider)
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        if len(self._inflight) < INFLIGHT_MAX_SIZE:
+            self._inflight[cache_key] = future
+        try:
+            result = await self._acall_measured(handler, messages, model, temperature, max_tokens, max_retries, timeout)
+            future.set_result(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved in case nobody joined
+            raise
+        finally:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+        
+        self._store_response(cache_key, result)
+        return result
+    
+    async def _acall_measured(self, handler, messages: List[Dict[str, str]], model: str, temperature: float,
+                              max_tokens: int, max_retries: int, timeout: Optional[float]) -> Optional[str]:
+        """Await a provider handler and record its latency/outcome for autotune"""
+        provider, started = self.provider, time.monotonic()
+        result = await handler(messages, model, temperature, max_tokens, max_retries, timeout, api_config=self.api_config)
+        self._record_call_stats(provider, time.monotonic() - started, result)
+        return result
+    
+    async def _acall_openai_api(self, messages: List[Dict[str, str]], 
+                                model: str, temperature: float, 
+                                max_tokens: int, max_retries: int,
+                                timeout: Optional[float] = None,
+                                attempted: FrozenSet[str] = frozenset(),
+                                api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call OpenAI API asynchronously with rate limit handling"""
+        logger.info("🔵 OpenAI API: Starting async request...")
+        api_config = api_config or self.api_config
+        attempted = attempted | {'openai'}
+        api_url = api_config['api_url']
+        headers, body = self._build_chat_request(messages, model, temperature, max_tokens, api_config)
         
         for attempt in range(max_retries + 1):
             try:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "messages": messages,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                }
-                
-                response = requests.post(api_url, headers=headers, json=data, timeout=120)
+                response = await _get_async_client().post(api_url, headers=headers, content=body, timeout=timeout or 120)
                 
                 if response.status_code == 429:  # Rate limit
                     if attempt < max_retries:
-                        wait_time = 2 ** attempt  # Exponential backoff
-                        logger.warning(f"OpenAI rate limited, waiting {wait_time}s before retry {attempt + 1}")
-                        time.sleep(wait_time)
+                        wait_time = _backoff_delay(attempt, response.headers.get('Retry-After'))
+                        logger.warning("OpenAI rate limited, waiting %.1fs before retry %s", wait_time, attempt + 1)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         logger.warning("OpenAI rate limit exceeded, trying fallback")
-                        return self._try_fallback_provider(messages, model, temperature, max_tokens)
+                        return await self._atry_fallback_provider(messages, model, temperature, max_tokens, attempted)
                 
                 response.raise_for_status()
                 result = response.json()
                 return result['choices'][0]['message']['content']
                 
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    logger.warning("🔵 OpenAI rate limit hit, trying fallback")
-                    return self._try_fallback_provider(messages, model, temperature, max_tokens)
-                else:
-                    logger.error(f"🔵 OpenAI API call failed: {e}")
-                    logger.error(f"🔵 Response status: {e.response.status_code}")
-                    logger.error(f"🔵 Response body: {e.response.text}")
-                    return self._try_fallback_provider(messages, model, temperature, max_tokens)
+            except httpx.HTTPStatusError as e:
+                logger.error("🔵 OpenAI API call failed: %s", e)
+                logger.error("🔵 Response status: %s", e.response.status_code)
+                logger.error("🔵 Response body: %s", e.response.text)
+                return await self._atry_fallback_provider(messages, model, temperature, max_tokens, attempted)
             except Exception as e:
-                logger.error(f"OpenAI API call failed: {e}")
+                logger.error("OpenAI API call failed: %s", e)
                 return None
         
         return None
     
-    def _call_groq_api(self, messages: List[Dict[str, str]], 
-                       model: str, temperature: float, 
-                       max_tokens: int, max_retries: int) -> Optional[str]:
-        """Call Groq API with rate limit handling"""
-        logger.info("🟠 Groq API: Starting request...")
-        api_key = self.api_config['api_key']
-        api_url = self.api_config['api_url']
+    async def _acall_groq_api(self, messages: List[Dict[str, str]], 
+                              model: str, temperature: float, 
+                              max_tokens: int, max_retries: int,
+                              timeout: Optional[float] = None,
+                              attempted: FrozenSet[str] = frozenset(),
+                              api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call Groq API asynchronously with rate limit handling"""
+        logger.info("🟠 Groq API: Starting async request...")
+        api_config = api_config or self.api_config
+        attempted = attempted | {'groq'}
+        api_url = api_config['api_url']
+        headers, body = self._build_chat_request(messages, model, temperature, max_tokens, api_config)
         
         for attempt in range(max_retries + 1):
             try:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "messages": messages,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                }
-                
-                response = requests.post(api_url, headers=headers, json=data, timeout=20)
+                response = await _get_async_client().post(api_url, headers=headers, content=body, timeout=timeout or 20)
                 
                 if response.status_code == 429:  # Rate limit
                     if attempt < max_retries:
-                        wait_time = 1
-                        logger.warning(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}")
-                        time.sleep(wait_time)
+                        wait_time = _backoff_delay(attempt, response.headers.get('Retry-After'))
+                        logger.warning("Rate limited, waiting %.1fs before retry %s", wait_time, attempt + 1)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         logger.warning("Rate limit exceeded, trying fallback")
-                        return self._try_fallback_provider(messages, model, temperature, max_tokens)
+                        return await self._atry_fallback_provider(messages, model, temperature, max_tokens, attempted)
                 
                 response.raise_for_status()
                 result = response.json()
                 return result['choices'][0]['message']['content']
                 
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    logger.warning("Rate limit hit, trying fallback")
-                    return self._try_fallback_provider(messages, model, temperature, max_tokens)
-                else:
-                    logger.error(f"Groq API call failed: {e}")
-                    logger.error(f"Response status: {e.response.status_code}")
-                    logger.error(f"Response body: {e.response.text}")
-                    return None
+            except httpx.HTTPStatusError as e:
+                logger.error("Groq API call failed: %s", e)
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response body: %s", e.response.text)
+                return None
             except Exception as e:
-                logger.error(f"Groq API call failed: {e}")
+                logger.error("Groq API call failed: %s", e)
                 return None
         
         return None
     
-    def _call_gemini_api(self, messages: List[Dict[str, str]], 
-                         model: str, temperature: float, 
-                         max_tokens: int, max_retries: int) -> Optional[str]:
-        """Call Google Gemini API"""
-        logger.info("🟢 Gemini API: Starting request...")
-        api_key = self.api_config['api_key']
-        api_url = self.api_config['api_url']
-        
-        # Convert OpenAI format to Gemini format
-        gemini_messages = self._convert_to_gemini_format(messages)
+    async def _acall_gemini_api(self, messages: List[Dict[str, str]], 
+                                model: str, temperature: float, 
+                                max_tokens: int, max_retries: int,
+                                timeout: Optional[float] = None,
+                                attempted: FrozenSet[str] = frozenset(),
+                                api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call Google Gemini API asynchronously"""
+        logger.info("🟢 Gemini API: Starting async request...")
+        attempted = attempted | {'gemini'}
+        url_with_key, headers, body = self._build_gemini_request(messages, temperature, max_tokens, api_config)
         
         for attempt in range(max_retries + 1):
             try:
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                
-                # Gemini API parameters - updated for v1 API
-                data = {
-                    "contents": gemini_messages,
-                    "generationConfig": {
-                        "temperature": temperature,
-                        "maxOutputTokens": max_tokens,
-                        "topP": 0.8,
-                        "topK": 40
-                    },
-                    "safetySettings": [
-                        {
-                            "category": "HARM_CATEGORY_HARASSMENT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_HATE_SPEECH",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        }
-                    ]
-                }
-                
-                # Add API key to URL for Gemini
-                url_with_key = f"{api_url}?key={api_key}"
-                response = requests.post(url_with_key, headers=headers, json=data, timeout=120)
+                response = await _get_async_client().post(url_with_key, headers=headers, content=body, timeout=timeout or 120)
                 
                 if response.status_code == 429:  # Rate limit
                     if attempt < max_retries:
-                        wait_time = 2
-                        logger.warning(f"Gemini rate limited, waiting {wait_time}s before retry {attempt + 1}")
-                        time.sleep(wait_time)
+                        wait_time = _backoff_delay(attempt, response.headers.get('Retry-After'))
+                        logger.warning("Gemini rate limited, waiting %.1fs before retry %s", wait_time, attempt + 1)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         logger.warning("Gemini rate limit exceeded, trying fallback")
-                        return self._try_fallback_provider(messages, model, temperature, max_tokens)
+                        return await self._atry_fallback_provider(messages, model, temperature, max_tokens, attempted)
                 
                 response.raise_for_status()
-                result = response.json()
+                return self._extract_gemini_text(response.json())
                 
-                # Extract text from Gemini response - updated for v1 API
-                if 'candidates' in result and len(result['candidates']) > 0:
-                    content = result['candidates'][0].get('content', {})
-                    if 'parts' in content and len(content['parts']) > 0:
-                        return content['parts'][0].get('text', '')
-                
-                logger.warning("Unexpected Gemini response format")
+            except httpx.HTTPStatusError as e:
+                logger.error("Gemini API call failed: %s", e)
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response body: %s", e.response.text)
                 return None
-                
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    logger.warning("Gemini rate limit hit, trying fallback")
-                    return self._try_fallback_provider(messages, model, temperature, max_tokens)
-                else:
-                    logger.error(f"Gemini API call failed: {e}")
-                    logger.error(f"Response status: {e.response.status_code}")
-                    logger.error(f"Response body: {e.response.text}")
-                    return None
             except Exception as e:
-                logger.error(f"Gemini API call failed: {e}")
+                logger.error("Gemini API call failed: %s", e)
                 return None
         
         return None
     
-    def _call_inhouse_api(self, messages: List[Dict[str, str]], 
-                          model: str, temperature: float, 
-                          max_tokens: int, max_retries: int) -> Optional[str]:
-        """Call in-house model API"""
-        api_key = self.api_config.get('api_key')
-        api_url = self.api_config.get('api_url')
+    async def _acall_inhouse_api(self, messages: List[Dict[str, str]], 
+                                 model: str, temperature: float, 
+                                 max_tokens: int, max_retries: int,
+                                 timeout: Optional[float] = None,
+                                 api_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Call in-house model API asynchronously"""
+        api_config = api_config or self.api_config
+        api_url = api_config.get('api_url')
         
         if not api_url:
             logger.error("In-house API URL not configured")
             return None
         
+        headers, body = self._build_inhouse_request(messages, model, temperature, max_tokens, api_config)
+        
         for attempt in range(max_retries + 1):
             try:
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                
-                # Add API key to headers if provided
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-                
-                # Assume in-house API follows OpenAI format
-                data = {
-                    "messages": messages,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                }
-                
-                response = requests.post(api_url, headers=headers, json=data, timeout=120)
+                response = await _get_async_client().post(api_url, headers=headers, content=body, timeout=timeout or 120)
                 response.raise_for_status()
-                result = response.json()
-                
-                # Try to extract response (adapt based on your in-house API format)
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content']
-                elif 'response' in result:
-                    return result['response']
-                elif 'text' in result:
-                    return result['text']
-                else:
-                    logger.warning("Unexpected in-house API response format")
-                    return None
+                return self._extract_inhouse_text(response.json())
                     
             except Exception as e:
-                logger.error(f"In-house API call failed: {e}")
+                logger.error("In-house API call failed: %s", e)
                 if attempt < max_retries:
-                    time.sleep(1)
+                    await asyncio.sleep(_backoff_delay(attempt))
                     continue
                 return None
         
         return None
     
-    def _convert_to_gemini_format(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
-        """Convert OpenAI format messages to Gemini format"""
-        gemini_messages = []
+    async def _atry_fallback_provider(self, messages: List[Dict[str, str]], 
+                                      model: str, temperature: float, 
+                                      max_tokens: int,
+                                      attempted: FrozenSet[str] = frozenset()) -> Optional[str]:
+        """Async counterpart of _try_fallback_provider"""
+        # Prevent infinite recursion: the failing handler has already marked its provider as attempted.
+        # The set travels with the call, so concurrent requests never see each other's history.
         
-        for message in messages:
-            role = message['role']
-            content = message['content']
-            
-            # Map OpenAI roles to Gemini roles
-            if role == 'system':
-                # Gemini doesn't have system messages, prepend to user message
-                if gemini_messages and gemini_messages[-1]['role'] == 'user':
-                    gemini_messages[-1]['parts'][0]['text'] = f"{content}\n\n{gemini_messages[-1]['parts'][0]['text']}"
-                else:
-                    # Create a user message with system content
-                    gemini_messages.append({
-                        "role": "user",
-                        "parts": [{"text": content}]
-                    })
-            elif role == 'user':
-                gemini_messages.append({
-                    "role": "user",
-                    "parts": [{"text": content}]
-                })
-            elif role == 'assistant':
-                gemini_messages.append({
-                    "role": "model",
-                    "parts": [{"text": content}]
-                })
-        
-        return gemini_messages
+        fallback_providers = self.config.get_fallback_providers()
+        
+        if self.race_fallbacks:
+            candidates = [provider for provider in fallback_providers
+                          if provider not in attempted and provider in _FALLBACK_CAPABLE_PROVIDERS]
+            result = await self._race_providers(candidates, messages, temperature, max_tokens) if candidates else None
+            if result:
+                return result
+            logger.warning("All fallback providers exhausted")
+            return self._fallback_response(messages)
+        
+        # The fallback's settings go to its handler as arguments, so the shared instance stays on the
+        # primary provider even while concurrent requests are mid-fallback
+        for provider in fallback_providers:
+            # Skip if we've already tried this provider
+            if provider in attempted or provider not in _FALLBACK_CAPABLE_PROVIDERS:
+                continue
+                
+            logger.info("🔄 Trying fallback provider: %s", provider)
+            if self.config.has_api_key(provider):
+                attempted = attempted | {provider}
+                
+                # Call the specific provider method directly to avoid recursion
+                result = await self._adispatch[provider](messages, model, temperature, max_tokens, max_retries=0,
+                                                         attempted=attempted, api_config=self.config.get_api_config(provider))
+                
+                if result:
+                    return result
+        
+        logger.warning("All fallback providers exhausted")
+        return self._fallback_response(messages)
+    
+    async def _acall_provider_once(self, provider: str, messages: List[Dict[str, str]],
+                                   temperature: float, max_tokens: int) -> Optional[str]:
+        """Single request to one provider with its own settings and default model (no retries or fallback)"""
+        api_config = self.config.get_api_config(provider)
+        model = api_config.get('default_model', 'default')
+        
+        if provider == 'gemini':
+            url, headers, body = self._build_gemini_request(messages, temperature, max_tokens, api_config)
+        else:
+            url = api_config['api_url']
+            headers, body = self._build_chat_request(messages, model, temperature, max_tokens, api_config)
+        
+        try:
+            response = await _get_async_client().post(url, headers=headers, content=body,
+                                                      timeout=20 if provider == 'groq' else 120)
+            response.raise_for_status()
+            result = response.json()
+            if provider == 'gemini':
+                return self._extract_gemini_text(result)
+            return result['choices'][0]['message']['content']
+        except Exception as e:
+            logger.warning("🏁 %s failed during fallback race: %s", provider, e)
+            return None
+    
+    async def _race_providers(self, providers: List[str], messages: List[Dict[str, str]],
+                              temperature: float, max_tokens: int) -> Optional[str]:
+        """Query providers concurrently and return the first usable answer, cancelling the rest"""
+        logger.info("🏁 Racing fallback providers: %s", ', '.join(providers))
+        pending = {
+            asyncio.create_task(self._acall_provider_once(provider, messages, temperature, max_tokens))
+            for provider in providers
+        }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result:
+                        return result
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def close(self):
+        """Close the pooled sync HTTP sessions"""
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+    
+    async def aclose(self):
+        """Close the shared async HTTP client and pooled sessions (call on application shutdown)"""
+        global _async_client
+        self.close()
+        if _async_client is not None and not _async_client.is_closed:
+            await _async_client.aclose()
+        _async_client = None
+    
+    def _convert_to_gemini_format(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Convert OpenAI format messages to Gemini format (cached; treat the result as read-only)"""
+        return _convert_to_gemini_contents(tuple((message['role'], message['content']) for message in messages))
     
     def _try_fallback_provider(self, messages: List[Dict[str, str]], 
                               model: str, temperature: float, 
-                              max_tokens: int) -> Optional[str]:
+                              max_tokens: int,
+                              attempted: FrozenSet[str] = frozenset()) -> Optional[str]:
         """Try to use a fallback provider if available (prevents infinite loops)"""
-        # Prevent infinite recursion by tracking attempted providers
-        if not hasattr(self, '_attempted_providers'):
-            self._attempted_providers = set()
-        
-        # Mark current provider as attempted
-        self._attempted_providers.add(self.provider)
+        # Prevent infinite recursion: the failing handler has already marked its provider as attempted.
+        # The set travels with the call, so concurrent requests never see each other's history.
         
         fallback_providers = self.config.get_fallback_providers()
         
+        # The fallback's settings go to its handler as arguments, so the shared instance stays on the
+        # primary provider even while concurrent requests are mid-fallback
         for provider in fallback_providers:
             # Skip if we've already tried this provider
-            if provider in self._attempted_providers:
+            if provider in attempted or provider not in _FALLBACK_CAPABLE_PROVIDERS:
                 continue
                 
-            logger.info(f"🔄 Trying fallback provider: {provider}")
-            if self.config.switch_provider(provider):
-                self.provider = provider
-                self.api_config = self.config.get_api_config()
-                self._attempted_providers.add(provider)
+            logger.info("🔄 Trying fallback provider: %s", provider)
+            if self.config.has_api_key(provider):
+                attempted = attempted | {provider}
                 
                 # Call the specific provider method directly to avoid recursion
-                if provider == 'openai':
-                    result = self._call_openai_api(messages, model, temperature, max_tokens, max_retries=0)
-                elif provider == 'gemini':
-                    result = self._call_gemini_api(messages, model, temperature, max_tokens, max_retries=0)
-                elif provider == 'groq':
-                    result = self._call_groq_api(messages, model, temperature, max_tokens, max_retries=0)
-                else:
-                    result = None
+                result = self._dispatch[provider](messages, model, temperature, max_tokens, max_retries=0,
+                                                  attempted=attempted, api_config=self.config.get_api_config(provider))
                 
                 if result:
-                    # Clear attempted providers on success
-                    self._attempted_providers.clear()
                     return result
         
         logger.warning("All fallback providers exhausted")
-        self._attempted_providers.clear()
         return self._fallback_response(messages)
     
     def _fallback_response(self, messages: List[Dict[str, str]]) -> str:
         """Provide a basic fallback response when no AI is available"""
         # Extract the last user message
-        user_message = ""
-        for message in reversed(messages):
-            if message['role'] == 'user':
-                user_message = message['content']
-                break
+        user_message = next((message['content'] for message in reversed(messages) if message['role'] == 'user'), "")
         
         # Simple keyword-based responses
-        query_lower = user_message.lower()
-        
-        if any(word in query_lower for word in ['salary', 'income', 'earnings']):
-            return "I can help analyze your salary patterns. Please check your transaction data for income entries."
-        elif any(word in query_lower for word in ['expense', 'spending', 'cost']):
-            return "I can help analyze your spending patterns. Please check your transaction data for expense entries."
-        elif any(word in query_lower for word in ['pattern', 'trend', 'analysis']):
-            return "I can help identify patterns in your financial data. Please provide specific transaction details."
-        else:
-            return "I'm currently in fallback mode. Please check your AI provider configuration or try again later."
+        for keywords, reply in _FALLBACK_REPLIES:
+            if keywords.search(user_message):
+                return reply
+        return _DEFAULT_FALLBACK_REPLY
     
     def get_status(self) -> Dict[str, Any]:
         """Get current AI model status"""
@@ -419,4 +986,7 @@ class AIModelInterface:
         }
 
 # Global instance
-ai_interface = AIModelInterface()
+ai_interface = AIModelInterface(
+    race_fallbacks=os.getenv('AI_RACE_FALLBACKS', 'false').lower() == 'true',
+    autotune=os.getenv('AI_AUTOTUNE', 'false').lower() == 'true'
+)
@@ -5,12 +5,209 @@ Detects spending spikes, pattern breaks, and unusual behavior.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+import math
+import re
+from typing import Dict, List, Optional, Tuple
 import logging
 
+# Try to import numba for the JIT-compiled daily spike kernel, fallback to numpy
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Try to import pyahocorasick for the single-pass health keyword scan, fallback to regex
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# The only input columns the detectors read; everything else is dropped up front
+ANOMALY_COLUMNS = ('transaction_date', 'amount', 'merchant_canonical', 'transaction_type', 'category')
+
+# Columns without which no detector can run (category is derived from the merchant when absent)
+REQUIRED_ANOMALY_COLUMNS = ('transaction_date', 'amount', 'merchant_canonical', 'transaction_type')
+
+# Below this many debit rows the numpy kernel is as fast as the JIT one (and skips its dispatch cost)
+NUMBA_MIN_ROWS = 100_000
+
+# Spike level names indexed by the level codes the daily classifiers emit
+_SPIKE_LEVEL_NAMES = np.array(['Normal', 'Moderate', 'High', 'Extreme'], dtype=object)
+
+# Merchant-name keywords that mark a transaction as health-related
+HEALTH_KEYWORDS = (
+    'pharmacy', 'hospital', 'clinic', 'fitness', 'yoga', 'health', 'medical',
+    'doctor', 'physician', 'surgeon', 'dentist', 'orthodontist', 'optometrist',
+    'ophthalmologist', 'cardiologist', 'dermatologist', 'neurologist',
+    'chemist', 'drugstore', 'medical store', 'healthcare', 'wellness',
+    'gym', 'fitness center', 'health club', 'spa', 'massage', 'therapy',
+    'insurance', 'policy', 'lic', 'health insurance', 'medical insurance',
+    'diagnostic', 'laboratory', 'lab', 'pathology', 'radiology', 'x-ray',
+    'ultrasound', 'mri', 'ct scan', 'blood test', 'vaccination', 'vaccine',
+    'medicine', 'medication', 'prescription', 'generic', 'ayurvedic',
+    'homeopathic', 'naturopathic', 'physiotherapy', 'occupational therapy',
+    'speech therapy', 'mental health', 'psychiatrist', 'psychologist',
+    'counseling', 'therapy', 'rehabilitation', 'nursing', 'ambulance',
+    'emergency', 'urgent care', 'walk-in clinic', 'primary care'
+)
+
+# All health keywords as one case-insensitive substring pattern (one C-level scan per name)
+_HEALTH_RE = re.compile('|'.join(map(re.escape, HEALTH_KEYWORDS)), re.IGNORECASE)
+
+# The same keywords as an Aho-Corasick automaton: one pass over each lowercased name finds any of them
+if AHOCORASICK_AVAILABLE:
+    _HEALTH_AC = ahocorasick.Automaton()
+    for _keyword in HEALTH_KEYWORDS:
+        _HEALTH_AC.add_word(_keyword, True)
+    _HEALTH_AC.make_automaton()
+
+# Fallback merchant categories for pattern-break reasons, checked in priority order
+# (first matching category wins, wherever its keyword sits in the name)
+_BASIC_CATEGORY_PATTERNS = (
+    ('Food & Dining', re.compile('swiggy|zomato|restaurant|food', re.IGNORECASE)),
+    ('Travel', re.compile('uber|ola|travel', re.IGNORECASE)),
+    ('Shopping', re.compile('amazon|flipkart|shopping', re.IGNORECASE)),
+    ('Utilities', re.compile('airtel|jio|mobile', re.IGNORECASE)),
+)
+
+
+def _distinct_names(merchants: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """Factorize merchant names into (code per row, -1 where missing; distinct names as strings)."""
+    codes, names = pd.factorize(merchants)
+    return codes, pd.Series(names, dtype=object).astype(str)
+
+
+def _basic_categories(merchants: pd.Series) -> np.ndarray:
+    """Basic category of each merchant, matching each distinct name once."""
+    codes, names = _distinct_names(merchants)
+    categories = np.select(
+        [names.str.contains(pattern).to_numpy() for _, pattern in _BASIC_CATEGORY_PATTERNS],
+        [category for category, _ in _BASIC_CATEGORY_PATTERNS],
+        default='Others'
+    )
+    # Missing names get code -1, which picks the trailing 'Others'
+    return np.append(categories, 'Others')[codes]
+
+
+def _health_related(merchants: pd.Series) -> np.ndarray:
+    """Whether each merchant is health-related, matching each distinct name once."""
+    codes, names = _distinct_names(merchants)
+    if AHOCORASICK_AVAILABLE:
+        matches = np.fromiter(
+            (next(_HEALTH_AC.iter(name), None) is not None for name in names.str.lower()),
+            dtype=bool, count=len(names)
+        )
+    else:
+        matches = names.str.contains(_HEALTH_RE).to_numpy(dtype=bool)
+    # Missing names get code -1, which picks the trailing False
+    return np.append(matches, False)[codes]
+
+
+def _top_k(sums: pd.Series, k: int) -> pd.Series:
+    """The k largest sums in descending order, partitioning first so only k entries get sorted."""
+    values = sums.to_numpy()
+    if values.size > k:
+        sums = sums.iloc[np.argpartition(-values, k - 1)[:k]]
+    return sums.sort_values(ascending=False)
+
+
+def _mean_std(values: np.ndarray) -> Tuple[float, float]:
+    """Mean and sample standard deviation (ddof=1) straight from numpy, without Series overhead."""
+    mean = values.mean()
+    deviations = values - mean
+    # Two passes in C: sum/sum-of-squares would cancel badly for large rupee totals
+    return mean, math.sqrt(np.dot(deviations, deviations) / (values.size - 1))
+
+
+def _classify_days_numpy(codes: np.ndarray, amounts: np.ndarray,
+                         n_days: int) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """
+    Sum spending per day and label each day's spike level.
+    
+    Args:
+        codes: Day code of each transaction (-1 for a missing date)
+        amounts: Transaction amounts
+        n_days: Number of distinct days
+        
+    Returns:
+        Tuple of (daily totals, level per day with 0=normal .. 3=extreme, mean, std)
+    """
+    valid = codes >= 0
+    daily = np.bincount(codes[valid], weights=amounts[valid], minlength=n_days)
+    mean, std = _mean_std(daily)
+    levels = ((daily > mean + 1.5 * std).astype(np.int8)
+              + (daily > mean + 2.5 * std)
+              + (daily > mean + 3.5 * std))
+    return daily, levels, mean, std
+
+
+def _classify_days_loop(codes: np.ndarray, amounts: np.ndarray,
+                        n_days: int) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """Same as _classify_days_numpy, written as plain loops for numba to compile."""
+    daily = np.zeros(n_days)
+    for i in range(codes.size):
+        if codes[i] >= 0:
+            daily[codes[i]] += amounts[i]
+    
+    mean = daily.sum() / n_days
+    squares = 0.0
+    for d in range(n_days):
+        squares += (daily[d] - mean) ** 2
+    std = math.sqrt(squares / (n_days - 1))
+    
+    levels = np.zeros(n_days, dtype=np.int8)
+    for d in range(n_days):
+        if daily[d] > mean + 3.5 * std:
+            levels[d] = 3
+        elif daily[d] > mean + 2.5 * std:
+            levels[d] = 2
+        elif daily[d] > mean + 1.5 * std:
+            levels[d] = 1
+    return daily, levels, mean, std
+
+
+if NUMBA_AVAILABLE:
+    _classify_days_jit = njit(cache=True)(_classify_days_loop)
+
+
+def _classify_days(codes: np.ndarray, amounts: np.ndarray,
+                   n_days: int) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """Daily totals and spike levels, JIT-compiled for long histories when numba is installed."""
+    if NUMBA_AVAILABLE and codes.size >= NUMBA_MIN_ROWS:
+        return _classify_days_jit(codes, amounts, n_days)
+    return _classify_days_numpy(codes, amounts, n_days)
+
+
+def _month_keys(dates: pd.Series) -> np.ndarray:
+    """Calendar month of each date as datetime64[M] (a numpy cast, far cheaper than to_period)."""
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)  # Wall-clock month, as to_period would give
+    return dates.to_numpy().astype('datetime64[M]')
+
+
+def _months_before(moment: np.datetime64, months: int) -> np.datetime64:
+    """Shift a datetime back whole calendar months in numpy, clamping the day like pd.DateOffset."""
+    if np.isnat(moment):
+        return moment
+    day = np.timedelta64(1, 'D')
+    month = moment.astype('datetime64[M]')
+    target = month - np.timedelta64(months, 'M')
+    into_month = moment - month.astype(moment.dtype)
+    # Day 31 two months before a 31-day month lands on the target month's last day
+    last_day = (target + 1).astype('datetime64[D]') - target.astype('datetime64[D]') - day
+    return target.astype(moment.dtype) + min(into_month // day, last_day // day) * day + into_month % day
+
+
+def _as_monthly_periods(monthly: pd.Series) -> pd.Series:
+    """Relabel a per-month aggregate from month starts to monthly periods (the output format)."""
+    monthly.index = monthly.index.to_period('M').rename('transaction_date')
+    return monthly
+
 
 class AnomalyDetector:
     """Advanced anomaly detection for transaction patterns."""
@@ -32,42 +229,68 @@ class AnomalyDetector:
         if df.empty:
             return self._empty_anomaly_results()
         
-        anomalies = {}
-        
-        # Pattern break detection
-        anomalies.update(self._detect_pattern_breaks(df))
-        
-        # Spending spikes detection
-        anomalies.update(self._detect_spending_spikes(df))
-        
-        # Panic spending detection
-        anomalies.update(self._detect_panic_spending(df))
+        # Inputs no detector can use are turned away on column/dtype checks alone, before
+        # the projection, categoricals and month keys below are built
+        missing_columns = [column for column in REQUIRED_ANOMALY_COLUMNS if column not in df.columns]
+        if missing_columns:
+            logger.warning(f"Anomaly detection skipped, missing columns: {missing_columns}")
+            return self._empty_anomaly_results()
+        if not pd.api.types.is_datetime64_any_dtype(df['transaction_date']):
+            logger.warning("Anomaly detection skipped, transaction_date is not a datetime column")
+            return self._empty_anomaly_results()
         
-        # Relationship changes detection
-        anomalies.update(self._detect_relationship_changes(df))
+        # The detectors get their own narrow frame (only the columns they read), so masks and
+        # groupbys don't drag unrelated columns along and the caller's DataFrame is not modified.
+        # Month keys are computed once and shared; merchant/category become categoricals so
+        # every groupby hashes integer codes, not strings. A missing category column is filled
+        # with basic merchant categories up front, so the detectors only ever read the frame.
+        try:
+            df = df[[column for column in ANOMALY_COLUMNS if column in df.columns]]
+            group_keys = {'merchant_canonical': df['merchant_canonical'].astype('category')}
+            if 'category' in df.columns:
+                group_keys['category'] = df['category'].astype('category')
+            else:
+                group_keys['category'] = pd.Categorical(_basic_categories(df['merchant_canonical']))
+            df = df.assign(_month=_month_keys(df['transaction_date']), **group_keys)
+            
+            # Debit transactions, filtered once for the spending detectors
+            spending_df = df[df['transaction_type'] == 'debit']
+        except Exception as e:
+            logger.warning(f"Anomaly detection preprocessing failed: {e}")
+            return self._empty_anomaly_results()
         
-        # Health spending patterns
-        anomalies.update(self._detect_health_patterns(df))
+        # Pattern breaks, spending spikes, panic spending, relationship changes, health spending
+        anomalies = {}
+        for detector, frame in (
+            (self._detect_pattern_breaks, df),
+            (self._detect_spending_spikes, spending_df),
+            (self._detect_panic_spending, spending_df),
+            (self._detect_relationship_changes, df),
+            (self._detect_health_patterns, spending_df),
+        ):
+            anomalies.update(detector(frame))
         
         return anomalies
     
     def _detect_pattern_breaks(self, df: pd.DataFrame) -> Dict:
         """Detect months where spending patterns break significantly."""
         try:
-            monthly = df.groupby(df['transaction_date'].dt.to_period('M'))['amount'].sum()
+            monthly = df.groupby('_month')['amount'].sum()
+            # Chart labels straight from the datetime64 month starts (no per-element Period formatting)
+            month_labels = np.datetime_as_string(monthly.index.to_numpy().astype('datetime64[M]'), unit='M')
+            monthly = _as_monthly_periods(monthly)
             
             if len(monthly) < 2:
                 return {"pattern_break_months": pd.Series(), "pattern_break_chart": None}
             
-            mean, std = monthly.mean(), monthly.std()
+            mean, std = _mean_std(monthly.to_numpy(dtype=np.float64))
             threshold = 1.5 * std
             
             pattern_break = monthly[(monthly > mean + threshold) | (monthly < mean - threshold)]
             
             # Create visualization data
-            monthly_df = monthly.reset_index()
-            monthly_df['transaction_date'] = monthly_df['transaction_date'].astype(str)
-            monthly_df['is_anomaly'] = monthly_df['amount'].apply(lambda x: x in pattern_break.values)
+            monthly_df = pd.DataFrame({'transaction_date': month_labels, 'amount': monthly.to_numpy()})
+            monthly_df['is_anomaly'] = monthly_df['amount'].isin(pattern_break.to_numpy())
             
             # Create chart (will be handled by visualization module)
             chart_data = {
@@ -90,17 +313,16 @@ class AnomalyDetector:
     def _detect_pattern_break_reasons(self, df: pd.DataFrame, break_months) -> Dict:
         """Detect why spending patterns broke in specific months."""
         try:
-            df['month'] = df['transaction_date'].dt.to_period('M')
-            
-            # Add category if not present
-            if 'category' not in df.columns:
-                df['category'] = df['merchant_canonical'].apply(self._basic_categorization)
+            # One pass over the break-month rows, grouped by (month, category)
+            month_starts = break_months.index.to_timestamp()
+            break_rows = df[df['_month'].isin(month_starts)]
+            cat_by_month = break_rows.groupby(['_month', 'category'], observed=True)['amount'].sum()
+            spend_by_month = {start: cat_spend.droplevel(0) for start, cat_spend in cat_by_month.groupby(level=0)}
             
             reasons = {}
-            for month in break_months.index:
-                month_data = df[df['month'] == month]
-                cat_spend = month_data.groupby('category')['amount'].sum()
-                reasons[str(month)] = cat_spend.sort_values(ascending=False).head(3).to_dict()
+            for month, start in zip(break_months.index, month_starts):
+                cat_spend = spend_by_month.get(start)
+                reasons[str(month)] = {} if cat_spend is None else cat_spend.sort_values(ascending=False).head(3).to_dict()
             
             return reasons
             
@@ -108,39 +330,42 @@ class AnomalyDetector:
             logger.warning(f"Pattern break reasons detection failed: {e}")
             return {}
     
-    def _detect_spending_spikes(self, df: pd.DataFrame) -> Dict:
-        """Detect days with unusual spending spikes with enhanced analysis."""
+    def _detect_spending_spikes(self, spending_df: pd.DataFrame) -> Dict:
+        """Detect days with unusual spending spikes with enhanced analysis (spending_df: debits only)."""
+        # A spike needs at least two days of spending to compare against
+        if len(spending_df) < 2:
+            return {"emotional_spikes": pd.DataFrame(), "emotional_spike_chart_data": None}
+        
         try:
-            # Only consider debit transactions for spending analysis
-            spending_df = df[df['transaction_type'] == 'debit']
-            daily = spending_df.groupby('transaction_date')['amount'].sum()
+            # Daily totals and spike levels (moderate/high/extreme: above mean + 1.5/2.5/3.5 std)
+            # in one kernel pass over day codes
+            codes, days = pd.factorize(spending_df['transaction_date'], sort=True)
             
-            if len(daily) < 2:
+            if len(days) < 2:
                 return {"emotional_spikes": pd.DataFrame(), "emotional_spike_chart_data": None}
             
-            # Enhanced spike detection with multiple thresholds
-            mean_spend = daily.mean()
-            std_spend = daily.std()
+            amounts = spending_df['amount'].to_numpy(dtype=np.float64, na_value=0.0)
+            daily_totals, levels, _, _ = _classify_days(codes, amounts, len(days))
+            daily = pd.Series(daily_totals, index=days.rename('transaction_date'), name='amount')
             
-            # Define different spike levels
-            moderate_spikes = daily[daily > mean_spend + 1.5 * std_spend]
-            high_spikes = daily[daily > mean_spend + 2.5 * std_spend]
-            extreme_spikes = daily[daily > mean_spend + 3.5 * std_spend]
+            moderate_spikes = daily[levels >= 1]
+            high_spikes = daily[levels >= 2]
+            extreme_spikes = daily[levels >= 3]
             
-            # Analyze spike patterns
-            spike_analysis = self._analyze_spike_patterns(spending_df, daily, moderate_spikes, high_spikes, extreme_spikes)
+            # Transactions on spike days, filtered once for both the analysis and the chart data
+            # (high/extreme days are also moderate days, so the moderate index covers every spike day)
+            all_spike_days = moderate_spikes.index
+            spike_data = spending_df[spending_df['transaction_date'].isin(all_spike_days)]
             
-            # Get detailed spike data for visualization
-            all_spike_days = set(moderate_spikes.index) | set(high_spikes.index) | set(extreme_spikes.index)
+            # Analyze spike patterns
+            spike_analysis = self._analyze_spike_patterns(spike_data, daily, moderate_spikes, high_spikes, extreme_spikes)
             
             if len(all_spike_days) > 0:
-                spike_data = spending_df[spending_df['transaction_date'].isin(all_spike_days)]
-                merchant_spike = spike_data.groupby(['transaction_date','merchant_canonical'])['amount'].sum().reset_index()
+                merchant_spike = spike_data.groupby(['transaction_date','merchant_canonical'], observed=True)['amount'].sum().reset_index()
                 
-                # Add spike level information
-                merchant_spike['spike_level'] = merchant_spike['transaction_date'].apply(
-                    lambda x: self._get_spike_level(x, moderate_spikes, high_spikes, extreme_spikes)
-                )
+                # Add spike level information: the level computed for each row's day
+                day_levels = levels[days.get_indexer(merchant_spike['transaction_date'])]
+                merchant_spike['spike_level'] = _SPIKE_LEVEL_NAMES[day_levels]
                 
                 return {
                     "emotional_spikes": merchant_spike,
@@ -160,10 +385,10 @@ class AnomalyDetector:
             logger.warning(f"Spending spike detection failed: {e}")
             return {"emotional_spikes": pd.DataFrame(), "emotional_spike_chart_data": None}
     
-    def _analyze_spike_patterns(self, spending_df: pd.DataFrame, daily: pd.Series, 
+    def _analyze_spike_patterns(self, spike_data: pd.DataFrame, daily: pd.Series, 
                                moderate_spikes: pd.Series, high_spikes: pd.Series, 
                                extreme_spikes: pd.Series) -> Dict:
-        """Analyze spending spike patterns for insights."""
+        """Analyze spending spike patterns for insights (spike_data: debit transactions on spike days)."""
         analysis = {
             'total_spikes': len(set(moderate_spikes.index)),
             'high_spikes': len(set(high_spikes.index)),
@@ -174,26 +399,24 @@ class AnomalyDetector:
             'behavioral_insights': []
         }
         
-        # Analyze spike categories
-        all_spike_days = set(moderate_spikes.index)
-        spike_data = spending_df[spending_df['transaction_date'].isin(all_spike_days)]
-        
         if not spike_data.empty:
-            # Category analysis
+            # One groupby per key; the top sums also feed the behavioral insights below
+            # (results are ranked by amount anyway, so the groupby skips sorting its keys)
+            category_spikes = None
             if 'category' in spike_data.columns:
-                category_spikes = spike_data.groupby('category')['amount'].sum().sort_values(ascending=False)
-                analysis['spike_categories'] = category_spikes.head(5).to_dict()
+                category_spikes = _top_k(spike_data.groupby('category', sort=False, observed=True)['amount'].sum(), 5)
+                analysis['spike_categories'] = category_spikes.to_dict()
             
             # Merchant analysis
-            merchant_spikes = spike_data.groupby('merchant_canonical')['amount'].sum().sort_values(ascending=False)
-            analysis['spike_merchants'] = merchant_spikes.head(10).to_dict()
+            merchant_spikes = _top_k(spike_data.groupby('merchant_canonical', sort=False, observed=True)['amount'].sum(), 10)
+            analysis['spike_merchants'] = merchant_spikes.to_dict()
             
-            # Timing analysis
-            spike_data['day_of_week'] = spike_data['transaction_date'].dt.day_name()
-            spike_data['month'] = spike_data['transaction_date'].dt.month_name()
+            # Timing analysis: group by derived key arrays rather than inserting columns
+            day_of_week = spike_data['transaction_date'].dt.day_name().to_numpy()
+            month = spike_data['transaction_date'].dt.month_name().to_numpy()
             
-            day_spikes = spike_data.groupby('day_of_week')['amount'].sum().sort_values(ascending=False)
-            month_spikes = spike_data.groupby('month')['amount'].sum().sort_values(ascending=False)
+            day_spikes = spike_data['amount'].groupby(day_of_week, sort=False).sum().sort_values(ascending=False)
+            month_spikes = spike_data['amount'].groupby(month, sort=False).sum().sort_values(ascending=False)
             
             analysis['spike_timing'] = {
                 'day_of_week': day_spikes.to_dict(),
@@ -202,27 +425,15 @@ class AnomalyDetector:
             
             # Behavioral insights
             analysis['behavioral_insights'] = self._generate_spike_insights(
-                spike_data, daily, moderate_spikes, high_spikes, extreme_spikes
+                daily, moderate_spikes, extreme_spikes, category_spikes, day_spikes, merchant_spikes
             )
         
         return analysis
     
-    def _get_spike_level(self, date, moderate_spikes: pd.Series, high_spikes: pd.Series, 
-                        extreme_spikes: pd.Series) -> str:
-        """Get the spike level for a given date."""
-        if date in extreme_spikes.index:
-            return 'Extreme'
-        elif date in high_spikes.index:
-            return 'High'
-        elif date in moderate_spikes.index:
-            return 'Moderate'
-        else:
-            return 'Normal'
-    
-    def _generate_spike_insights(self, spike_data: pd.DataFrame, daily: pd.Series,
-                                moderate_spikes: pd.Series, high_spikes: pd.Series,
-                                extreme_spikes: pd.Series) -> List[str]:
-        """Generate behavioral insights from spending spikes."""
+    def _generate_spike_insights(self, daily: pd.Series, moderate_spikes: pd.Series,
+                                extreme_spikes: pd.Series, category_spikes: Optional[pd.Series],
+                                day_spikes: pd.Series, merchant_spikes: pd.Series) -> List[str]:
+        """Generate behavioral insights from spending spikes (per-key top spike sums, largest first)."""
         insights = []
         
         # Frequency analysis
@@ -241,38 +452,40 @@ class AnomalyDetector:
             insights.append(f"⚠️ {len(extreme_spikes)} extreme spending days detected - consider reviewing these patterns")
         
         # Category insights
-        if 'category' in spike_data.columns:
-            top_spike_category = spike_data.groupby('category')['amount'].sum().idxmax()
+        if category_spikes is not None:
+            top_spike_category = category_spikes.index[0]
             insights.append(f"🎯 Top spike category: {top_spike_category}")
         
         # Timing insights
-        if 'day_of_week' in spike_data.columns:
-            peak_day = spike_data.groupby('day_of_week')['amount'].sum().idxmax()
-            insights.append(f"📅 Peak spending day: {peak_day}")
+        peak_day = day_spikes.index[0]
+        insights.append(f"📅 Peak spending day: {peak_day}")
         
         # Merchant insights
-        top_merchant = spike_data.groupby('merchant_canonical')['amount'].sum().idxmax()
+        top_merchant = merchant_spikes.index[0]
         insights.append(f"🏪 Top spike merchant: {top_merchant}")
         
         return insights
     
-    def _detect_panic_spending(self, df: pd.DataFrame) -> Dict:
-        """Detect panic spending (high frequency of small amounts)."""
+    def _detect_panic_spending(self, spending_df: pd.DataFrame) -> Dict:
+        """Detect panic spending (high frequency of small amounts; spending_df: debits only)."""
+        # A panic day needs more than 5 transactions
+        if len(spending_df) <= 5:
+            return {"panic_spends": pd.Series()}
+        
         try:
-            # Only consider debit transactions for spending analysis
-            spending_df = df[df['transaction_type'] == 'debit']
-            
             # Define small transactions (less than ₹200)
             small_txn = spending_df[spending_df['amount'] < 200]
             
             if small_txn.empty:
                 return {"panic_spends": pd.Series()}
             
-            # Count small transactions per day
-            daily_small_counts = small_txn.groupby('transaction_date').size()
+            # Count small transactions per day: factorize dates to codes, then one bincount pass
+            codes, days = pd.factorize(small_txn['transaction_date'], sort=True)
+            daily_small_counts = np.bincount(codes[codes >= 0], minlength=len(days))
             
             # Days with more than 5 small transactions
-            panic_days = daily_small_counts[daily_small_counts > 5]
+            panic_mask = daily_small_counts > 5
+            panic_days = pd.Series(daily_small_counts[panic_mask], index=days[panic_mask].rename('transaction_date'))
             
             return {"panic_spends": panic_days}
             
@@ -284,16 +497,23 @@ class AnomalyDetector:
         """Detect changes in merchant relationships over time."""
         try:
             # Look at recent months vs older months
-            recent_months = df['transaction_date'].max() - pd.DateOffset(months=2)
-            
-            recent_merchants = set(df[df['transaction_date'] >= recent_months]['merchant_canonical'])
-            old_merchants = set(df[df['transaction_date'] < recent_months]['merchant_canonical'])
+            dates = df['transaction_date']
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_localize(None)  # Wall-clock months, as DateOffset would shift them
+            recent_months = _months_before(pd.Timestamp(dates.max()).to_datetime64(), 2)
+            dates = dates.to_numpy()
+            
+            # Set operations run on integer merchant codes; only the (small) differences
+            # are mapped back to names. Missing merchants keep a code of their own.
+            codes, merchants = pd.factorize(df['merchant_canonical'], use_na_sentinel=False)
+            recent_codes = np.unique(codes[dates >= recent_months])
+            old_codes = np.unique(codes[dates < recent_months])
             
             # New merchants in recent months
-            new_merchants = recent_merchants - old_merchants
+            new_merchants = set(merchants[np.setdiff1d(recent_codes, old_codes, assume_unique=True)])
             
             # Merchants that disappeared
-            disappeared_merchants = old_merchants - recent_merchants
+            disappeared_merchants = set(merchants[np.setdiff1d(old_codes, recent_codes, assume_unique=True)])
             
             return {
                 "relationship_change_merchants": new_merchants,
@@ -301,7 +521,7 @@ class AnomalyDetector:
                 "relationship_change_summary": {
                     "new_merchants_count": len(new_merchants),
                     "disappeared_merchants_count": len(disappeared_merchants),
-                    "total_merchants": len(recent_merchants | old_merchants)
+                    "total_merchants": len(np.union1d(recent_codes, old_codes))
                 }
             }
             
@@ -309,22 +529,22 @@ class AnomalyDetector:
             logger.warning(f"Relationship change detection failed: {e}")
             return {"relationship_change_merchants": set(), "disappeared_merchants": set()}
     
-    def _detect_health_patterns(self, df: pd.DataFrame) -> Dict:
-        """Detect health-related spending patterns."""
+    def _detect_health_patterns(self, spending_df: pd.DataFrame) -> Dict:
+        """Detect health-related spending patterns (spending_df: debits only)."""
+        if spending_df.empty:
+            return {"health_spending": pd.Series()}
+        
         try:
-            # Only consider debit transactions for spending analysis
-            spending_df = df[df['transaction_type'] == 'debit']
-            
             # Identify health-related transactions
-            health_txn = spending_df[spending_df['merchant_canonical'].apply(self._is_health_related)]
+            health_txn = spending_df[_health_related(spending_df['merchant_canonical'])]
             
             if health_txn.empty:
                 return {"health_spending": pd.Series()}
             
-            health_spending = health_txn.groupby('merchant_canonical')['amount'].sum()
+            health_spending = health_txn.groupby('merchant_canonical', observed=True)['amount'].sum()
             
             # Detect health spending trends
-            health_trend = health_txn.groupby(health_txn['transaction_date'].dt.to_period('M'))['amount'].sum()
+            health_trend = _as_monthly_periods(health_txn.groupby('_month')['amount'].sum())
             
             return {
                 "health_spending": health_spending,
@@ -340,41 +560,6 @@ class AnomalyDetector:
             logger.warning(f"Health pattern detection failed: {e}")
             return {"health_spending": pd.Series()}
     
-    def _basic_categorization(self, merchant_name: str) -> str:
-        """Basic merchant categorization for pattern break analysis."""
-        merchant_lower = str(merchant_name).lower()
-        
-        if any(x in merchant_lower for x in ['swiggy', 'zomato', 'restaurant', 'food']):
-            return 'Food & Dining'
-        elif any(x in merchant_lower for x in ['uber', 'ola', 'travel']):
-            return 'Travel'
-        elif any(x in merchant_lower for x in ['amazon', 'flipkart', 'shopping']):
-            return 'Shopping'
-        elif any(x in merchant_lower for x in ['airtel', 'jio', 'mobile']):
-            return 'Utilities'
-        else:
-            return 'Others'
-    
-    def _is_health_related(self, merchant_name: str) -> bool:
-        """Check if merchant is health-related."""
-        name = str(merchant_name).lower()
-        health_keywords = [
-            'pharmacy', 'hospital', 'clinic', 'fitness', 'yoga', 'health', 'medical',
-            'doctor', 'physician', 'surgeon', 'dentist', 'orthodontist', 'optometrist',
-            'ophthalmologist', 'cardiologist', 'dermatologist', 'neurologist',
-            'chemist', 'drugstore', 'medical store', 'healthcare', 'wellness',
-            'gym', 'fitness center', 'health club', 'spa', 'massage', 'therapy',
-            'insurance', 'policy', 'lic', 'health insurance', 'medical insurance',
-            'diagnostic', 'laboratory', 'lab', 'pathology', 'radiology', 'x-ray',
-            'ultrasound', 'mri', 'ct scan', 'blood test', 'vaccination', 'vaccine',
-            'medicine', 'medication', 'prescription', 'generic', 'ayurvedic',
-            'homeopathic', 'naturopathic', 'physiotherapy', 'occupational therapy',
-            'speech therapy', 'mental health', 'psychiatrist', 'psychologist',
-            'counseling', 'therapy', 'rehabilitation', 'nursing', 'ambulance',
-            'emergency', 'urgent care', 'walk-in clinic', 'primary care'
-        ]
-        return any(keyword in name for keyword in health_keywords)
-    
     def _empty_anomaly_results(self) -> Dict:
         """Return empty anomaly detection results."""
         return {
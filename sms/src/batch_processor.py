@@ -5,14 +5,48 @@ Handles large-scale processing of 10,000+ users with parallel processing and mem
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional, Callable, Generator
+from typing import Dict, List, Any, Optional, Callable, Generator, NamedTuple, Sequence, Tuple
 import logging
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import contextlib
+import ctypes
+import ctypes.util
+import functools
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import queue
+import sys
 import threading
 import time
 import psutil
 import gc
+import hashlib
+import pickle
 from pathlib import Path
+from collections import deque
+
+# resource (POSIX only) reports the peak RSS; without it only the current-RSS trigger is used
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Try to import numba to JIT-compile registered numeric kernels, fallback to plain NumPy calls
+try:
+    from numba import guvectorize, njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Try to import pyarrow to concatenate transaction chunks without a consolidated copy, fallback to pd.concat
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 try:
     from .config import get_config
@@ -26,29 +60,313 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# pandas 3 always uses copy-on-write; earlier versions need it switched on per block
+_PANDAS_COW_DEFAULT = int(pd.__version__.split('.')[0]) >= 3
+
+# Number of recent batch times kept (a bounded deque, not a growing list)
+STATS_HISTORY_SIZE = 4096
+
+# Memory is summarised as an exponential moving average (weight of the newest sample),
+# plus a short window of raw samples for the p99
+MEMORY_EMA_ALPHA = 0.1
+MEMORY_RECENT_SAMPLES = 64
+
+# A young-generation collection that frees less than this fraction of RSS counts as a miss;
+# after FULL_GC_AFTER_MISSES consecutive misses the next cleanup runs a full collection
+YOUNG_GC_MIN_DROP = 0.05
+FULL_GC_AFTER_MISSES = 2
+
+# Peak RSS growth between cleanups that triggers a full collection and a malloc trim
+PEAK_GROWTH_TRIGGER_MB = 256
+
+# Object columns are sized from a random sample of at most this many values
+MEMORY_ESTIMATE_SAMPLE_ROWS = 10_000
+
+# User batch progress is logged each time another this-many percent of the users is done
+PROGRESS_LOG_STEP_PCT = 5
+
+# Completed user batches the producer thread may run ahead of the consumer
+PIPELINE_DEPTH = 2
+
+# Parquet files decoded ahead of the one being processed (each is a whole DataFrame in memory)
+READ_AHEAD_FILES = 2
+
+# Marks the end of the produced batches in the pipeline queue
+_PIPELINE_DONE = object()
+
+# Transaction batches are sized so their widest column fills at most this share of L3
+L3_CACHE_SHARE = 0.5
+L3_CACHE_FALLBACK_BYTES = 16 * 1024 * 1024
+
+# glibc's malloc_trim hands freed arena pages back to the OS (None elsewhere)
+try:
+    _malloc_trim = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6').malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+# Memory readings younger than this (seconds) are reused instead of re-read
+MEMORY_CACHE_TTL = 0.1
+
+# Linux exposes the resident set size in /proc/self/statm, far cheaper to read than psutil
+_STATM_PATH = '/proc/self/statm'
+_STATM_AVAILABLE = os.path.exists(_STATM_PATH)
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if _STATM_AVAILABLE else 0
+
+# NumPy kwargs at least this large are placed in shared memory for worker processes
+# instead of being pickled into every worker
+SHARED_KWARG_MIN_BYTES = 1024 * 1024
+
+# Whether freeze_startup_heap has already run in this process
+_HEAP_FROZEN = False
+
+# Per-process state for worker processes: the user function and its shared kwargs are
+# sent once by the pool initializer instead of being pickled with every task
+_WORKER: Dict[str, Any] = {}
+
+class _SharedRef(NamedTuple):
+    """Pickle-cheap stand-in for a NumPy kwarg whose data lives in a shared memory block."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+def _share_large_kwargs(kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[shared_memory.SharedMemory]]:
+    """Move large NumPy kwargs into shared memory, returning the kwargs to send and the blocks to release."""
+    shared_kwargs = dict(kwargs)
+    blocks = []
+    for key, value in kwargs.items():
+        if isinstance(value, np.ndarray) and not value.dtype.hasobject and value.nbytes >= SHARED_KWARG_MIN_BYTES:
+            block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+            np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+            blocks.append(block)
+            shared_kwargs[key] = _SharedRef(block.name, value.shape, value.dtype.str)
+    return shared_kwargs, blocks
+
+def _release_shared(blocks: List[shared_memory.SharedMemory]):
+    """Free the shared memory blocks once the worker pool has shut down."""
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+def _init_worker(process_function: Callable, kwargs: Dict[str, Any],
+                 worker_counter: Any = None, cpus: Tuple[int, ...] = ()):
+    """Store the user function and its read-only kwargs in the worker process (and pin it to a core)."""
+    # Shared kwargs become read-only views of the parent's blocks, attached once per worker
+    blocks = []
+    kwargs = dict(kwargs)
+    for key, value in kwargs.items():
+        if isinstance(value, _SharedRef):
+            block = shared_memory.SharedMemory(name=value.name)
+            blocks.append(block)
+            view = np.ndarray(value.shape, np.dtype(value.dtype), buffer=block.buf)
+            view.flags.writeable = False
+            kwargs[key] = view
+    
+    _WORKER['process_function'] = process_function
+    _WORKER['kwargs'] = kwargs
+    _WORKER['shared_blocks'] = blocks  # Keeps the mappings alive as long as the worker
+    
+    # Each worker takes the next core in turn, so its per-user state stays in that core's caches
+    if cpus:
+        with worker_counter.get_lock():
+            worker_id = worker_counter.value
+            worker_counter.value += 1
+        os.sched_setaffinity(0, {cpus[worker_id % len(cpus)]})
+
+def _available_cpus() -> Tuple[int, ...]:
+    """CPUs this process may run on (respects affinity masks and cpusets, unlike os.cpu_count)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+def _process_user(process_function: Callable, kwargs: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    """Process one user, capturing the error in the result record instead of raising."""
+    try:
+        result = process_function(user_id, **kwargs)
+        return {'user_id': user_id, 'result': result, 'status': 'success'}
+    except Exception as e:
+        return {'user_id': user_id, 'result': None, 'status': 'error', 'error': str(e)}
+
+def _process_user_in_worker(user_id: str) -> Dict[str, Any]:
+    """Process one user in a worker process with the function and kwargs from _init_worker."""
+    return _process_user(_WORKER['process_function'], _WORKER['kwargs'], user_id)
+
+def _process_user_chunk(task: Callable, user_ids: List[str]) -> List[Dict[str, Any]]:
+    """Process a chunk of users with one task submission (one IPC round trip on process pools)."""
+    return [task(user_id) for user_id in user_ids]
+
+def _retry_users_individually(executor, task: Callable, user_ids: List[str],
+                              chunk_error: Exception) -> List[Dict[str, Any]]:
+    """Resubmit a failed chunk's users one at a time, so only the users that fail are marked as errors."""
+    logger.warning(f"Batch chunk of {len(user_ids)} users failed ({chunk_error}), retrying users individually")
+    results = []
+    for user_id in user_ids:
+        try:
+            results.append(executor.submit(task, user_id).result())
+        except Exception as e:
+            # Broken pool (worker died) or a result that cannot be sent back from the worker
+            results.append({'user_id': user_id, 'result': None, 'status': 'error', 'error': str(e)})
+    return results
+
+def freeze_startup_heap():
+    """
+    Move everything alive now (modules, config, caches) to the permanent generation, once.
+    
+    Meant for batch entry points after startup, just before worker processes are created;
+    frozen objects are never scanned or collected again, so this must not run at import time
+    or in long-lived interactive processes.
+    """
+    global _HEAP_FROZEN
+    if _HEAP_FROZEN:
+        return
+    gc.freeze()
+    _HEAP_FROZEN = True
+
+def _kwargs_digest(kwargs: Dict[str, Any]) -> Optional[str]:
+    """Content digest of the per-user kwargs, or None when they cannot be serialized."""
+    try:
+        payload = pickle.dumps(sorted(kwargs.items()), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def _batch_slices(total: int, batch_size: int) -> List[Tuple[int, int, int]]:
+    """(batch number, start, end) of every batch, computed once before the batch loop."""
+    return [(number, start, min(start + batch_size, total))
+            for number, start in enumerate(range(0, total, batch_size), 1)]
+
+def _put_unless_stopped(batches: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Put item on the queue, giving up (False) once the consumer has stopped listening."""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _call_with_output(fn: Callable, *arrays: np.ndarray) -> np.ndarray:
+    """Call a guvectorize-style kernel uncompiled, allocating its trailing output array."""
+    out = np.empty_like(arrays[0])
+    fn(*arrays, out)
+    return out
+
+def _peak_memory_mb() -> float:
+    """Peak RSS of this process in MB (0.0 where getrusage is unavailable)."""
+    if not RESOURCE_AVAILABLE:
+        return 0.0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+def _copy_on_write():
+    """Context in which writes to a DataFrame view copy it instead of reaching the parent frame."""
+    if _PANDAS_COW_DEFAULT:
+        return contextlib.nullcontext()
+    return pd.option_context('mode.copy_on_write', True)
+
+def _read_parquet_file(path: Path) -> pd.DataFrame:
+    """Read one parquet file into a DataFrame (runs on a reader thread; I/O and decoding release the GIL)."""
+    if not PYARROW_AVAILABLE:
+        return pd.read_parquet(path)
+    # Read straight from the file (no raw-bytes copy alongside the table); self_destruct frees
+    # each Arrow column as it is converted
+    return pq.read_table(path).to_pandas(split_blocks=True, self_destruct=True)
+
+def _concat_chunks(chunks: List[Any]) -> pd.DataFrame:
+    """Concatenate processed chunks (releasing each from the list as it is consumed)."""
+    if PYARROW_AVAILABLE and all(isinstance(chunk, pd.DataFrame) for chunk in chunks):
+        # Arrow concatenation only stitches buffers together, and converting back with
+        # split_blocks/self_destruct frees them column by column instead of building one
+        # consolidated block next to the inputs
+        tables = []
+        try:
+            for k in range(len(chunks)):
+                tables.append(pa.Table.from_pandas(chunks[k], preserve_index=False))
+                chunks[k] = None
+            combined = pa.concat_tables(tables, promote_options='default')
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # Mixed Python objects or chunk schemas Arrow can't unify: put converted chunks back
+            logger.debug(f"Arrow concatenation unavailable for these chunks ({e}), using pd.concat")
+            chunks[:len(tables)] = [table.to_pandas() for table in tables]
+        else:
+            del tables
+            return combined.to_pandas(split_blocks=True, self_destruct=True)
+    
+    return pd.concat(chunks, ignore_index=True)
+
+def _estimate_column_memory(df: pd.DataFrame) -> pd.Series:
+    """Approximate memory_usage(deep=True) per column, sizing Python-object columns from a sample."""
+    col_bytes = df.memory_usage(deep=False).astype(float)
+    
+    for name, col in df.items():
+        # Only object and python-backed string columns hold boxed values the shallow count misses
+        if col.dtype != object and not (isinstance(col.dtype, pd.StringDtype) and col.dtype.storage == 'python'):
+            continue
+        if col.empty:
+            continue
+        sample = col.sample(min(len(col), MEMORY_ESTIMATE_SAMPLE_ROWS), random_state=0)
+        col_bytes[name] += sample.map(sys.getsizeof).mean() * len(col)
+    
+    return col_bytes
+
+@functools.lru_cache(maxsize=1)
+def _l3_cache_bytes() -> int:
+    """Size of the last-level (L3) cache from sysfs, or L3_CACHE_FALLBACK_BYTES if unknown."""
+    for index_dir in sorted(Path('/sys/devices/system/cpu/cpu0/cache').glob('index*')):
+        try:
+            if (index_dir / 'level').read_text().strip() != '3':
+                continue
+            size = (index_dir / 'size').read_text().strip().upper()
+            units = {'K': 1024, 'M': 1024 * 1024}
+            return int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+        except (OSError, ValueError):
+            break
+    return L3_CACHE_FALLBACK_BYTES
+
 class BatchProcessor:
     """High-performance batch processor for large-scale data processing."""
     
+    __slots__ = (
+        'user_batch_size', 'transaction_batch_size', 'max_workers', 'parallel_processing',
+        'executor_backend', 'pin_workers', 'cache_user_results', 'memory_limit_mb', 'processing_stats', '_batch_times', '_mem_ema', '_mem_recent',
+        '_psutil_proc', '_mem_cached', '_mem_ts', '_numeric_kernels', '_young_gc_misses', '_last_peak_mb'
+    )
+    
     def __init__(self):
         """Initialize batch processor."""
         # Configuration
         self.user_batch_size = get_config('scalability.user_batch_size', 100)
         self.transaction_batch_size = get_config('scalability.transaction_batch_size', 1000)
-        self.max_workers = get_config('scalability.max_workers', 4)
+        self.max_workers = get_config('scalability.max_workers', -1)
+        if self.max_workers == -1:  # Auto: one worker per CPU available to this process
+            self.max_workers = len(_available_cpus())
+        self.pin_workers = get_config('scalability.pin_workers', True)
+        self.cache_user_results = get_config('scalability.cache_user_results', False)
         self.parallel_processing = get_config('scalability.parallel_processing', True)
+        self.executor_backend = get_config('scalability.executor_backend', 'thread')
         self.memory_limit_mb = get_config('performance_limits.memory_limit_mb', 2048)
         
-        # Performance monitoring
-        self.processing_stats = {
-            'total_users_processed': 0,
-            'total_transactions_processed': 0,
-            'total_processing_time': 0,
-            'batch_processing_times': [],
-            'memory_usage_history': []
-        }
+        # Performance monitoring. Stats are only written by the thread running a batch loop
+        # (workers never touch them), so updates take no lock: deque appends are atomic and
+        # readers snapshot with dict.copy()/list(), which don't release the GIL
+        self.processing_stats = self._new_stats()
+        self._batch_times = deque(maxlen=STATS_HISTORY_SIZE)
+        self._mem_ema: Optional[float] = None
+        self._mem_recent = deque(maxlen=MEMORY_RECENT_SAMPLES)
         
-        # Thread safety
-        self.lock = threading.Lock()
+        # Memory reading cache (see _get_memory_usage)
+        self._psutil_proc = None if _STATM_AVAILABLE else psutil.Process()
+        self._mem_cached = 0.0
+        self._mem_ts = float('-inf')
+        
+        # Registered numeric kernels: original and compiled function -> (output column, kernel, input columns)
+        self._numeric_kernels: Dict[Callable, Tuple[str, Callable, Tuple[str, ...]]] = {}
+        
+        # Consecutive young-generation collections that barely reduced memory (see _cleanup_memory)
+        self._young_gc_misses = 0
+        
+        # Peak RSS at the last cleanup, to notice growth that current RSS hides after a GC
+        self._last_peak_mb = _peak_memory_mb()
         
         logger.info(f"Batch Processor initialized with {self.max_workers} workers")
     
@@ -66,50 +384,136 @@ class BatchProcessor:
         Yields:
             Processing results for each batch
         """
+        # Each user is processed once per run, in first-seen order
+        unique_user_ids = list(dict.fromkeys(user_ids))
+        if len(unique_user_ids) < len(user_ids):
+            logger.info(f"Skipping {len(user_ids) - len(unique_user_ids)} duplicate user IDs")
+        user_ids = unique_user_ids
+        
         total_users = len(user_ids)
         logger.info(f"Starting batch processing of {total_users} users")
         
-        start_time = time.time()
+        # Batches are produced on a helper thread so the next one is already being processed
+        # while the caller consumes this one; the bounded queue caps how far it runs ahead
+        batches = queue.Queue(maxsize=PIPELINE_DEPTH)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_user_batches,
+            args=(user_ids, process_function, kwargs, batches, stop),
+            name='batch-producer', daemon=True
+        )
+        producer.start()
         
-        # Process users in batches
-        for i in range(0, total_users, self.user_batch_size):
-            batch_start_time = time.time()
-            batch_user_ids = user_ids[i:i + self.user_batch_size]
-            
-            logger.info(f"Processing batch {i//self.user_batch_size + 1}/{(total_users-1)//self.user_batch_size + 1}: "
-                       f"users {i+1}-{min(i+self.user_batch_size, total_users)}")
-            
-            # Process batch
-            batch_results = self._process_user_batch(batch_user_ids, process_function, **kwargs)
-            
-            # Update statistics
-            with self.lock:
+        try:
+            while True:
+                item = batches.get()
+                if item is _PIPELINE_DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Lets the producer give up if the caller stopped consuming early
+            stop.set()
+    
+    def _produce_user_batches(self, user_ids: List[str], process_function: Callable,
+                              kwargs: Dict[str, Any], batches: queue.Queue, stop: threading.Event):
+        """Run the user batch loop, handing each batch (then _PIPELINE_DONE, or the error) to the queue."""
+        total_users = len(user_ids)
+        batches_plan = _batch_slices(total_users, self.user_batch_size)
+        n_batches = len(batches_plan)
+        next_progress_pct = PROGRESS_LOG_STEP_PCT
+        start_time = time.perf_counter()
+        
+        try:
+            # Process users in batches
+            for batch_index, i, end in batches_plan:
+                if stop.is_set():
+                    return
+                
+                batch_start_ns = time.monotonic_ns()
+                batch_user_ids = user_ids[i:end]
+                
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Processing batch %d/%d: users %d-%d",
+                                batch_index, n_batches, i + 1, end)
+                
+                # Process batch
+                batch_results = self._process_user_batch_cached(batch_user_ids, process_function, kwargs)
+                
+                # Update statistics (one memory reading and one end timestamp serve both the
+                # history and the payload)
+                batch_seconds = (time.monotonic_ns() - batch_start_ns) / 1e9
+                memory_usage = self._get_memory_usage()
                 self.processing_stats['total_users_processed'] += len(batch_user_ids)
-                self.processing_stats['batch_processing_times'].append(time.time() - batch_start_time)
-                self.processing_stats['memory_usage_history'].append(self._get_memory_usage())
-            
-            # Yield results
-            yield {
-                'batch_number': i//self.user_batch_size + 1,
-                'users_processed': len(batch_user_ids),
-                'results': batch_results,
-                'processing_time': time.time() - batch_start_time,
-                'memory_usage_mb': self._get_memory_usage()
-            }
-            
-            # Memory cleanup
-            self._cleanup_memory()
+                self.processing_stats['total_batches'] += 1
+                self._batch_times.append(batch_seconds)
+                self._record_memory_usage(memory_usage)
+                
+                # Hand results to the consumer
+                if not _put_unless_stopped(batches, {
+                    'batch_number': batch_index,
+                    'users_processed': len(batch_user_ids),
+                    'results': batch_results,
+                    'processing_time': batch_seconds,
+                    'memory_usage_mb': memory_usage
+                }, stop):
+                    return
+                
+                # Memory cleanup
+                self._cleanup_memory()
+                
+                # Progress update, at most once per PROGRESS_LOG_STEP_PCT of the users
+                processed = end
+                progress = processed / total_users * 100
+                if progress >= next_progress_pct:
+                    logger.info("Progress: %.1f%% (%d/%d users)", progress, processed, total_users)
+                    next_progress_pct = (progress // PROGRESS_LOG_STEP_PCT + 1) * PROGRESS_LOG_STEP_PCT
             
-            # Progress update
-            progress = (i + len(batch_user_ids)) / total_users * 100
-            logger.info(f"Progress: {progress:.1f}% ({i + len(batch_user_ids)}/{total_users} users)")
-        
-        # Final statistics
-        total_time = time.time() - start_time
-        with self.lock:
+            # Final statistics
+            total_time = time.perf_counter() - start_time
             self.processing_stats['total_processing_time'] = total_time
-        
-        logger.info(f"Batch processing completed in {total_time:.2f} seconds")
+            
+            logger.info(f"Batch processing completed in {total_time:.2f} seconds")
+            _put_unless_stopped(batches, _PIPELINE_DONE, stop)
+        except BaseException as e:
+            _put_unless_stopped(batches, e, stop)
+    
+    def _process_user_batch_cached(self, user_ids: List[str],
+                                   process_function: Callable,
+                                   kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Process a batch of users, serving users with a cached result from cache_manager."""
+        if not self.cache_user_results:
+            return self._process_user_batch(user_ids, process_function, **kwargs)
+        
+        # Keyed on a digest of the kwargs' contents: str() elides large arrays and frames, so two
+        # different inputs could otherwise share a key
+        kwargs_digest = _kwargs_digest(kwargs)
+        if kwargs_digest is None:
+            return self._process_user_batch(user_ids, process_function, **kwargs)
+        
+        prefix = f"user_result:{process_function.__module__}.{getattr(process_function, '__qualname__', process_function)}"
+        keys = {user_id: cache_manager._generate_key(prefix, user_id, kwargs_digest) for user_id in user_ids}
+        
+        cached_results = {}
+        for user_id in user_ids:
+            result = cache_manager.get(keys[user_id])
+            if result is not None:
+                cached_results[user_id] = result
+        
+        misses = [user_id for user_id in user_ids if user_id not in cached_results]
+        fresh_results = self._process_user_batch(misses, process_function, **kwargs) if misses else []
+        for record in fresh_results:
+            if record['status'] == 'success' and record['result'] is not None:
+                cache_manager.set(keys[record['user_id']], record['result'])
+        
+        # Reassemble in batch order
+        fresh_by_user = {record['user_id']: record for record in fresh_results}
+        return [
+            fresh_by_user[user_id] if user_id in fresh_by_user else
+            {'user_id': user_id, 'result': cached_results[user_id], 'status': 'success', 'cached': True}
+            for user_id in user_ids
+        ]
     
     def _process_user_batch(self, user_ids: List[str], 
                            process_function: Callable,
@@ -123,34 +527,47 @@ class BatchProcessor:
     def _process_parallel(self, user_ids: List[str], 
                          process_function: Callable,
                          **kwargs) -> List[Dict[str, Any]]:
-        """Process users in parallel using ThreadPoolExecutor."""
-        results = []
+        """Process users in parallel (threads, or worker processes for GIL-bound functions)."""
+        # Users are handed out in chunks (one future per chunk instead of per user); process
+        # pools send each chunk in one IPC round trip. A chunk that fails as a whole is retried
+        # user by user, so one bad user or a dead worker doesn't lose the rest of the batch
+        chunksize = max(1, len(user_ids) // (self.max_workers * 4))
+        shared_blocks = []
+        
+        # Functions that spend their time in GIL-releasing NumPy/pandas code stay on threads
+        if self.executor_backend == 'process' and not getattr(process_function, '_releases_gil', False):
+            # forkserver avoids forking this (threaded) process; spawn where it is unavailable
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            mp_context = multiprocessing.get_context(start_method)
+            cpus = _available_cpus() if self.pin_workers and hasattr(os, 'sched_setaffinity') else ()
+            worker_kwargs, shared_blocks = _share_large_kwargs(kwargs)
+            # Process-backed batch runs are the batch entry point: startup state is long-lived from here on
+            freeze_startup_heap()
+            executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                           mp_context=mp_context,
+                                           initializer=_init_worker,
+                                           initargs=(process_function, worker_kwargs, mp_context.Value('i', 0), cpus))
+            task = _process_user_in_worker
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            task = functools.partial(_process_user, process_function, kwargs)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_user = {
-                executor.submit(process_function, user_id, **kwargs): user_id 
-                for user_id in user_ids
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_user):
-                user_id = future_to_user[future]
-                try:
-                    result = future.result()
-                    results.append({
-                        'user_id': user_id,
-                        'result': result,
-                        'status': 'success'
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing user {user_id}: {e}")
-                    results.append({
-                        'user_id': user_id,
-                        'result': None,
-                        'status': 'error',
-                        'error': str(e)
-                    })
+        try:
+            with executor:
+                chunks = [user_ids[start:start + chunksize] for start in range(0, len(user_ids), chunksize)]
+                futures = [executor.submit(_process_user_chunk, task, chunk) for chunk in chunks]
+                results = []
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        results.extend(future.result())
+                    except Exception as e:
+                        results.extend(_retry_users_individually(executor, task, chunk, e))
+        finally:
+            _release_shared(shared_blocks)
+        
+        for result in results:
+            if result['status'] == 'error':
+                logger.error(f"Error processing user {result['user_id']}: {result['error']}")
         
         return results
     
@@ -181,6 +598,7 @@ class BatchProcessor:
     
     def process_transactions_batch(self, df: pd.DataFrame, 
                                  process_function: Callable,
+                                 vectorizable: bool = False,
                                  **kwargs) -> pd.DataFrame:
         """
         Process transactions in batches for memory efficiency.
@@ -188,6 +606,9 @@ class BatchProcessor:
         Args:
             df: DataFrame with transaction data
             process_function: Function to process transactions
+            vectorizable: Opt in to a single call over the whole frame (process_function then
+                receives the caller's DataFrame and must not mutate it); by default it is applied
+                to memory-bounded copy-on-write chunks
             **kwargs: Additional arguments for process_function
             
         Returns:
@@ -199,37 +620,160 @@ class BatchProcessor:
         total_transactions = len(df)
         logger.info(f"Starting batch processing of {total_transactions} transactions")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
+        kernel_spec = self._numeric_kernels.get(process_function)
+        
+        # Vectorized functions (and registered kernels) run once over the whole frame:
+        # no chunk slicing and no concat
+        if vectorizable or kernel_spec is not None:
+            if kernel_spec is not None:
+                result_df = self._run_numeric_kernel(df, kernel_spec, **kwargs)
+            else:
+                result_df = process_function(df, **kwargs)
+            
+            self.processing_stats['total_transactions_processed'] += total_transactions
+            self.processing_stats['total_batches'] += 1
+            elapsed = time.perf_counter() - start_time
+            self._batch_times.append(elapsed)
+            
+            logger.info(f"Transaction processing completed in {elapsed:.2f} seconds")
+            return result_df
+        
         processed_chunks = []
         
         # Process in batches
-        for i in range(0, total_transactions, self.transaction_batch_size):
-            batch_start_time = time.time()
-            chunk = df.iloc[i:i + self.transaction_batch_size].copy()
+        batches_plan = _batch_slices(total_transactions, self.transaction_batch_size)
+        n_batches = len(batches_plan)
+        for batch_index, i, end in batches_plan:
+            batch_start_ns = time.monotonic_ns()
             
-            logger.info(f"Processing transaction batch {i//self.transaction_batch_size + 1}/{(total_transactions-1)//self.transaction_batch_size + 1}: "
-                       f"transactions {i+1}-{min(i+self.transaction_batch_size, total_transactions)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Processing transaction batch %d/%d: transactions %d-%d",
+                            batch_index, n_batches, i + 1, end)
             
-            # Process chunk
-            processed_chunk = process_function(chunk, **kwargs)
+            # Process chunk: a view of df, protected by copy-on-write instead of a defensive copy
+            with _copy_on_write():
+                chunk = df.iloc[i:end]
+                processed_chunk = process_function(chunk, **kwargs)
             processed_chunks.append(processed_chunk)
             
             # Update statistics
-            with self.lock:
-                self.processing_stats['total_transactions_processed'] += len(chunk)
-                self.processing_stats['batch_processing_times'].append(time.time() - batch_start_time)
+            self.processing_stats['total_transactions_processed'] += len(chunk)
+            self.processing_stats['total_batches'] += 1
+            self._batch_times.append((time.monotonic_ns() - batch_start_ns) / 1e9)
             
             # Memory cleanup
             self._cleanup_memory()
         
         # Combine processed chunks
-        result_df = pd.concat(processed_chunks, ignore_index=True)
+        result_df = _concat_chunks(processed_chunks)
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         logger.info(f"Transaction batch processing completed in {total_time:.2f} seconds")
         
         return result_df
     
+    def iter_transaction_files(self, paths: List[Path],
+                               process_function: Callable,
+                               **kwargs) -> Generator[Any, None, None]:
+        """
+        Process parquet transaction files, reading ahead while earlier files are processed.
+        
+        Up to READ_AHEAD_FILES files are read and decoded on reader threads while
+        process_function runs on the caller's thread, so disk I/O overlaps with processing.
+        No further files are read ahead while memory usage is at memory_limit_mb.
+        
+        Args:
+            paths: Parquet files to process, in order
+            process_function: Function to process each file's DataFrame
+            **kwargs: Additional arguments for process_function
+            
+        Yields:
+            process_function's result for each file, in the order of paths
+        """
+        logger.info(f"Starting processing of {len(paths)} transaction files")
+        start_time = time.perf_counter()
+        read_ahead = READ_AHEAD_FILES
+        
+        with ThreadPoolExecutor(max_workers=read_ahead) as readers:
+            pending = deque()
+            remaining = iter(paths)
+            
+            for path in remaining:
+                pending.append(readers.submit(_read_parquet_file, path))
+                if len(pending) >= read_ahead:
+                    break
+            
+            while pending:
+                df = pending.popleft().result()
+                # Keep the read-ahead window full before processing this file, unless decoded
+                # files would push the process past its memory limit
+                if self._get_memory_usage() < self.memory_limit_mb:
+                    for path in remaining:
+                        pending.append(readers.submit(_read_parquet_file, path))
+                        break
+                
+                file_start_ns = time.monotonic_ns()
+                result = process_function(df, **kwargs)
+                
+                self.processing_stats['total_transactions_processed'] += len(df)
+                self.processing_stats['total_batches'] += 1
+                self._batch_times.append((time.monotonic_ns() - file_start_ns) / 1e9)
+                
+                del df
+                yield result
+                
+                # Read-ahead was held back: read the next file now that this one is released
+                if not pending:
+                    for path in remaining:
+                        pending.append(readers.submit(_read_parquet_file, path))
+                        break
+        
+        logger.info(f"Transaction file processing completed in {time.perf_counter() - start_time:.2f} seconds")
+    
+    def register_numeric_kernel(self, name: str, fn: Callable, columns: Sequence[str],
+                                signature: Optional[Any] = None) -> Callable:
+        """
+        Register a numeric kernel for process_transactions_batch.
+        
+        Passing the kernel (or the original fn) to process_transactions_batch calls it once
+        with one float64 array per input column, bypassing pandas, and stores its 1-D
+        result in the output column `name`.
+        
+        Args:
+            name: Output column name
+            fn: Kernel over NumPy arrays; with a signature it follows the guvectorize
+                convention (output array as the trailing argument)
+            columns: Input columns, passed to fn in this order
+            signature: guvectorize type signature(s) for a '(n),...->(n)' kernel; without
+                one fn is compiled with njit
+            
+        Returns:
+            The compiled kernel (fn itself when numba is unavailable)
+        """
+        columns = tuple(columns)
+        if not NUMBA_AVAILABLE:
+            logger.info(f"numba not available, kernel '{name}' runs as plain NumPy")
+            kernel = fn if signature is None else functools.partial(_call_with_output, fn)
+        elif signature is not None:
+            layout = ','.join(['(n)'] * len(columns)) + '->(n)'
+            kernel = guvectorize(signature, layout, cache=True)(fn)
+        else:
+            kernel = njit(parallel=True, cache=True, fastmath=True)(fn)
+        
+        spec = (name, kernel, columns)
+        self._numeric_kernels[fn] = spec
+        self._numeric_kernels[kernel] = spec
+        return kernel
+    
+    @staticmethod
+    def _run_numeric_kernel(df: pd.DataFrame, kernel_spec: Tuple[str, Callable, Tuple[str, ...]],
+                            **kwargs) -> pd.DataFrame:
+        """Call a registered kernel on the raw column arrays and attach its output column."""
+        name, kernel, columns = kernel_spec
+        arrays = [df[column].to_numpy(dtype=np.float64) for column in columns]
+        return df.assign(**{name: kernel(*arrays, **kwargs)})
+    
     def process_with_memory_monitoring(self, data: Any, 
                                      process_function: Callable,
                                      **kwargs) -> Any:
@@ -244,16 +788,16 @@ class BatchProcessor:
         Returns:
             Processed data
         """
-        initial_memory = self._get_memory_usage()
+        initial_memory = self._get_memory_usage(use_cache=False)
         logger.info(f"Initial memory usage: {initial_memory:.2f} MB")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             result = process_function(data, **kwargs)
             
-            final_memory = self._get_memory_usage()
-            processing_time = time.time() - start_time
+            final_memory = self._get_memory_usage(use_cache=False)
+            processing_time = time.perf_counter() - start_time
             
             logger.info(f"Processing completed in {processing_time:.2f} seconds")
             logger.info(f"Memory usage: {initial_memory:.2f} MB → {final_memory:.2f} MB "
@@ -265,39 +809,94 @@ class BatchProcessor:
             logger.error(f"Processing failed: {e}")
             raise
     
-    def _get_memory_usage(self) -> float:
-        """Get current memory usage in MB."""
+    def _get_memory_usage(self, use_cache: bool = True) -> float:
+        """Get current memory usage in MB (reused for MEMORY_CACHE_TTL unless use_cache is False)."""
+        now = time.monotonic()
+        if use_cache and now - self._mem_ts < MEMORY_CACHE_TTL:
+            return self._mem_cached
+        
         try:
-            process = psutil.Process()
-            memory_info = process.memory_info()
-            return memory_info.rss / (1024 * 1024)  # Convert to MB
+            if _STATM_AVAILABLE:
+                with open(_STATM_PATH, 'rb') as f:
+                    rss_bytes = int(f.read().split()[1]) * _PAGE_SIZE
+            else:
+                rss_bytes = self._psutil_proc.memory_info().rss
         except Exception:
             return 0.0
+        
+        self._mem_cached = rss_bytes / (1024 * 1024)  # Convert to MB
+        self._mem_ts = now
+        return self._mem_cached
     
     def _cleanup_memory(self):
         """Clean up memory to prevent memory leaks."""
         current_memory = self._get_memory_usage()
         
-        if current_memory > self.memory_limit_mb * 0.8:  # If over 80% of limit
-            logger.warning(f"High memory usage detected: {current_memory:.2f} MB")
+        # A climbing high-water mark points at a leak even when current RSS drops back after GC
+        peak_memory = _peak_memory_mb()
+        peak_growth = peak_memory - self._last_peak_mb
+        self._last_peak_mb = peak_memory
+        
+        over_limit = current_memory > self.memory_limit_mb * 0.8  # If over 80% of limit
+        if over_limit or peak_growth > PEAK_GROWTH_TRIGGER_MB:
+            if over_limit:
+                logger.warning(f"High memory usage detected: {current_memory:.2f} MB")
+            else:
+                logger.info(f"Peak memory grew by {peak_growth:.2f} MB since last cleanup")
             
-            # Force garbage collection
-            gc.collect()
+            # Batch garbage is young, so collect generations 0-1 first; only escalate to a
+            # full (stop-the-world) collection once young passes keep failing to free memory,
+            # or straight away when the peak jumped
+            full_collection = peak_growth > PEAK_GROWTH_TRIGGER_MB or self._young_gc_misses >= FULL_GC_AFTER_MISSES
+            if full_collection:
+                gc.collect()
+                if _malloc_trim is not None:
+                    _malloc_trim(0)
+            else:
+                gc.collect(generation=1)
             
             # Check memory again
-            new_memory = self._get_memory_usage()
+            new_memory = self._get_memory_usage(use_cache=False)
+            if full_collection or new_memory < current_memory * (1 - YOUNG_GC_MIN_DROP):
+                self._young_gc_misses = 0
+            else:
+                self._young_gc_misses += 1
+            
             if new_memory < current_memory:
                 logger.info(f"Memory cleanup successful: {current_memory:.2f} MB → {new_memory:.2f} MB")
     
+    def _record_memory_usage(self, memory_mb: float):
+        """Fold a memory sample into the moving average (the first sample seeds it)."""
+        if self._mem_ema is None:
+            self._mem_ema = memory_mb
+        else:
+            self._mem_ema = MEMORY_EMA_ALPHA * memory_mb + (1 - MEMORY_EMA_ALPHA) * self._mem_ema
+        self._mem_recent.append(memory_mb)
+    
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        """Fresh processing counters."""
+        return {
+            'total_users_processed': 0,
+            'total_transactions_processed': 0,
+            'total_processing_time': 0,
+            'total_batches': 0
+        }
+    
     def get_processing_stats(self) -> Dict[str, Any]:
         """Get processing statistics."""
-        with self.lock:
-            stats = self.processing_stats.copy()
+        stats = self.processing_stats.copy()
+        batch_times = list(self._batch_times)
+        memory_ema = self._mem_ema
+        recent_memory = list(self._mem_recent)
         
         # Calculate additional metrics
-        if stats['batch_processing_times']:
-            stats['avg_batch_time'] = np.mean(stats['batch_processing_times'])
-            stats['total_batches'] = len(stats['batch_processing_times'])
+        if batch_times:
+            stats['avg_batch_time'] = float(np.mean(batch_times))
+        
+        if memory_ema is not None:
+            stats['memory_usage_ema_mb'] = memory_ema
+            stats['memory_usage_p99_mb'] = float(np.percentile(recent_memory, 99))
         
         if stats['total_users_processed'] > 0:
             stats['users_per_second'] = stats['total_users_processed'] / stats['total_processing_time']
@@ -312,14 +911,10 @@ class BatchProcessor:
     
     def reset_stats(self):
         """Reset processing statistics."""
-        with self.lock:
-            self.processing_stats = {
-                'total_users_processed': 0,
-                'total_transactions_processed': 0,
-                'total_processing_time': 0,
-                'batch_processing_times': [],
-                'memory_usage_history': []
-            }
+        self.processing_stats = self._new_stats()
+        self._batch_times = deque(maxlen=STATS_HISTORY_SIZE)
+        self._mem_ema = None
+        self._mem_recent = deque(maxlen=MEMORY_RECENT_SAMPLES)
         logger.info("Processing statistics reset")
     
     def optimize_batch_sizes(self, sample_data: pd.DataFrame) -> Dict[str, int]:
@@ -334,12 +929,17 @@ class BatchProcessor:
         """
         logger.info("Optimizing batch sizes based on data characteristics")
         
-        # Analyze data size
-        avg_transaction_size = sample_data.memory_usage(deep=True).sum() / len(sample_data)
+        # Analyze data size per column (columns are stored, and scanned, separately)
+        col_bytes = _estimate_column_memory(sample_data)
+        avg_transaction_size = col_bytes.sum() / len(sample_data)
+        widest_column_size = col_bytes.drop('Index', errors='ignore').max() / len(sample_data)
         total_memory = self.memory_limit_mb * 1024 * 1024
         
         # Calculate optimal batch sizes
         optimal_transaction_batch = int(total_memory * 0.3 / avg_transaction_size)  # Use 30% of memory
+        # Keep each column of a batch cache-resident for column-wise groupby/apply scans
+        optimal_transaction_batch = min(optimal_transaction_batch,
+                                        int(_l3_cache_bytes() * L3_CACHE_SHARE / widest_column_size))
         optimal_user_batch = max(10, optimal_transaction_batch // 100)  # Ensure at least 10 users
         
         # Apply limits
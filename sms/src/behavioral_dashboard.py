@@ -4,41 +4,212 @@ Behavioral Dashboard Components
 Displays behavioral insights in a human-readable, story-like format.
 """
 
+import hashlib
+import json
+from bisect import bisect_left
+from dataclasses import dataclass
 import streamlit as st
 import pandas as pd
-from typing import Dict, List
-import plotly.express as px
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Tuple
+
+if TYPE_CHECKING:  # plotly is imported lazily at runtime (see _build_hourly_fig)
+    import plotly.graph_objects as go
+
+class _Flat(NamedTuple):
+    """Scalar traits read by several display methods, flattened out of the nested sections."""
+    digital_ratio: float
+    digital_level: str
+    loyalty_ratio: float
+    loyalty_personality: str
+    planning_ratio: float
+    planning_style: str
+    peak_hour: int
+    wake_up_time: str
+    high_freq_days: int
+    avg_daily_transactions: float
+
+@dataclass(frozen=True)
+class _Sections:
+    """Top-level sections of the behavioral insights dict."""
+    predictive: Dict
+    personality: Dict
+    lifestyle: Dict
+    stress: Dict
+    life_changes: Dict
+    financial_health: Dict
+    flat: _Flat
+
+# Cached helpers take the insights as an underscore argument, which Streamlit leaves unhashed;
+# the content digest passed alongside is the whole cache key (see BehavioralDashboard._cache_key)
+@st.cache_data(show_spinner=False)
+def _extract_sections(key: str, _behavioral_insights: Dict) -> _Sections:
+    """Slice the insights into sections once per distinct payload (reruns hit the cache)."""
+    behavioral_insights = _behavioral_insights
+    personality = behavioral_insights.get('personality_profile', {})
+    digital_info = personality.get('digital_native_level', {})
+    loyalty_info = personality.get('loyalty_index', {})
+    planning_info = personality.get('planning_style', {})
+    daily_rhythm = behavioral_insights.get('lifestyle_patterns', {}).get('daily_rhythm', {})
+    stress_days = behavioral_insights.get('stress_patterns', {}).get('stress_spending_days', {})
+    
+    flat = _Flat(
+        digital_ratio=digital_info.get('digital_ratio', 0),
+        digital_level=digital_info.get('level', 'Unknown'),
+        loyalty_ratio=loyalty_info.get('loyalty_ratio', 0),
+        loyalty_personality=loyalty_info.get('personality', 'Unknown'),
+        planning_ratio=planning_info.get('planning_ratio', 0),
+        planning_style=planning_info.get('style', 'Unknown'),
+        peak_hour=daily_rhythm.get('peak_spending_hour', 0),
+        wake_up_time=daily_rhythm.get('financial_wake_up_time', 'Unknown'),
+        high_freq_days=stress_days.get('high_frequency_days', 0),
+        avg_daily_transactions=stress_days.get('avg_daily_transactions', 0)
+    )
+    
+    return _Sections(
+        predictive=behavioral_insights.get('predictive_insights', {}),
+        personality=behavioral_insights.get('personality_profile', {}),
+        lifestyle=behavioral_insights.get('lifestyle_patterns', {}),
+        stress=behavioral_insights.get('stress_patterns', {}),
+        life_changes=behavioral_insights.get('life_changes', {}),
+        financial_health=behavioral_insights.get('financial_health_signals', {}),
+        flat=flat
+    )
+
+@st.cache_resource(show_spinner=False)
+def _build_hourly_fig(hourly: tuple) -> "go.Figure":
+    """Hourly spending chart, built once per distinct (hour, amount) series and reused across reruns."""
+    # Imported here so pages without the chart never pay for loading plotly
+    import plotly.graph_objects as go
+    
+    hours, amounts = zip(*hourly)
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scattergl(
+        x=hours,
+        y=amounts,
+        mode='lines+markers',
+        name='Spending',
+        line=dict(color='#4ecdc4', width=3),
+        marker=dict(size=8)
+    ))
+    
+    fig.update_layout(
+        title="Spending by Hour of Day",
+        xaxis_title="Hour",
+        yaxis_title="Amount (₹)",
+        height=350,
+        hovermode='x unified'
+    )
+    
+    return fig
+
+# Rupee amount formatter, bound once for the per-row loops
+_format_inr = '₹{:,.2f}'.format
+
+# Pattern-break icon by severity (anything below High is flagged as a warning)
+_SEVERITY_ICONS = {'High': '🚨', 'Medium': '⚠️'}
+
+# Upcoming-expense icon by urgency: due within 7 days, within 14 days, later
+_DUE_DAY_LIMITS = (7, 14)
+_DUE_ICONS = ('⚠️', '📅', '📋')
+
+def _json_default(value):
+    """Serialize numpy scalars as their Python values and anything else (timestamps) as text."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def _insights_key(behavioral_insights: Dict) -> str:
+    """Content digest of the insights used as the cache key.
+    
+    Keys are not sorted: the producers rank categories by insertion order, which the display keeps.
+    """
+    payload = json.dumps(behavioral_insights, default=_json_default).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+@st.cache_data(show_spinner=False)
+def _build_story(key: str, _behavioral_insights: Dict) -> Tuple[str, List[str]]:
+    """Build the summary story and key-insight lines once per distinct payload."""
+    sections = _extract_sections(key, _behavioral_insights)
+    flat = sections.flat
+    
+    # Generate a story-like summary
+    summary_parts = []
+    
+    # Personality traits
+    summary_parts.append(f"You are a **{flat.digital_level.lower()} digital native**")
+    summary_parts.append(f"with a **{flat.loyalty_personality.lower()} shopping style**")
+    summary_parts.append(f"and **{flat.planning_style.lower()} financial approach**")
+    
+    # Lifestyle patterns
+    summary_parts.append(f"Your financial life wakes up **{flat.wake_up_time.lower()}**")
+    
+    # Stress patterns
+    if flat.high_freq_days > 0:
+        summary_parts.append(f"and you show **stress spending patterns** on {flat.high_freq_days} days")
+    
+    # Combine into a story
+    story = ". ".join(summary_parts) + "."
+    
+    insights = []
+    
+    # Predictive insights
+    predictive = sections.predictive
+    upcoming_expenses = predictive.get('upcoming_expenses', [])
+    if upcoming_expenses:
+        next_expense = upcoming_expenses[0]
+        insights.append(f"Next big expense: {next_expense['merchant']} ({_format_inr(next_expense['avg_amount'])})")
+    
+    # Pattern breaks
+    pattern_breaks = predictive.get('pattern_breaks', [])
+    if pattern_breaks:
+        insights.append(f"Unusual spending detected in {len(pattern_breaks)} categories")
+    
+    # Life changes
+    life_changes = sections.life_changes
+    if life_changes.get('income_source_change', {}).get('detected', False):
+        insights.append("Recent job change detected")
+    
+    return story, insights
 
 class BehavioralDashboard:
     """Displays behavioral insights in an engaging, story-like format."""
     
     def __init__(self):
-        pass
+        self._last_key = None  # (insights dict, its digest) from the previous display call
+    
+    def _cache_key(self, behavioral_insights: Dict) -> str:
+        """Digest of the insights, serialized once however many sections display the same dict."""
+        if self._last_key is None or self._last_key[0] is not behavioral_insights:
+            self._last_key = (behavioral_insights, _insights_key(behavioral_insights))
+        return self._last_key[1]
+    
+    def _sections(self, behavioral_insights: Dict) -> _Sections:
+        """Cached sections for the insights."""
+        return _extract_sections(self._cache_key(behavioral_insights), behavioral_insights)
     
     def display_predictive_insights(self, behavioral_insights: Dict):
         """Display predictive insights about upcoming expenses and pattern breaks."""
         st.header("🔮 Predictive Insights")
         
-        predictive = behavioral_insights.get('predictive_insights', {})
+        predictive = self._sections(behavioral_insights).predictive
         
         # Upcoming recurring expenses
         upcoming_expenses = predictive.get('upcoming_expenses', [])
         if upcoming_expenses:
             st.subheader("⏰ Upcoming Big Expenses")
             
+            # One markdown element for the whole list instead of one alert box per expense
+            lines = []
             for expense in upcoming_expenses[:3]:  # Show top 3
                 days_until = expense.get('days_until_next', 0)
                 merchant = expense.get('merchant', 'Unknown')
                 amount = expense.get('avg_amount', 0)
                 confidence = expense.get('confidence', 'Medium')
-                
-                if days_until <= 7:
-                    st.warning(f"⚠️ **{merchant}**: ₹{amount:,.2f} due in {days_until} days ({confidence} confidence)")
-                elif days_until <= 14:
-                    st.info(f"📅 **{merchant}**: ₹{amount:,.2f} due in {days_until} days ({confidence} confidence)")
-                else:
-                    st.success(f"📋 **{merchant}**: ₹{amount:,.2f} due in {days_until} days ({confidence} confidence)")
+                icon = _DUE_ICONS[bisect_left(_DUE_DAY_LIMITS, days_until)]
+                lines.append(f"- {icon} **{merchant}**: {_format_inr(amount)} due in {days_until} days ({confidence} confidence)")
+            st.markdown("\n".join(lines))
         else:
             st.info("✅ No upcoming recurring expenses detected")
         
@@ -47,16 +218,15 @@ class BehavioralDashboard:
         if pattern_breaks:
             st.subheader("📊 Unusual Spending Patterns")
             
+            lines = []
             for break_info in pattern_breaks[:3]:  # Show top 3
                 month = break_info.get('month', 'Unknown')
                 category = break_info.get('category', 'Unknown')
                 deviation = break_info.get('deviation_percent', 0)
                 severity = break_info.get('severity', 'Medium')
-                
-                if severity == 'High':
-                    st.error(f"🚨 **{month}**: {category} spending was {deviation:+.1f}% unusual")
-                else:
-                    st.warning(f"⚠️ **{month}**: {category} spending was {deviation:+.1f}% unusual")
+                icon = _SEVERITY_ICONS.get(severity, '⚠️')
+                lines.append(f"- {icon} **{month}**: {category} spending was {deviation:+.1f}% unusual")
+            st.markdown("\n".join(lines))
         else:
             st.success("✅ No unusual spending patterns detected")
         
@@ -83,59 +253,47 @@ class BehavioralDashboard:
         """Display personality traits derived from spending patterns."""
         st.header("👤 Personality Profile")
         
-        personality = behavioral_insights.get('personality_profile', {})
+        flat = self._sections(behavioral_insights).flat
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
             # Digital native level
-            digital_info = personality.get('digital_native_level', {})
-            digital_ratio = digital_info.get('digital_ratio', 0)
-            digital_level = digital_info.get('level', 'Unknown')
-            
             st.metric(
                 "Digital Native Level",
-                digital_level,
-                f"{digital_ratio:.1%} digital payments"
+                flat.digital_level,
+                f"{flat.digital_ratio:.1%} digital payments"
             )
         
         with col2:
             # Loyalty index
-            loyalty_info = personality.get('loyalty_index', {})
-            loyalty_personality = loyalty_info.get('personality', 'Unknown')
-            loyalty_ratio = loyalty_info.get('loyalty_ratio', 0)
-            
             st.metric(
                 "Shopping Style",
-                loyalty_personality,
-                f"{loyalty_ratio:.1%} loyal merchants"
+                flat.loyalty_personality,
+                f"{flat.loyalty_ratio:.1%} loyal merchants"
             )
         
         with col3:
             # Planning style
-            planning_info = personality.get('planning_style', {})
-            planning_style = planning_info.get('style', 'Unknown')
-            planning_ratio = planning_info.get('planning_ratio', 0)
-            
             st.metric(
                 "Financial Style",
-                planning_style,
-                f"{planning_ratio:.1%} planned expenses"
+                flat.planning_style,
+                f"{flat.planning_ratio:.1%} planned expenses"
             )
         
         # Personality summary
         st.subheader("🎭 Your Financial Personality")
         
         personality_traits = []
-        if digital_level == 'High':
+        if flat.digital_level == 'High':
             personality_traits.append("**Tech-savvy** - You're comfortable with digital payments")
-        if loyalty_personality == 'Loyal':
+        if flat.loyalty_personality == 'Loyal':
             personality_traits.append("**Loyal** - You stick to trusted merchants and services")
-        elif loyalty_personality == 'Experimental':
+        elif flat.loyalty_personality == 'Experimental':
             personality_traits.append("**Adventurous** - You love trying new merchants and services")
-        if planning_style == 'Planner':
+        if flat.planning_style == 'Planner':
             personality_traits.append("**Organized** - You plan your expenses well")
-        elif planning_style == 'Impulsive':
+        elif flat.planning_style == 'Impulsive':
             personality_traits.append("**Spontaneous** - You make decisions on the fly")
         
         if personality_traits:
@@ -148,75 +306,85 @@ class BehavioralDashboard:
         """Display lifestyle and daily patterns."""
         st.header("🏠 Lifestyle Patterns")
         
-        lifestyle = behavioral_insights.get('lifestyle_patterns', {})
+        sections = self._sections(behavioral_insights)
+        lifestyle = sections.lifestyle
         
         # Daily rhythm
         daily_rhythm = lifestyle.get('daily_rhythm', {})
         if daily_rhythm:
-            peak_hour = daily_rhythm.get('peak_spending_hour', 0)
-            wake_up_time = daily_rhythm.get('financial_wake_up_time', 'Unknown')
-            
             st.subheader("⏰ Daily Financial Rhythm")
-            st.info(f"**Peak spending hour**: {peak_hour}:00")
-            st.info(f"**Financial wake-up time**: {wake_up_time}")
+            st.info(f"**Peak spending hour**: {sections.flat.peak_hour}:00")
+            st.info(f"**Financial wake-up time**: {sections.flat.wake_up_time}")
             
-            # Create hourly spending chart
-            # This would need the actual hourly data from the insights
+            # Hourly spending chart: a sorted (hour, amount) tuple is hashable, so the figure cache can key on it
+            hourly_spending = daily_rhythm.get('hourly_spending', {})
+            if hourly_spending:
+                hourly = tuple(sorted(hourly_spending.items()))
+                st.plotly_chart(_build_hourly_fig(hourly), use_container_width=True)
         
         # Weekend personality
         weekend_personality = lifestyle.get('weekend_personality', {})
         if weekend_personality:
             st.subheader("🎉 Weekend vs Weekday Personality")
             
+            # Partial sort for the top 3 rather than materialising every category
+            weekend_series = pd.Series(weekend_personality.get('top_weekend_categories', {}), dtype='float64')
+            weekday_series = pd.Series(weekend_personality.get('top_weekday_categories', {}), dtype='float64')
+            
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("**Weekend Favorites:**")
-                weekend_cats = weekend_personality.get('top_weekend_categories', {})
-                for category, amount in list(weekend_cats.items())[:3]:
-                    st.write(f"• {category}: ₹{amount:,.2f}")
+                self._display_top_categories(weekend_series)
             
             with col2:
                 st.write("**Weekday Favorites:**")
-                weekday_cats = weekend_personality.get('top_weekday_categories', {})
-                for category, amount in list(weekday_cats.items())[:3]:
-                    st.write(f"• {category}: ₹{amount:,.2f}")
+                self._display_top_categories(weekday_series)
         
         # Anchor merchants
         anchor_merchants = lifestyle.get('anchor_merchants', [])
         if anchor_merchants:
             st.subheader("🎯 Your Anchor Merchants")
             st.write("These are the services you use consistently:")
-            for merchant in anchor_merchants[:5]:  # Show top 5
-                st.write(f"• {merchant}")
+            st.markdown("\n".join(f"- {merchant}" for merchant in anchor_merchants[:5]))  # Show top 5
         else:
             st.info("No consistent merchant patterns detected")
     
+    def _display_top_categories(self, category_amounts: pd.Series):
+        """Show the three largest categories as one table instead of a write per row."""
+        top = category_amounts.nlargest(3)
+        if top.empty:
+            return
+        
+        # Format the column in one pass (Styler would pull in jinja2 just for this)
+        top_df = top.map(_format_inr).rename_axis('Category').reset_index(name='Amount')
+        st.dataframe(top_df, hide_index=True, use_container_width=True)
+    
     def display_stress_patterns(self, behavioral_insights: Dict):
         """Display stress-related spending patterns."""
         st.header("😰 Stress & Comfort Patterns")
         
-        stress_patterns = behavioral_insights.get('stress_patterns', {})
+        sections = self._sections(behavioral_insights)
+        stress_patterns = sections.stress
         
         # Comfort spending
         comfort_spending = stress_patterns.get('comfort_spending', {})
         if comfort_spending:
             st.subheader("🍕 Comfort Spending Categories")
             
-            for category, amount in comfort_spending.items():
-                st.write(f"• **{category}**: ₹{amount:,.2f}")
+            amounts = pd.Series(comfort_spending, dtype='float64').map(_format_inr)
+            st.markdown("\n".join(f"- **{category}**: {amount}" for category, amount in amounts.items()))
         
         # Stress spending days
         stress_days = stress_patterns.get('stress_spending_days', {})
         if stress_days:
-            high_freq_days = stress_days.get('high_frequency_days', 0)
-            avg_daily = stress_days.get('avg_daily_transactions', 0)
+            flat = sections.flat
             
             st.subheader("📈 Stress Spending Detection")
             
-            if high_freq_days > 0:
-                st.warning(f"🚨 **{high_freq_days} high-frequency spending days** detected")
-                st.write(f"Average daily transactions: {avg_daily:.1f}")
+            if flat.high_freq_days > 0:
+                st.warning(f"🚨 **{flat.high_freq_days} high-frequency spending days** detected")
+                st.write(f"Average daily transactions: {flat.avg_daily_transactions:.1f}")
                 st.write("This could indicate stress-related spending patterns")
             else:
                 st.success("✅ No stress spending patterns detected")
@@ -225,7 +393,7 @@ class BehavioralDashboard:
         """Display detected life changes."""
         st.header("🔄 Life Changes Detected")
         
-        life_changes = behavioral_insights.get('life_changes', {})
+        life_changes = self._sections(behavioral_insights).life_changes
         
         # Income source changes
         income_change = life_changes.get('income_source_change', {})
@@ -251,7 +419,7 @@ class BehavioralDashboard:
         """Display financial health signals."""
         st.header("💰 Financial Health Signals")
         
-        financial_health = behavioral_insights.get('financial_health_signals', {})
+        financial_health = self._sections(behavioral_insights).financial_health
         
         # Credit usage patterns
         credit_pattern = financial_health.get('credit_usage_pattern', {})
@@ -285,63 +453,14 @@ class BehavioralDashboard:
         """Display a comprehensive behavioral summary."""
         st.header("📋 Behavioral Summary")
         
-        # Generate a story-like summary
-        summary_parts = []
-        
-        # Personality traits
-        personality = behavioral_insights.get('personality_profile', {})
-        digital_level = personality.get('digital_native_level', {}).get('level', 'Unknown')
-        loyalty_style = personality.get('loyalty_index', {}).get('personality', 'Unknown')
-        planning_style = personality.get('planning_style', {}).get('style', 'Unknown')
-        
-        summary_parts.append(f"You are a **{digital_level.lower()} digital native**")
-        summary_parts.append(f"with a **{loyalty_style.lower()} shopping style**")
-        summary_parts.append(f"and **{planning_style.lower()} financial approach**")
-        
-        # Lifestyle patterns
-        lifestyle = behavioral_insights.get('lifestyle_patterns', {})
-        daily_rhythm = lifestyle.get('daily_rhythm', {})
-        wake_up_time = daily_rhythm.get('financial_wake_up_time', 'Unknown')
-        
-        summary_parts.append(f"Your financial life wakes up **{wake_up_time.lower()}**")
-        
-        # Stress patterns
-        stress_patterns = behavioral_insights.get('stress_patterns', {})
-        stress_days = stress_patterns.get('stress_spending_days', {})
-        high_freq_days = stress_days.get('high_frequency_days', 0)
-        
-        if high_freq_days > 0:
-            summary_parts.append(f"and you show **stress spending patterns** on {high_freq_days} days")
-        
-        # Combine into a story
-        story = ". ".join(summary_parts) + "."
+        story, insights = _build_story(self._cache_key(behavioral_insights), behavioral_insights)
         
         st.write(story)
         
         # Key insights
         st.subheader("🎯 Key Insights")
         
-        insights = []
-        
-        # Predictive insights
-        predictive = behavioral_insights.get('predictive_insights', {})
-        upcoming_expenses = predictive.get('upcoming_expenses', [])
-        if upcoming_expenses:
-            next_expense = upcoming_expenses[0]
-            insights.append(f"Next big expense: {next_expense['merchant']} (₹{next_expense['avg_amount']:,.2f})")
-        
-        # Pattern breaks
-        pattern_breaks = predictive.get('pattern_breaks', [])
-        if pattern_breaks:
-            insights.append(f"Unusual spending detected in {len(pattern_breaks)} categories")
-        
-        # Life changes
-        life_changes = behavioral_insights.get('life_changes', {})
-        if life_changes.get('income_source_change', {}).get('detected', False):
-            insights.append("Recent job change detected")
-        
-        for insight in insights:
-            st.write(f"• {insight}")
-        
-        if not insights:
-            st.info("No significant behavioral insights to report") 
\ No newline at end of file
+        if insights:
+            st.markdown("\n".join(f"- {insight}" for insight in insights))
+        else:
+            st.info("No significant behavioral insights to report")
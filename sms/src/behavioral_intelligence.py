@@ -265,7 +265,8 @@ class BehavioralIntelligence:
         
         lifestyle['daily_rhythm'] = {
             'peak_spending_hour': peak_hour,
-            'financial_wake_up_time': 'Early' if peak_hour < 10 else 'Mid-morning' if peak_hour < 14 else 'Late'
+            'financial_wake_up_time': 'Early' if peak_hour < 10 else 'Mid-morning' if peak_hour < 14 else 'Late',
+            'hourly_spending': {int(hour): float(amount) for hour, amount in hourly_spending.items()}
         }
         
         # 2. Weekend personality
@@ -273,8 +274,8 @@ class BehavioralIntelligence:
         weekday_categories = df[(df['transaction_type'] == 'debit') & (~df['is_weekend'])].groupby('category')['amount'].sum()
         
         lifestyle['weekend_personality'] = {
-            'top_weekend_categories': weekend_categories.head(3).to_dict(),
-            'top_weekday_categories': weekday_categories.head(3).to_dict()
+            'top_weekend_categories': weekend_categories.nlargest(3).to_dict(),
+            'top_weekday_categories': weekday_categories.nlargest(3).to_dict()
         }
         
         # 3. Anchor merchants (consistently used)
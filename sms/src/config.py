@@ -91,7 +91,9 @@ class SystemConfig:
                 "connection_pool_size": 10,
                 "max_connection_lifetime": 3600,
                 "index_creation_enabled": True,
-                "batch_write_size": 1000
+                "batch_write_size": 1000,
+                "cursor_batch_size": 5000,
+                "arrow_string_backend": False
             },
             "caching": {
                 "enabled": True,
@@ -111,7 +113,10 @@ class SystemConfig:
                 "user_batch_size": 100,
                 "transaction_batch_size": 1000,
                 "parallel_processing": True,
-                "max_workers": 4,
+                "max_workers": -1,  # -1: one worker per CPU available to the process
+                "executor_backend": "thread",  # "process" for pure-Python CPU-bound per-user work
+                "pin_workers": True,  # Pin each worker process to its own core
+                "cache_user_results": False,  # Reuse per-user results across runs; only for functions of (user_id, kwargs) alone
                 "load_balancing_enabled": True
             }
         }
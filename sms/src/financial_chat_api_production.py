@@ -28,14 +28,14 @@ import pytz
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from pymongo import MongoClient
-from dotenv import load_dotenv
+from .ai_model_config import ensure_env_loaded
 
 # Disable SSL warnings for Atlas connections
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (once per process, shared with the AI model config)
+ensure_env_loaded()
 
 # -----------------------------------------------------------------------------
 # Configuration
@@ -68,7 +68,7 @@ from .ai_model_interface import ai_interface
 from .ai_model_config import ai_config
 
 # Ensure we have the latest configuration
-ai_interface._refresh_config()
+ai_interface._refresh_config(force=True)
 
 ai_status = ai_interface.get_status()
 groq_available = ai_status["available"]
@@ -78,6 +78,15 @@ def call_ai_model(messages, model=None, temperature=0.1, max_retries=1):
     ai_interface._refresh_config()
     return ai_interface.call_ai_model(messages, model, temperature, max_retries=max_retries)
 
+async def acall_ai_model(messages, model=None, temperature=0.1, max_retries=1):
+    # Non-blocking variant for request handlers: concurrent chats overlap their LLM round-trips
+    return await ai_interface.acall_ai_model(messages, model, temperature, max_retries=max_retries)
+
+@app.on_event("shutdown")
+async def close_ai_clients():
+    """Close pooled AI provider connections on shutdown"""
+    await ai_interface.aclose()
+
 # -----------------------------------------------------------------------------
 # MongoDB Configuration - PRODUCTION SCHEMA with Atlas SSL Support
 # -----------------------------------------------------------------------------
@@ -835,7 +844,7 @@ Only return JSON, no extra text.
                 """}
             ]
             
-            response = call_ai_model(messages)  # Use default model for current provider
+            response = await acall_ai_model(messages)  # Use default model for current provider
             if response:
                 data = self._extract_json_from_response(response)
                 if data:
@@ -1076,7 +1085,7 @@ Return ONLY a JSON array of 5-7 contextually intelligent sub-query strings.
 """}
             ]
             
-            response = call_ai_model(messages)  # Use default model for current provider
+            response = await acall_ai_model(messages)  # Use default model for current provider
             if response:
                 data = self._extract_json_from_response(response)
                 if isinstance(data, list) and len(data) >= 6:
@@ -1381,7 +1390,7 @@ EXECUTE: Return ONLY the JSON above with correct transaction_type!
                 }
             ]
             
-            response = call_ai_model(messages)  # Use default model for current provider
+            response = await acall_ai_model(messages)  # Use default model for current provider
             if not response:
                 return None
                 
@@ -3692,7 +3701,7 @@ GOAL: User thinks "Holy shit, I never realized this about my finances!" and imme
                 }
             ]
             
-            response = call_ai_model(messages, temperature=0.2)  # Use default model for current provider
+            response = await acall_ai_model(messages, temperature=0.2)  # Use default model for current provider
             if response:
                 return response.strip()
             else:
@@ -3772,7 +3781,7 @@ Focus on making this response feel like it was written SPECIFICALLY for their ex
                 }
             ]
             
-            refined_response = call_ai_model(messages, temperature=0.1)  # Low temperature for precision
+            refined_response = await acall_ai_model(messages, temperature=0.1)  # Low temperature for precision
             
             if refined_response:
                 logger.info("✨ FINAL REFINEMENT COMPLETED - Ultra-precise response generated")
@@ -4154,6 +4163,32 @@ async def switch_ai_provider(provider: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to switch AI provider: {str(e)}")
 
+@app.post("/ai/config/refresh")
+async def refresh_ai_config():
+    """Re-detect AI providers from the environment (e.g. after rotating API keys)"""
+    try:
+        ai_interface._refresh_config(force=True)
+        return {
+            "status": "success",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": f"AI configuration refreshed. Active: {ai_config.active_provider}",
+            "current_priority": ai_config.get_current_priority()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh AI configuration: {str(e)}")
+
+@app.get("/ai/autotune/status")
+async def get_ai_autotune_status():
+    """Get per-provider latency/completion-length stats and the autotuned limits"""
+    try:
+        return {
+            "status": "success",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "autotune": ai_interface.get_autotune_status()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get autotune status: {str(e)}")
+
 @app.get("/ai/providers")
 async def get_available_providers():
     """Get information about all AI providers"""
@@ -19,9 +19,41 @@ except ImportError:
     from config import get_config
     from mongodb_connection_manager import mongodb_manager
 
+# Try to import pyarrow for Arrow-backed string columns, fallback to object strings
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Raw SMS transaction fields consumed (or carried into the processed collection) by
+# DataPreprocessor; the raw message body in metadata.original_text and ingestion ids are left out
+RAW_TRANSACTION_FIELDS = {
+    "user_id": 1,
+    "account": 1,
+    "amount": 1,
+    "balance": 1,
+    "category": 1,
+    "confidence_score": 1,
+    "counterparty": 1,
+    "merchant_canonical": 1,
+    "currency": 1,
+    "message_intent": 1,
+    "metadata.channel": 1,
+    "metadata.sender": 1,
+    "metadata.method": 1,
+    "metadata.reference_id": 1,
+    "summary": 1,
+    "tags": 1,
+    "transaction_date": 1,
+    "transaction_type": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
 
 class MongoDBLoader:
     """Advanced MongoDB loader with connection pooling and optimization."""
@@ -46,6 +78,8 @@ class MongoDBLoader:
         self.max_connection_lifetime = get_config('database.max_connection_lifetime', 3600)
         self.index_creation_enabled = get_config('database.index_creation_enabled', True)
         self.batch_write_size = get_config('database.batch_write_size', 1000)
+        self.cursor_batch_size = get_config('database.cursor_batch_size', 5000)
+        self.arrow_strings = PYARROW_AVAILABLE and get_config('database.arrow_string_backend', False)
         self.prefer_processed_data = prefer_processed_data
         
         # Initialize connection
@@ -182,7 +216,9 @@ class MongoDBLoader:
     
     def get_user_transactions(self, user_id: str, limit: Optional[int] = None, 
                             force_raw_data: bool = False, 
-                            check_freshness: bool = True) -> pd.DataFrame:
+                            check_freshness: bool = True,
+                            batch_size: Optional[int] = None,
+                            projection: Optional[Dict[str, int]] = None) -> pd.DataFrame:
         """
         Get transactions for a specific user, with intelligent data freshness checking.
         
@@ -191,6 +227,8 @@ class MongoDBLoader:
             limit: Maximum number of transactions to return (None for all)
             force_raw_data: Force loading from raw collection instead of processed
             check_freshness: Check if processed data is fresh before using it
+            batch_size: Documents per cursor round-trip (None uses database.cursor_batch_size)
+            projection: Fields to fetch from the raw collection (None fetches full documents)
             
         Returns:
             DataFrame with user transactions (fresh processed if available, raw otherwise)
@@ -233,11 +271,10 @@ class MongoDBLoader:
             # Build query
             query = {"user_id": user_id}
             
-            # Execute query with limit
+            # Execute query with limit; large cursor batches avoid the default 101-doc round-trips
+            cursor = self.collection.find(query, projection).batch_size(batch_size or self.cursor_batch_size)
             if limit:
-                cursor = self.collection.find(query).limit(limit)
-            else:
-                cursor = self.collection.find(query)
+                cursor = cursor.limit(limit)
             
             # Convert to list
             transactions = list(cursor)
@@ -248,32 +285,8 @@ class MongoDBLoader:
             
             logger.info(f"📥 Using raw data for user {user_id}: {len(transactions)} transactions")
             
-            # Flatten nested structures to make them compatible with pandas
-            flattened_transactions = []
-            for transaction in transactions:
-                flattened = {}
-                for key, value in transaction.items():
-                    if isinstance(value, dict):
-                        # Special handling for BSON Date objects
-                        if '$date' in value:
-                            # Extract the actual date string from BSON Date
-                            flattened[key] = value['$date']
-                        else:
-                            # Convert other nested dictionaries to string representation
-                            flattened[key] = str(value)
-                    elif isinstance(value, list):
-                        # Convert lists to string representation
-                        flattened[key] = str(value)
-                    else:
-                        flattened[key] = value
-                flattened_transactions.append(flattened)
-            
             # Convert MongoDB documents to DataFrame
-            df = pd.DataFrame(flattened_transactions)
-            
-            # Convert ObjectId to string for better compatibility
-            if '_id' in df.columns:
-                df['_id'] = df['_id'].astype(str)
+            df = self._transactions_to_dataframe(transactions)
             
             logger.info(f"Retrieved {len(df)} transactions for user: {user_id}")
             return df
@@ -282,6 +295,77 @@ class MongoDBLoader:
             logger.error(f"Error retrieving transactions for user {user_id}: {e}")
             return pd.DataFrame()
     
+    def get_users_raw_transactions(self, user_ids: List[str], 
+                                   batch_size: Optional[int] = None,
+                                   projection: Optional[Dict[str, int]] = None) -> pd.DataFrame:
+        """
+        Get raw transactions for several users with a single $in query.
+        
+        Args:
+            user_ids: User IDs to fetch transactions for
+            batch_size: Documents per cursor round-trip (None uses database.cursor_batch_size)
+            projection: Fields to fetch (None fetches full documents)
+            
+        Returns:
+            DataFrame with raw transactions for all requested users (keyed by user_id column)
+        """
+        if not user_ids:
+            return pd.DataFrame()
+        
+        try:
+            query = {"user_id": {"$in": list(user_ids)}}
+            cursor = self.collection.find(query, projection).batch_size(batch_size or self.cursor_batch_size)
+            transactions = list(cursor)
+            
+            if not transactions:
+                logger.info(f"No transactions found for {len(user_ids)} users")
+                return pd.DataFrame()
+            
+            df = self._transactions_to_dataframe(transactions)
+            
+            logger.info(f"Retrieved {len(df)} raw transactions for {len(user_ids)} users")
+            return df
+            
+        except Exception as e:
+            logger.error(f"Error retrieving transactions for {len(user_ids)} users: {e}")
+            return pd.DataFrame()
+    
+    def _transactions_to_dataframe(self, transactions: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Flatten MongoDB documents and convert them to a DataFrame."""
+        # Flatten nested structures to make them compatible with pandas
+        flattened_transactions = []
+        for transaction in transactions:
+            flattened = {}
+            for key, value in transaction.items():
+                if isinstance(value, dict):
+                    # Special handling for BSON Date objects
+                    if '$date' in value:
+                        # Extract the actual date string from BSON Date
+                        flattened[key] = value['$date']
+                    else:
+                        # Convert other nested dictionaries to string representation
+                        flattened[key] = str(value)
+                elif isinstance(value, list):
+                    # Convert lists to string representation
+                    flattened[key] = str(value)
+                else:
+                    flattened[key] = value
+            flattened_transactions.append(flattened)
+        
+        df = pd.DataFrame(flattened_transactions)
+        
+        # Convert ObjectId to string for better compatibility
+        if '_id' in df.columns:
+            df['_id'] = df['_id'].astype(str)
+        
+        # Store pure-string columns in Arrow buffers instead of one Python object per cell
+        if self.arrow_strings:
+            for column in df.columns:
+                if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True) == 'string':
+                    df[column] = df[column].astype('string[pyarrow]')
+        
+        return df
+    
     def get_all_transactions(self, limit: Optional[int] = None) -> pd.DataFrame:
         """
         Get all transactions from the collection.
@@ -294,10 +378,9 @@ class MongoDBLoader:
         """
         try:
             # Execute query with limit
+            cursor = self.collection.find().batch_size(self.cursor_batch_size)
             if limit:
-                cursor = self.collection.find().limit(limit)
-            else:
-                cursor = self.collection.find()
+                cursor = cursor.limit(limit)
             
             # Convert to list
             transactions = list(cursor)
@@ -306,32 +389,8 @@ class MongoDBLoader:
                 logger.info("No transactions found in collection")
                 return pd.DataFrame()
             
-            # Flatten nested structures
-            flattened_transactions = []
-            for transaction in transactions:
-                flattened = {}
-                for key, value in transaction.items():
-                    if isinstance(value, dict):
-                        # Special handling for BSON Date objects
-                        if '$date' in value:
-                            # Extract the actual date string from BSON Date
-                            flattened[key] = value['$date']
-                        else:
-                            # Convert other nested dictionaries to string representation
-                            flattened[key] = str(value)
-                    elif isinstance(value, list):
-                        # Convert lists to string representation
-                        flattened[key] = str(value)
-                    else:
-                        flattened[key] = value
-                flattened_transactions.append(flattened)
-            
             # Convert to DataFrame
-            df = pd.DataFrame(flattened_transactions)
-            
-            # Convert ObjectId to string
-            if '_id' in df.columns:
-                df['_id'] = df['_id'].astype(str)
+            df = self._transactions_to_dataframe(transactions)
             
             logger.info(f"Retrieved {len(df)} transactions from collection")
             return df
@@ -21,13 +21,15 @@ logger = logging.getLogger(__name__)
 class DataPreprocessor:
     """Centralized data preprocessing class with comprehensive cleaning and feature engineering."""
     
-    def __init__(self, date_range_months: int = None, store_processed_data: bool = False):
+    def __init__(self, date_range_months: int = None, store_processed_data: bool = False,
+                 copy_input: bool = True):
         """
         Initialize preprocessor.
         
         Args:
             date_range_months: Number of months of data to include (default: 24 months for comprehensive analysis)
             store_processed_data: Whether to store processed data in MongoDB (default: False)
+            copy_input: Copy the input DataFrame before modifying it (set False when the caller owns the frame)
         """
         # Default to ALL historical data (0 = no date filtering) for complete analysis
         # This ensures we capture ALL user transaction history
@@ -36,6 +38,7 @@ class DataPreprocessor:
         else:
             self.date_range_months = date_range_months
         self.store_processed_data = store_processed_data
+        self.copy_input = copy_input
         
         # Load configuration
         self.weekend_days = get_config('time_configurations.weekend_days', [5, 6])
@@ -125,8 +128,7 @@ class DataPreprocessor:
     
     def _map_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Map MongoDB columns to expected analysis columns."""
-        # Create a copy to avoid modifying the original
-        df = df.copy()
+        # No copy needed: preprocess() already works on its own frame after flattening
         
         # Map transaction_type if it exists
         if 'transaction_type' in df.columns:
@@ -284,7 +286,9 @@ class DataPreprocessor:
     
     def _flatten_nested_structures(self, df: pd.DataFrame) -> pd.DataFrame:
         """Flatten nested dictionary and list structures to make them pandas-compatible."""
-        df = df.copy()
+        # Single defensive copy for the whole pipeline (skipped when the caller owns the frame)
+        if self.copy_input:
+            df = df.copy()
         
         # Handle nested account information
         if 'account' in df.columns:
@@ -450,35 +454,48 @@ class DataPreprocessor:
         if df.empty:
             return df
         
-        # Time-based features
-        df['day_of_week'] = df['transaction_date'].dt.day_name()
-        df['month'] = df['transaction_date'].dt.month
-        df['year'] = df['transaction_date'].dt.year
-        df['hour'] = df['transaction_date'].dt.hour
-        df['day_of_month'] = df['transaction_date'].dt.day
-        df['week_of_year'] = df['transaction_date'].dt.isocalendar().week
-        df['quarter'] = df['transaction_date'].dt.quarter
-        
-        # Boolean features using configuration
-        df['is_weekend'] = df['transaction_date'].dt.weekday.isin(self.weekend_days)
-        df['is_month_start'] = df['day_of_month'] <= 3
-        df['is_month_end'] = df['day_of_month'] >= 28
-        
-        # Time of day categories using configuration
-        df['time_of_day'] = pd.cut(df['hour'], bins=self.time_bins, labels=['Night', 'Morning', 'Afternoon', 'Evening'])
-        
-        # Day categories using configuration
-        df['day_category'] = pd.cut(
-            df['transaction_date'].dt.weekday,
-            bins=[-1] + [max(self.day_categories['weekday'])] + [max(self.day_categories['weekend'])],
-            labels=['Weekday', 'Weekend']
-        )
-        
-        # Amount categories
-        df['amount_category'] = df['amount'].apply(self._categorize_amount)
-        
-        # Transaction frequency features (will be calculated per merchant)
-        df['transaction_month'] = df['transaction_date'].dt.to_period('M')
+        dates = df['transaction_date']
+        weekday = dates.dt.weekday
+        hour = dates.dt.hour
+        day_of_month = dates.dt.day
+        
+        features = {
+            # Time-based features
+            'day_of_week': dates.dt.day_name(),
+            'month': dates.dt.month,
+            'year': dates.dt.year,
+            'hour': hour,
+            'day_of_month': day_of_month,
+            'week_of_year': dates.dt.isocalendar().week,
+            'quarter': dates.dt.quarter,
+            
+            # Boolean features using configuration
+            'is_weekend': weekday.isin(self.weekend_days),
+            'is_month_start': day_of_month <= 3,
+            'is_month_end': day_of_month >= 28,
+            
+            # Time of day categories using configuration
+            'time_of_day': pd.cut(hour, bins=self.time_bins, labels=['Night', 'Morning', 'Afternoon', 'Evening']),
+            
+            # Day categories using configuration
+            'day_category': pd.cut(
+                weekday,
+                bins=[-1] + [max(self.day_categories['weekday'])] + [max(self.day_categories['weekend'])],
+                labels=['Weekday', 'Weekend']
+            ),
+            
+            # Amount categories
+            'amount_category': df['amount'].apply(self._categorize_amount),
+            
+            # Transaction frequency features (will be calculated per merchant)
+            'transaction_month': dates.dt.to_period('M'),
+        }
+        
+        # Allocate all engineered columns in one step instead of growing the frame column by column
+        existing = [column for column in features if column in df.columns]
+        if existing:
+            df = df.drop(columns=existing)
+        df = pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
         
         return df
     
@@ -8,14 +8,16 @@ import pandas as pd
 import numpy as np
 from pymongo import MongoClient
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 import logging
 import os
 import json
 
 try:
+    from .config import get_config
     from .mongodb_connection_manager import mongodb_manager
 except ImportError:
+    from config import get_config
     from mongodb_connection_manager import mongodb_manager
 
 # Configure logging
@@ -39,6 +41,8 @@ class ProcessedDataManager:
         if not self.connection_string:
             raise ValueError("MongoDB connection string not provided")
         
+        self.batch_write_size = get_config('database.batch_write_size', 1000)
+        
         try:
             # Use the centralized connection manager with consistent ID
             connection_id = "processed_data_manager"
@@ -101,13 +105,10 @@ class ProcessedDataManager:
                 else:
                     logger.info(f"✅ STEP 2: Cleanup verified - 0 records remaining")
             
-            # STEP 3: Convert DataFrame to clean records
-            logger.info(f"🔄 STEP 3: Converting {len(processed_df)} transactions to MongoDB format")
-            records = self._dataframe_to_mongodb_records(processed_df, user_id, processing_metadata)
-            
-            # STEP 4: Insert fresh processed data
-            logger.info(f"💾 STEP 4: Storing {len(records)} fresh processed transactions")
-            insert_result = self.processed_collection.insert_many(records)
+            # STEP 3+4: Convert and insert fresh processed data chunk by chunk
+            logger.info(f"💾 STEP 3: Converting and storing {len(processed_df)} fresh processed transactions")
+            inserted_count = self.insert_dataframe_chunked(processed_df, user_id, processing_metadata)
+            logger.info(f"✅ STEP 4: Inserted {inserted_count} records in unordered batches of {self.batch_write_size}")
             
             # STEP 5: Verify storage
             final_count = self.processed_collection.count_documents({"user_id": user_id})
@@ -123,6 +124,35 @@ class ProcessedDataManager:
             logger.error(f"❌ Failed to store processed data for user {user_id}: {e}")
             return False
     
+    def insert_dataframe_chunked(self, df: pd.DataFrame, user_id: str, 
+                                 processing_metadata: Dict = None, chunk_size: int = None) -> int:
+        """
+        Convert and insert a DataFrame in fixed-size chunks with unordered inserts.
+        
+        Only one chunk of MongoDB records is materialized at a time, and unordered
+        inserts let the server apply each batch in parallel.
+        
+        Args:
+            df: Processed DataFrame
+            user_id: User identifier
+            processing_metadata: Metadata about the processing (optional)
+            chunk_size: Rows per insert (default: database.batch_write_size)
+            
+        Returns:
+            int: Number of documents inserted
+        """
+        chunk_size = chunk_size or self.batch_write_size
+        base_metadata = self._build_base_metadata(user_id, len(df), processing_metadata)
+        
+        inserted_count = 0
+        for start in range(0, len(df), chunk_size):
+            records = self._dataframe_to_mongodb_records(
+                df.iloc[start:start + chunk_size], user_id, base_metadata=base_metadata
+            )
+            result = self.processed_collection.insert_many(records, ordered=False)
+            inserted_count += len(result.inserted_ids)
+        return inserted_count
+    
     def get_processed_data(self, user_id: str, limit: int = None) -> Optional[pd.DataFrame]:
         """
         Retrieve processed data for a specific user.
@@ -245,17 +275,14 @@ class ProcessedDataManager:
             logger.error(f"❌ Failed to get processing status: {e}")
             return {}
     
-    def _dataframe_to_mongodb_records(self, df: pd.DataFrame, user_id: str, 
-                                    processing_metadata: Dict = None) -> List[Dict]:
-        """Convert DataFrame to MongoDB-compatible records."""
-        records = []
-        
-        # Add processing metadata
+    def _build_base_metadata(self, user_id: str, total_records: int, 
+                             processing_metadata: Dict = None) -> Dict[str, Any]:
+        """Build the metadata attached to every processed record."""
         base_metadata = {
             "user_id": user_id,
             "processed_at": datetime.now(timezone.utc),
             "processing_version": "2.0",  # FIXED: Updated to latest version
-            "total_records": len(df)
+            "total_records": total_records
         }
         
         # Merge processing metadata from preprocessing (takes priority)
@@ -264,6 +291,18 @@ class ProcessedDataManager:
             # Ensure processed_at is always current
             base_metadata["processed_at"] = datetime.now(timezone.utc)
         
+        return base_metadata
+    
+    def _dataframe_to_mongodb_records(self, df: pd.DataFrame, user_id: str, 
+                                    processing_metadata: Dict = None,
+                                    base_metadata: Dict = None) -> List[Dict]:
+        """Convert DataFrame to MongoDB-compatible records."""
+        records = []
+        
+        # Add processing metadata
+        if base_metadata is None:
+            base_metadata = self._build_base_metadata(user_id, len(df), processing_metadata)
+        
         for idx, row in df.iterrows():
             record = {}
             
@@ -372,6 +411,21 @@ class ProcessedDataManager:
             logger.error(f"❌ Failed to delete processed data for user {user_id}: {e}")
             return False
     
+    def delete_all_processed_data(self) -> int:
+        """
+        Delete processed data for every user with a single delete_many.
+        
+        Returns:
+            int: Number of deleted records (-1 on failure)
+        """
+        try:
+            result = self.processed_collection.delete_many({})
+            logger.info(f"🗑️  Deleted {result.deleted_count} processed records for all users")
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"❌ Failed to delete all processed data: {e}")
+            return -1
+    
     def get_all_users_with_raw_data(self) -> List[str]:
         """Get list of all users who have raw transaction data."""
         try:
@@ -382,6 +436,51 @@ class ProcessedDataManager:
             logger.error(f"❌ Failed to get users list: {e}")
             return []
     
+    def get_users_needing_processing(self) -> List[str]:
+        """
+        Get users that have raw data but no processed data, computed server-side.
+        
+        Returns:
+            List of user IDs needing processing
+        """
+        try:
+            if self.raw_collection.database.name == self.processed_collection.database.name and \
+                    self.raw_collection.database.client is self.processed_collection.database.client:
+                # Single aggregation: group raw users and keep those without any processed document
+                pipeline = [
+                    {"$group": {"_id": "$user_id"}},
+                    {"$lookup": {
+                        "from": self.processed_collection.name,
+                        "localField": "_id",
+                        "foreignField": "user_id",
+                        "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}],
+                        "as": "processed"
+                    }},
+                    {"$match": {"processed": {"$size": 0}}},
+                    {"$project": {"_id": 1}}
+                ]
+                users = [doc["_id"] for doc in self.raw_collection.aggregate(pipeline, allowDiskUse=True)]
+            else:
+                # $lookup cannot cross databases - fall back to two distinct() calls
+                processed_users = self.get_users_with_processed_data()
+                users = [u for u in self.raw_collection.distinct("user_id") if u not in processed_users]
+            
+            logger.info(f"Found {len(users)} users needing processing")
+            return users
+        except Exception as e:
+            logger.error(f"❌ Failed to get users needing processing: {e}")
+            return []
+    
+    def get_users_with_processed_data(self) -> Set[str]:
+        """Get the set of users who already have processed data (single round-trip)."""
+        try:
+            users = set(self.processed_collection.distinct("user_id"))
+            logger.info(f"Found {len(users)} users with processed data")
+            return users
+        except Exception as e:
+            logger.error(f"❌ Failed to get processed users list: {e}")
+            return set()
+    
     def close(self):
         """Close MongoDB connection."""
         if hasattr(self, 'client'):
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for the AI model interface, against fake HTTP clients
+"""
+
+import sys
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip("requests")
+
+# The interface uses package-relative imports, so it is imported through src
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SMS_SKIP_DOTENV', '1')
+
+from urllib3 import HTTPResponse
+from urllib3.util.retry import RequestHistory
+
+from src import ai_model_interface as ami
+from src.ai_model_interface import AIModelInterface, RETRY_BACKOFF_CAP, _JitteredRetry
+
+MESSAGES = [{'role': 'user', 'content': 'How much did I spend on food?'}]
+
+
+class FakeResponse:
+    """Just enough of a requests/httpx response for the provider handlers"""
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = ''
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+def _reply_for(url, calls, provider):
+    calls.append((url, provider))
+    if 'openai' in url:
+        return FakeResponse(429)
+    return FakeResponse(200, {'candidates': [{'content': {'parts': [{'text': 'from gemini'}]}}]})
+
+
+@pytest.fixture
+def iface(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-openai')
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-gemini')
+    for name in ('GROQ_API_KEY', 'INHOUSE_API_KEY', 'INHOUSE_API_URL'):
+        monkeypatch.delenv(name, raising=False)
+    iface = AIModelInterface()
+    iface._refresh_config(force=True)
+    yield iface
+    monkeypatch.undo()
+    ami.ai_config.refresh_configuration()
+
+
+@pytest.fixture
+def sync_calls(iface, monkeypatch):
+    calls = []
+
+    class FakeSession:
+        def post(self, url, **kwargs):
+            return _reply_for(url, calls, iface.provider)
+
+    # __slots__ rules out patching the instance
+    monkeypatch.setattr(AIModelInterface, '_get_session', lambda self, max_retries: FakeSession())
+    return calls
+
+
+@pytest.fixture
+def async_calls(iface, monkeypatch):
+    pytest.importorskip("httpx")
+    calls = []
+
+    class FakeAsyncClient:
+        async def post(self, url, **kwargs):
+            await asyncio.sleep(0.01)
+            return _reply_for(url, calls, iface.provider)
+
+    client = FakeAsyncClient()
+    monkeypatch.setattr(ami, '_get_async_client', lambda: client)
+    return calls
+
+
+def test_fallback_leaves_primary_provider_in_place(iface, sync_calls):
+    assert iface.provider == 'openai'
+
+    assert iface.call_ai_model(MESSAGES) == 'from gemini'
+
+    # The Gemini request was made while the shared instance still pointed at OpenAI
+    assert [provider for _, provider in sync_calls] == ['openai', 'openai']
+    assert 'generativelanguage' in sync_calls[1][0]
+    assert iface.provider == 'openai'
+    assert iface.api_config['api_key'] == 'test-openai'
+
+
+def test_async_fallback_leaves_primary_provider_in_place(iface, async_calls):
+    async def run():
+        return await asyncio.gather(*[
+            iface.acall_ai_model([{'role': 'user', 'content': str(i)}], max_retries=0) for i in range(5)
+        ])
+
+    assert asyncio.run(run()) == ['from gemini'] * 5
+    assert {provider for _, provider in async_calls} == {'openai'}
+    assert iface.provider == 'openai'
+
+
+def test_identical_low_temperature_calls_are_cached(iface, sync_calls):
+    first = iface.call_ai_model(MESSAGES, temperature=0.1)
+    second = iface.call_ai_model(MESSAGES, temperature=0.1)
+
+    assert first == second == 'from gemini'
+    assert len(sync_calls) == 2  # One OpenAI attempt and one fallback, for the first call only
+
+
+def test_high_temperature_calls_are_not_cached(iface, sync_calls):
+    iface.call_ai_model(MESSAGES, temperature=0.9)
+    iface.call_ai_model(MESSAGES, temperature=0.9)
+
+    assert len(sync_calls) == 4
+
+
+def test_concurrent_identical_async_calls_are_coalesced(iface, async_calls):
+    async def run():
+        return await asyncio.gather(*[iface.acall_ai_model(MESSAGES, max_retries=0) for _ in range(5)])
+
+    assert asyncio.run(run()) == ['from gemini'] * 5
+    assert len(async_calls) == 2
+    assert iface._inflight == {}
+
+
+def test_retry_backoff_follows_the_jittered_schedule():
+    history = (RequestHistory('POST', '/', None, 429, None),)
+
+    assert _JitteredRetry(total=5).get_backoff_time() == 0
+    for attempts in (1, 2, 3, 10):
+        retry = _JitteredRetry(total=20, history=history * attempts)
+        for _ in range(50):
+            assert 0 <= retry.get_backoff_time() <= min(RETRY_BACKOFF_CAP, 2 ** (attempts - 1))
+
+
+def test_retry_after_is_capped():
+    retry = _JitteredRetry(total=3)
+
+    assert retry.get_retry_after(HTTPResponse(status=429, headers={'Retry-After': '120'})) == RETRY_BACKOFF_CAP
+    assert retry.get_retry_after(HTTPResponse(status=429, headers={'Retry-After': '2'})) == 2
+    assert retry.get_retry_after(HTTPResponse(status=429)) is None
+
+
+def test_fallback_reply_follows_the_last_user_message(iface):
+    messages = [
+        {'role': 'user', 'content': 'Show my salary'},
+        {'role': 'assistant', 'content': 'Here is your income.'},
+        {'role': 'user', 'content': 'And my spending trend?'},
+    ]
+
+    assert iface._fallback_response(messages) == ami._FALLBACK_REPLIES[1][1]
+    assert iface._fallback_response([{'role': 'system', 'content': 'salary'}]) == ami._DEFAULT_FALLBACK_REPLY
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
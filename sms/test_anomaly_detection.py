@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for anomaly detection: the numpy month helpers and the detector
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import anomaly_detection
+from anomaly_detection import AnomalyDetector, _month_keys, _months_before
+
+
+def _transactions(dates):
+    return pd.DataFrame({
+        'transaction_date': dates,
+        'amount': [100.0 + i for i in range(len(dates))],
+        'merchant_canonical': ['Swiggy', 'Apollo Pharmacy', 'Amazon'] * (len(dates) // 3) + ['Swiggy'] * (len(dates) % 3),
+        'transaction_type': ['debit'] * len(dates),
+    })
+
+
+@pytest.mark.parametrize('tz', [None, 'Asia/Kolkata'])
+def test_month_keys_match_to_period(tz):
+    dates = pd.Series(pd.to_datetime(['2024-01-31 23:30', '2024-02-01 00:15', '2024-12-31 00:00', '2025-03-15 12:00']))
+    if tz:
+        dates = dates.dt.tz_localize(tz)
+
+    expected = dates.dt.tz_localize(None).dt.to_period('M').dt.start_time.to_numpy().astype('datetime64[M]')
+
+    np.testing.assert_array_equal(_month_keys(dates), expected)
+
+
+@pytest.mark.parametrize('moment', [
+    '2024-03-31 10:20:30',  # Clamped to Feb 29 in a leap year
+    '2023-03-31',           # Clamped to Feb 28
+    '2024-05-31 23:59:59',  # Clamped to Apr 30, time of day kept
+    '2024-01-15 08:00',     # Crosses the year boundary
+    '2024-07-01',
+])
+@pytest.mark.parametrize('months', [1, 2, 13])
+def test_months_before_matches_date_offset(moment, months):
+    timestamp = pd.Timestamp(moment)
+
+    shifted = _months_before(timestamp.to_datetime64(), months)
+
+    assert pd.Timestamp(shifted) == timestamp - pd.DateOffset(months=months)
+
+
+def test_months_before_passes_nat_through():
+    assert np.isnat(_months_before(np.datetime64('NaT', 'ns'), 2))
+
+
+def test_missing_column_gives_empty_results():
+    df = _transactions(pd.date_range('2024-01-01', periods=6, freq='15D')).drop(columns='merchant_canonical')
+
+    results = AnomalyDetector().detect_anomalies(df)
+
+    assert results.keys() == AnomalyDetector()._empty_anomaly_results().keys()
+    assert results['panic_spends'].empty
+
+
+def test_string_dates_give_empty_results():
+    df = _transactions(['2024-01-01', '2024-02-01', '2024-03-01'])
+
+    results = AnomalyDetector().detect_anomalies(df)
+
+    assert results.keys() == AnomalyDetector()._empty_anomaly_results().keys()
+    assert results['pattern_break_months'].empty
+
+
+def test_detection_leaves_input_frame_alone():
+    df = _transactions(pd.date_range('2024-01-01', periods=12, freq='10D'))
+    original = df.copy()
+
+    AnomalyDetector().detect_anomalies(df)
+
+    pd.testing.assert_frame_equal(df, original)
+
+
+def _record_calls(monkeypatch, *names):
+    # The detectors catch exceptions, so calls are recorded rather than raised on
+    calls = []
+    for name in names:
+        original = getattr(anomaly_detection, name)
+
+        def recorder(*args, _name=name, _original=original, **kwargs):
+            calls.append(_name)
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(anomaly_detection, name, recorder)
+    return calls
+
+
+def test_unusable_input_returns_before_any_preprocessing(monkeypatch):
+    calls = _record_calls(monkeypatch, '_month_keys', '_basic_categories')
+    detector = AnomalyDetector()
+
+    missing_column = _transactions(pd.date_range('2024-01-01', periods=6, freq='15D')).drop(columns='amount')
+    string_dates = _transactions(['2024-01-01', '2024-02-01', '2024-03-01'])
+
+    for df in (missing_column, string_dates):
+        assert detector.detect_anomalies(df).keys() == detector._empty_anomaly_results().keys()
+    assert calls == []
+
+
+def test_spending_detectors_skip_frames_too_small_to_score(monkeypatch):
+    calls = _record_calls(monkeypatch, '_classify_days', '_health_related')
+    df = _transactions(pd.date_range('2024-01-01', periods=6, freq='15D'))
+    df['transaction_type'] = 'credit'
+
+    results = AnomalyDetector().detect_anomalies(df)
+
+    assert results['emotional_spikes'].empty
+    assert results['panic_spends'].empty
+    assert results['health_spending'].empty
+    assert calls == []
+
+
+def test_empty_results_are_not_shared_between_calls():
+    detector = AnomalyDetector()
+    first = detector.detect_anomalies(pd.DataFrame())
+    second = detector.detect_anomalies(pd.DataFrame())
+
+    first['panic_spends'].loc['2024-01'] = 1.0
+    first['emotional_spikes']['amount'] = []
+
+    assert second['panic_spends'].empty
+    assert 'amount' not in second['emotional_spikes'].columns
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch processor
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("psutil")
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import batch_processor as bp_module
+from batch_processor import BatchProcessor
+
+
+# Module-level so process-pool workers can unpickle them
+def _score_user(user_id, weights):
+    return float(weights.sum()) + len(user_id)
+
+
+def _lambda_result_for_bad_user(user_id):
+    # A lambda can't be pickled back to the parent, so only this user's result is lost
+    if user_id == 'bad':
+        return lambda: None
+    return user_id.upper()
+
+
+@pytest.fixture
+def processor():
+    processor = BatchProcessor()
+    processor.max_workers = 2
+    return processor
+
+
+def test_user_result_cache_is_off_by_default(processor):
+    assert processor.cache_user_results is False
+
+
+def test_user_result_cache_tells_apart_arrays_with_the_same_repr(processor):
+    processor.cache_user_results = True
+    processor.parallel_processing = False
+    calls = []
+
+    def score(user_id, weights):
+        calls.append(user_id)
+        return _score_user(user_id, weights)
+
+    # str() of both arrays is identical ('[0. 0. 0. ... 0. 0. 0.]'): only the middle differs
+    first = np.zeros(10_000)
+    second = np.zeros(10_000)
+    second[5_000] = 1.0
+    assert str(first) == str(second)
+
+    run = lambda weights: processor._process_user_batch_cached(['u1'], score, {'weights': weights})
+    assert run(first)[0]['result'] == 2.0
+    assert run(second)[0]['result'] == 3.0
+    assert calls == ['u1', 'u1']
+
+    # Same contents again is served from the cache
+    cached = run(second.copy())
+    assert cached[0]['result'] == 3.0
+    assert cached[0]['cached'] is True
+    assert calls == ['u1', 'u1']
+
+
+def test_transactions_are_chunked_by_default_without_touching_input(processor):
+    processor.transaction_batch_size = 3
+    df = pd.DataFrame({'amount': np.arange(10, dtype=float)})
+    original = df.copy()
+    chunk_sizes = []
+
+    def double(chunk):
+        chunk_sizes.append(len(chunk))
+        chunk['amount'] *= 2
+        return chunk
+
+    result = processor.process_transactions_batch(df, double)
+
+    assert chunk_sizes == [3, 3, 3, 1]
+    pd.testing.assert_frame_equal(df, original)
+    np.testing.assert_array_equal(result['amount'].to_numpy(), original['amount'].to_numpy() * 2)
+
+
+def test_vectorizable_transactions_run_in_one_call(processor):
+    processor.transaction_batch_size = 3
+    df = pd.DataFrame({'amount': np.arange(10, dtype=float)})
+    chunk_sizes = []
+
+    def total(frame):
+        chunk_sizes.append(len(frame))
+        return frame.assign(total=frame['amount'].sum())
+
+    result = processor.process_transactions_batch(df, total, vectorizable=True)
+
+    assert chunk_sizes == [10]
+    assert (result['total'] == 45.0).all()
+
+
+def test_constructing_processor_does_not_freeze_heap(monkeypatch):
+    frozen = []
+    monkeypatch.setattr(bp_module.gc, 'freeze', lambda: frozen.append(True))
+    BatchProcessor()
+    assert frozen == []
+
+
+def test_thread_pool_failure_is_kept_to_the_failing_user(processor):
+    def process(user_id):
+        if user_id == 'bad':
+            raise ValueError('bad user')
+        return user_id.upper()
+
+    results = processor._process_parallel(['a', 'bad', 'c', 'd'], process)
+
+    assert [r['user_id'] for r in results] == ['a', 'bad', 'c', 'd']
+    assert [r['status'] for r in results] == ['success', 'error', 'success', 'success']
+    assert results[1]['error'] == 'bad user'
+
+
+def test_process_pool_failure_is_kept_to_the_failing_user(processor, monkeypatch):
+    # One worker puts two users in each chunk, so the bad result fails its whole chunk
+    processor.max_workers = 1
+    processor.executor_backend = 'process'
+    processor.pin_workers = False
+    monkeypatch.setattr(bp_module, 'freeze_startup_heap', lambda: None)
+
+    results = processor._process_parallel(['a', 'bad', 'c', 'd', 'e', 'f', 'g', 'h', 'i'],
+                                          _lambda_result_for_bad_user)
+
+    by_user = {r['user_id']: r for r in results}
+    assert len(results) == 9
+    assert by_user['bad']['status'] == 'error'
+    assert all(r['status'] == 'success' for user_id, r in by_user.items() if user_id != 'bad')
+    assert by_user['a']['result'] == 'A'
+
+
+@pytest.mark.parametrize('memory_limit_mb', [1, 1_000_000])
+def test_transaction_files_are_yielded_in_order(processor, tmp_path, memory_limit_mb):
+    pytest.importorskip("pyarrow")
+    processor.memory_limit_mb = memory_limit_mb
+    paths = []
+    for i in range(5):
+        path = tmp_path / f'part-{i}.parquet'
+        pd.DataFrame({'amount': [float(i)] * (i + 1)}).to_parquet(path)
+        paths.append(path)
+
+    results = list(processor.iter_transaction_files(paths, lambda df: (len(df), df['amount'].iloc[0])))
+
+    assert results == [(i + 1, float(i)) for i in range(5)]
+    assert processor.processing_stats['total_transactions_processed'] == 15
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
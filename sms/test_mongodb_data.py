@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the MongoDB data paths (raw loads and processed-data writes),
+against fake collections
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pymongo")
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from mongodb_loader import MongoDBLoader, RAW_TRANSACTION_FIELDS
+from processed_data_manager import ProcessedDataManager
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+        self.batch_sizes = []
+
+    def batch_size(self, size):
+        self.batch_sizes.append(size)
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+
+class FakeRawCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+        self.cursors = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        user_ids = set(query['user_id']['$in'])
+        cursor = FakeCursor([doc for doc in self.documents if doc['user_id'] in user_ids])
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakeProcessedCollection:
+    def __init__(self):
+        self.inserts = []
+
+    def insert_many(self, records, ordered=True):
+        self.inserts.append((records, ordered))
+        return SimpleNamespace(inserted_ids=list(range(len(records))))
+
+
+def _loader(documents):
+    # Skips __init__, which connects to MongoDB
+    loader = object.__new__(MongoDBLoader)
+    loader._collection = FakeRawCollection(documents)
+    loader.cursor_batch_size = 5000
+    loader.arrow_strings = False
+    return loader
+
+
+def _raw_documents():
+    return [
+        {'user_id': user_id, 'amount': float(i), 'transaction_date': {'$date': f'2024-01-{i + 1:02d}T10:00:00Z'}}
+        for i, user_id in enumerate(['u1', 'u2', 'u1', 'u3', 'u2'])
+    ]
+
+
+def test_users_raw_transactions_use_one_in_query():
+    loader = _loader(_raw_documents())
+
+    df = loader.get_users_raw_transactions(['u1', 'u2'], projection=RAW_TRANSACTION_FIELDS)
+
+    assert loader.collection.queries == [({'user_id': {'$in': ['u1', 'u2']}}, RAW_TRANSACTION_FIELDS)]
+    assert loader.collection.cursors[0].batch_sizes == [5000]
+    assert sorted(df['user_id']) == ['u1', 'u1', 'u2', 'u2']
+    assert df.loc[df['user_id'] == 'u1', 'amount'].tolist() == [0.0, 2.0]
+
+
+def test_users_raw_transactions_batch_size_override():
+    loader = _loader(_raw_documents())
+
+    loader.get_users_raw_transactions(('u3',), batch_size=100)
+
+    assert loader.collection.queries[0][0] == {'user_id': {'$in': ['u3']}}
+    assert loader.collection.cursors[0].batch_sizes == [100]
+
+
+def test_users_raw_transactions_empty_inputs():
+    loader = _loader(_raw_documents())
+
+    assert loader.get_users_raw_transactions([]).empty
+    assert loader.collection.queries == []
+    assert loader.get_users_raw_transactions(['missing']).empty
+
+
+def test_users_raw_transactions_query_error_gives_empty_frame():
+    loader = _loader([])
+
+    def fail(query, projection=None):
+        raise RuntimeError('connection reset')
+
+    loader.collection.find = fail
+
+    assert loader.get_users_raw_transactions(['u1']).empty
+
+
+def _manager():
+    # Skips __init__, which connects to MongoDB
+    manager = object.__new__(ProcessedDataManager)
+    manager.processed_collection = FakeProcessedCollection()
+    manager.batch_write_size = 4
+    return manager
+
+
+def test_processed_rows_are_inserted_unordered():
+    manager = _manager()
+    df = pd.DataFrame({'amount': np.arange(10, dtype=float)})
+
+    assert manager.insert_dataframe_chunked(df, 'u1') == 10
+    assert manager.processed_collection.inserts
+    assert all(ordered is False for _, ordered in manager.processed_collection.inserts)
+
+
+def test_dataframe_is_inserted_in_fixed_size_chunks():
+    manager = _manager()
+    df = pd.DataFrame({
+        '_id': range(10),
+        'amount': np.arange(10, dtype=float),
+        'merchant_canonical': ['Swiggy'] * 10,
+    })
+
+    inserted = manager.insert_dataframe_chunked(df, 'u1', processing_metadata={'source': 'test'})
+
+    assert inserted == 10
+    assert [len(records) for records, _ in manager.processed_collection.inserts] == [4, 4, 2]
+
+    records = [record for chunk, _ in manager.processed_collection.inserts for record in chunk]
+    assert [record['amount'] for record in records] == list(np.arange(10, dtype=float))
+    assert all('_id' not in record for record in records)
+
+
+def test_chunk_size_argument_overrides_batch_write_size():
+    manager = _manager()
+    df = pd.DataFrame({'amount': np.arange(7, dtype=float)})
+
+    assert manager.insert_dataframe_chunked(df, 'u1', chunk_size=5) == 7
+    assert [len(records) for records, _ in manager.processed_collection.inserts] == [5, 2]
+
+
+def test_empty_dataframe_inserts_nothing():
+    manager = _manager()
+
+    assert manager.insert_dataframe_chunked(pd.DataFrame({'amount': []}), 'u1') == 0
+    assert manager.processed_collection.inserts == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))